@@ -0,0 +1,306 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+########################################################
+# Local fake of the AI Search management API
+########################################################
+#
+# An in-process HTTP server implementing the subset of the management REST API
+# used by the AI_Search package: resource CRUD, indexer reset/run/status and a
+# simulated indexer execution, plus document upload (docs/index) and a naive
+# keyword/vector/hybrid docs/search over the uploaded documents, on both the REST
+# paths and the paths of the azure-search-documents SDK. It can inject latency
+# and throttling so retry, polling and throughput code can be exercised without
+# a search service:
+#
+#     with FakeSearchService(documents=500, items_per_second=100) as fake:
+#         client = SearchRestClient("fake", "key", endpoint=fake.endpoint)
+#         previous_start = run_indexer("my-indexer", client)
+#         monitor_indexer("my-indexer", client, min_interval=0.1, after=previous_start)
+
+_PATH = re.compile(r"^/(?P<collection>[^/]+)(?:/(?P<name>[^/]+))?(?:/(?P<action>[^/]+(?:/[^/]+)?))?$")
+# document paths of the azure-search-documents SDK: /indexes('name')/docs/search.index
+_SDK_PATH = re.compile(r"^/indexes\('(?P<name>[^']+)'\)/docs/search\.(?P<action>index|post\.search)$")
+_SDK_ACTIONS = {"index": "docs/index", "post.search": "docs/search"}
+_WORD = re.compile(r"\w+")
+# like the service, GET returns secrets as null
+_SECRET_KEYS = {"apiKey", "connectionString", "key", "authResourceId"}
+
+
+def _without_secrets(value):
+    if isinstance(value, dict):
+        return {k: None if k in _SECRET_KEYS else _without_secrets(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_without_secrets(v) for v in value]
+    return value
+
+
+def _iso(value: datetime) -> str:
+    return value.isoformat().replace("+00:00", "Z")
+
+
+class FakeSearchService:
+    """
+    Args:
+        documents: number of documents an indexer run processes
+        items_per_second: simulated indexer throughput
+        failure_rate: fraction of documents that fail, attributed to failing_skill
+        failing_skill: skill name reported on item errors
+        latency: seconds added to every request
+        throttle_every: answer every Nth request with 429 (0 disables throttling)
+        start_delay: seconds between a run request and the start of the run, during
+            which the status still reports the previous execution, as the service does
+    """
+
+    def __init__(
+        self,
+        documents: int = 100,
+        items_per_second: float = 50.0,
+        failure_rate: float = 0.0,
+        failing_skill: str = "docint-processing",
+        latency: float = 0.0,
+        throttle_every: int = 0,
+        start_delay: float = 0.5,
+    ):
+        self.documents = documents
+        self.items_per_second = items_per_second
+        self.failure_rate = failure_rate
+        self.failing_skill = failing_skill
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.start_delay = start_delay
+
+        self.resources: Dict[str, Dict[str, dict]] = {}
+        self.runs: Dict[str, dict] = {}
+        self.documents_by_index: Dict[str, Dict[str, dict]] = {}
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    ########################################################
+    # Server lifecycle
+    ########################################################
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeSearchService":
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                status, payload = service.handle(self.command, urlparse(self.path).path, body)
+                data = json.dumps(payload).encode() if payload is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_PUT = do_POST = do_DELETE = _handle
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logging.info(f"Fake search service listening on {self.endpoint}")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    ########################################################
+    # Request handling
+    ########################################################
+
+    def handle(self, method: str, path: str, body: Optional[dict]):
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            self.request_count += 1
+            if self.throttle_every and self.request_count % self.throttle_every == 0:
+                return 429, {"error": {"message": "Too many requests"}}
+
+            sdk_match = _SDK_PATH.match(path)
+            if sdk_match:
+                path = f"/indexes/{sdk_match.group('name')}/{_SDK_ACTIONS[sdk_match.group('action')]}"
+            match = _PATH.match(path)
+            if not match:
+                return 404, None
+            collection, name, action = match.group("collection", "name", "action")
+            items = self.resources.setdefault(collection, {})
+
+            if action:
+                return self._handle_action(collection, name, action, body)
+            if name is None:
+                return (200, {"value": _without_secrets(list(items.values()))}) if method == "GET" else (405, None)
+            if method == "GET":
+                return (200, _without_secrets(items[name])) if name in items else (404, None)
+            if method == "PUT":
+                created = name not in items
+                items[name] = {**body, "@odata.etag": f'"{random.getrandbits(32):x}"'}
+                return (201 if created else 200), items[name]
+            if method == "DELETE":
+                return (204, None) if items.pop(name, None) is not None else (404, None)
+            return 405, None
+
+    def _handle_action(self, collection: str, name: str, action: str, body: Optional[dict] = None):
+        if collection == "indexes" and action in ("docs/index", "docs/search"):
+            return self._handle_documents(name, action, body or {})
+        if collection != "indexers" or name not in self.resources.get("indexers", {}):
+            return 404, None
+        if action == "reset":
+            self.runs.pop(name, None)
+            return 204, None
+        if action == "run":
+            if name in self.runs and self._execution(name)["status"] == "inProgress":
+                return 409, {"error": {"message": "Another indexer invocation is currently in progress"}}
+            previous = self._status(name) if name in self.runs else {"lastResult": None, "executionHistory": []}
+            self.runs[name] = {
+                "start": datetime.now(timezone.utc) + timedelta(seconds=self.start_delay),
+                "history": previous["executionHistory"],
+                "previous": previous["lastResult"],
+            }
+            return 202, None
+        if action == "status":
+            return 200, self._status(name)
+        return 404, None
+
+    def _execution(self, name: str) -> dict:
+        run = self.runs[name]
+        now = datetime.now(timezone.utc)
+        elapsed = (now - run["start"]).total_seconds()
+        processed = min(self.documents, int(elapsed * self.items_per_second))
+        failed = int(processed * self.failure_rate)
+        finished = processed >= self.documents
+        end = run["start"] + timedelta(seconds=self.documents / self.items_per_second)
+        return {
+            "status": "success" if finished and not failed else ("transientFailure" if finished else "inProgress"),
+            "startTime": _iso(run["start"]),
+            "endTime": _iso(end) if finished else None,
+            "itemsProcessed": processed,
+            "itemsFailed": failed,
+            "errors": [
+                {"key": f"doc-{i}", "name": self.failing_skill, "errorMessage": "Web Api response status: 'InternalServerError'"}
+                for i in range(failed)
+            ],
+            "warnings": [],
+        }
+
+    def _status(self, name: str) -> dict:
+        if name not in self.runs:
+            return {"status": "running", "lastResult": None, "executionHistory": []}
+        run = self.runs[name]
+        if datetime.now(timezone.utc) < run["start"]:
+            # not started yet, the status is still the one of the previous execution
+            return {"status": "running", "lastResult": run["previous"], "executionHistory": run["history"]}
+        execution = self._execution(name)
+        if execution["status"] != "inProgress" and not run.get("recorded"):
+            run["history"].insert(0, execution)
+            run["recorded"] = True
+        history = run["history"] if run.get("recorded") else [execution] + run["history"]
+        return {"status": "running", "lastResult": execution, "executionHistory": history}
+
+    ########################################################
+    # Documents
+    ########################################################
+
+    def _handle_documents(self, index_name: str, action: str, body: dict):
+        index = self.resources.get("indexes", {}).get(index_name)
+        if index is None:
+            return 404, None
+        key = next(f["name"] for f in index["fields"] if f.get("key"))
+        documents = self.documents_by_index.setdefault(index_name, {})
+
+        if action == "docs/index":
+            results = []
+            for document in body.get("value", []):
+                document = dict(document)
+                operation = document.pop("@search.action", "upload")
+                if operation == "delete":
+                    documents.pop(document[key], None)
+                elif operation == "merge":
+                    documents.setdefault(document[key], {}).update(document)
+                else:
+                    documents[document[key]] = document
+                results.append({"key": document[key], "status": True, "statusCode": 200})
+            return 200, {"value": results}
+
+        ranked = self._rank(index, list(documents.values()), body)
+        top = body.get("top", 50)
+        select = body.get("select")
+        value = []
+        for score, document in ranked[:top]:
+            fields = {k: v for k, v in document.items() if not select or k in select.split(",")}
+            value.append({"@search.score": score, **fields})
+        return 200, {"value": value}
+
+    @staticmethod
+    def _keyword_scores(index: dict, documents: List[dict], text: str) -> Dict[int, float]:
+        terms = set(_WORD.findall(text.lower()))
+        searchable = [f["name"] for f in index["fields"] if f.get("searchable") and f["type"] == "Edm.String"]
+        scores = {}
+        for i, document in enumerate(documents):
+            words = _WORD.findall(" ".join(str(document.get(name) or "") for name in searchable).lower())
+            score = sum(1 for word in words if word in terms)
+            if score:
+                scores[i] = float(score)
+        return scores
+
+    @staticmethod
+    def _vector_scores(documents: List[dict], query: dict) -> Dict[int, float]:
+        vector = query.get("vector")
+        if vector is None:
+            return {}
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        scores = {}
+        for i, document in enumerate(documents):
+            other = document.get(query["fields"])
+            if other:
+                other_norm = sum(v * v for v in other) ** 0.5 or 1.0
+                scores[i] = sum(a * b for a, b in zip(vector, other)) / (norm * other_norm)
+        top = sorted(scores.items(), key=lambda item: -item[1])[: query.get("k", 50)]
+        return dict(top)
+
+    def _rank(self, index: dict, documents: List[dict], body: dict):
+        rankings = []
+        if body.get("search") not in (None, "", "*"):
+            rankings.append(self._keyword_scores(index, documents, body["search"]))
+        for query in body.get("vectorQueries", []):
+            rankings.append(self._vector_scores(documents, query))
+        if not rankings:
+            return [(1.0, document) for document in documents]
+        if len(rankings) == 1:
+            fused = rankings[0]
+        else:
+            # reciprocal rank fusion, as the service does for hybrid queries
+            fused: Dict[int, float] = {}
+            for ranking in rankings:
+                for rank, (i, _) in enumerate(sorted(ranking.items(), key=lambda item: -item[1])):
+                    fused[i] = fused.get(i, 0.0) + 1.0 / (60 + rank + 1)
+        return [(score, documents[i]) for i, score in sorted(fused.items(), key=lambda item: -item[1])]
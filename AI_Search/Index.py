@@ -1,11 +1,12 @@
 import logging
 import time
-import os
 import requests
-from typing import Optional
-import json
-from dotenv import load_dotenv
-load_dotenv()   
+from typing import Optional, Union
+from AI_Search.Reconciler import reconcile
+from AI_Search.RestClient import SearchRestClient, get_client
+from AI_Search.Schema import PROJECTION_INDEX
+from AI_Search.VectorProfiles import VectorProfile
+from config import get_settings
 
 # set up logging configuration globally
 # logging.getLogger("azure").setLevel(logging.WARNING)
@@ -21,286 +22,87 @@ logging.basicConfig(
 # Constants
 ########################################################
 
-document_chunking_func_key = os.getenv("DOCUMENT_CHUNKING_FUNCTION_KEY")
-cognitive_service_key = os.getenv("COGNITIVE_SERVICES_KEY")
-storage_connection_string = os.getenv("STORAGE_CONNECTION_STRING")
-search_api_version = "2024-11-01-preview"
-azure_search_admin_key = os.getenv("AZURE_SEARCH_ADMIN_KEY")
-search_service_name = os.getenv("AZURE_SEARCH_SERVICE_NAME")
-azure_openai_api_key = os.getenv("AZURE_OPENAI_API_KEY")
+embedding_resource_uri = "https://oai0-vm2b2htvuuclm.openai.azure.com"
 
 ########################################################
 # Create index
 ########################################################
 
 
-def create_index_body(
+def build_index_body(
     index_name: str,
-    search_api_version: str = "2024-11-01-preview",
-):
+    vector_profile: Union[str, VectorProfile] = "default",
+    api_key: Optional[str] = None,
+) -> dict:
     """
-    Creates or recreates an Azure AI search
+    Builds the REST definition of the index from the PROJECTION_INDEX schema.
 
     Args:
-        index_name: str, the name of the index to create or recreate
+        index_name: str, the name of the index
+        vector_profile: str or VectorProfile, a preset name from AI_Search/VectorProfiles.py
+            or a custom profile for the vector field
+        api_key: str, key of the vectorizer, the Azure OpenAI key of the settings by default
     """
+    return PROJECTION_INDEX.to_rest(
+        index_name,
+        vectorizer_uri=embedding_resource_uri,
+        api_key=api_key or get_settings().openai.api_key,
+        vector_profile=vector_profile,
+    )
 
-    logging.info(f"Starting index creation for '{index_name}'")
-
-    # Azure cognitive search settings
-    service_name = search_service_name
-    api_version = search_api_version
-
-    # Endpoint URL
-    endpoint = f"https://{service_name}.search.windows.net/indexes/{index_name}?api-version={api_version}"
-    logging.info(f"Endpoint URL: {endpoint}")
-
-    # Headers
-    headers = {
-        "Content-Type": "application/json",
-        "api-key": azure_search_admin_key,
-    }
 
-    # first check if the index exists
-    try:
-        logging.info(f"Checking if index '{index_name}' exists...")
-        check_response = requests.get(endpoint, headers=headers)
-
-        if check_response.status_code == 200:
-            logging.info(f"Index '{index_name}' already exists. Deleting it...")
-            delete_response = requests.delete(endpoint, headers=headers)
+def create_index_body(
+    index_name: str,
+    search_api_version: str = None,
+    allow_rebuild: bool = True,
+    vector_profile: Union[str, VectorProfile] = "default",
+    service_name: str = None,
+    admin_key: str = None,
+    client: SearchRestClient = None,
+    refresh_secrets: bool = False,
+):
+    """
+    Creates an Azure AI search index or updates it in place.
 
-            if delete_response.status_code in [200, 204]:
-                logging.info(f"Successfully deleted index '{index_name}'")
-            else:
-                logging.warning(
-                    f"Unexpected response while deleting index '{index_name}': {delete_response.status_code}"
-                )
-        elif check_response.status_code == 404:
-            logging.info(f"Index '{index_name}' does not exist. Creating it...")
-        else:
-            logging.warning(
-                f"Unexpected response while checking index '{index_name}': {check_response.status_code}"
-            )
+    The existing definition is diffed against the desired one; the index is only
+    dropped and rebuilt when the change cannot be applied in place.
 
-    except requests.exceptions.ConnectionError:
-        logging.warning(
-            f"Connection error while checking index '{index_name}.' Please verify your network connection and try again."
-        )
-        raise
+    Args:
+        index_name: str, the name of the index to create or update
+        allow_rebuild: bool, whether an index that cannot be updated in place may be dropped
+        vector_profile: str or VectorProfile, how the vector field is searched and stored
+        client: SearchRestClient, defaults to the shared pooled client of the service
+        refresh_secrets: bool, push the vectorizer key even when nothing else changed
+    """
 
-    except Exception as e:
-        logging.error(f"Error checking or deleting index '{index_name}': {e}")
-        raise e
+    logging.info(f"Starting index reconciliation for '{index_name}'")
 
     # Create index body
-    logging.info(f"Creating index '{index_name}'...")
+    logging.info(f"Preparing index '{index_name}'...")
 
     start_time = time.time()
-    body = {
-        "name": index_name,
-        "fields": [
-            {
-                "name": "chunk_id",
-                "type": "Edm.String",
-                "searchable": True,
-                "filterable": True,
-                "retrievable": True,
-                "stored": True,
-                "sortable": True,
-                "facetable": False,
-                "key": True,
-                "analyzer": "keyword",
-                "synonymMaps": [],
-            },
-            {
-                "name": "parent_id",
-                "type": "Edm.String",
-                "searchable": False,
-                "filterable": True,
-                "retrievable": True,
-                "stored": True,
-                "sortable": False,
-                "facetable": False,
-                "key": False,
-                "synonymMaps": [],
-            },
-            {
-                "name": "chunk",
-                "type": "Edm.String",
-                "searchable": True,
-                "filterable": False,
-                "retrievable": True,
-                "stored": True,
-                "sortable": False,
-                "facetable": False,
-                "key": False,
-                "synonymMaps": [],
-            },
-            {
-                "name": "title",
-                "type": "Edm.String",
-                "searchable": True,
-                "filterable": False,
-                "retrievable": True,
-                "stored": True,
-                "sortable": False,
-                "facetable": False,
-                "key": False,
-                "synonymMaps": [],
-            },
-            {
-                "name": "document_id",
-                "type": "Edm.String",
-                "searchable": True,
-                "filterable": True,
-                "retrievable": True,
-                "stored": True,
-                "sortable": False,
-                "facetable": False,
-                "key": False,
-                "analyzer": "standard.lucene",
-                "synonymMaps": [],
-            },
-            {
-                "name": "text_vector",
-                "type": "Collection(Edm.Single)",
-                "searchable": True,
-                "filterable": False,
-                "retrievable": True,
-                "stored": True,
-                "sortable": False,
-                "facetable": False,
-                "key": False,
-                "dimensions": 1536,
-                "vectorSearchProfile": "financial-index-azureOpenAi-text-profile",
-                "synonymMaps": [],
-            },
-            {
-                "name": "date_last_modified",
-                "type": "Edm.DateTimeOffset",
-                "searchable": False,
-                "filterable": True,
-                "retrievable": True,
-                "stored": True,
-                "sortable": True,
-                "facetable": True,
-                "key": False,
-                "synonymMaps": [],
-            },
-            {
-                "name": "url",
-                "type": "Edm.String",
-                "searchable": True,
-                "filterable": False,
-                "retrievable": True,
-                "stored": True,
-                "sortable": False,
-                "facetable": False,
-                "key": False,
-                "synonymMaps": [],
-            },
-            {
-                "name": "file_name",
-                "type": "Edm.String",
-                "searchable": True,
-                "filterable": False,
-                "retrievable": True,
-                "stored": True,
-                "sortable": False,
-                "facetable": False,
-                "key": False,
-                "synonymMaps": [],
-            },
-        ],
-        "scoringProfiles": [],
-        "suggesters": [],
-        "analyzers": [],
-        "normalizers": [],
-        "tokenizers": [],
-        "tokenFilters": [],
-        "charFilters": [],
-        "similarity": {"@odata.type": "#Microsoft.Azure.Search.BM25Similarity"},
-        "semantic": {
-            "defaultConfiguration": "financial-index-semantic-configuration",
-            "configurations": [
-                {
-                    "name": "financial-index-semantic-configuration",
-                    "prioritizedFields": {
-                        "titleField": {"fieldName": "title"},
-                        "prioritizedContentFields": [{"fieldName": "chunk"}],
-                        "prioritizedKeywordsFields": [],
-                    },
-                }
-            ],
-        },
-        "vectorSearch": {
-            "algorithms": [
-                {
-                    "name": "financial-index-algorithm",
-                    "kind": "hnsw",
-                    "hnswParameters": {
-                        "metric": "cosine",
-                        "m": 4,
-                        "efConstruction": 400,
-                        "efSearch": 500,
-                    },
-                }
-            ],
-            "profiles": [
-                {
-                    "name": "financial-index-azureOpenAi-text-profile",
-                    "algorithm": "financial-index-algorithm",
-                    "vectorizer": "financial-index-azureOpenAi-text-vectorizer",
-                }
-            ],
-            "vectorizers": [
-                {
-                    "name": "financial-index-azureOpenAi-text-vectorizer",
-                    "kind": "azureOpenAI",
-                    "azureOpenAIParameters": {
-                        "resourceUri": "https://oai0-vm2b2htvuuclm.openai.azure.com",
-                        "deploymentId": "text-embedding-3-small",
-                        "apiKey": azure_openai_api_key,
-                        "modelName": "text-embedding-3-small",
-                    },
-                }
-            ],
-            "compressions": [],
-        },
-    }
-    response_time = time.time() - start_time
-    logging.info(f"Index configuration prepared in {round(response_time,2)} seconds")
+    body = build_index_body(index_name, vector_profile)
 
-    # Create index
+    # Create or update index
+    client = client or get_client(service_name, admin_key, search_api_version)
     try:
-        logging.info(f"Creating index '{index_name}'...")
-        response = requests.put(endpoint, headers=headers, json=body)
-
-        if response.status_code in [200, 201]:
-            logging.info(f"Index '{index_name}' created successfully")
-            logging.info(f"Creation time: {round(time.time() - start_time, 2)} seconds")
-        else:
-            logging.error(f"Failed to create index '{index_name}'")
-            logging.error(f"Status code: {response.status_code}")
-            logging.error(f"Response: {response.text}")
-            logging.error("Please check your configuration and try again.")
-            raise Exception(f"Failed to create index '{index_name}'")
+        result = reconcile(client, "indexes", body, allow_rebuild=allow_rebuild, refresh_secrets=refresh_secrets)
+        logging.info(f"Index '{index_name}' {result.action}")
+        logging.info(f"Reconciliation time: {round(time.time() - start_time, 2)} seconds")
 
     except requests.exceptions.ConnectionError:
         logging.error(
-            f"Connection error while creating index. Please verify your network connection and try again."
+            "Connection error while creating index. Please verify your network connection and try again."
         )
         raise
     except requests.exceptions.Timeout:
-        logging.error(f"Timeout error while creating index. Please try again.")
+        logging.error("Timeout error while creating index. Please try again.")
         raise
     except Exception as e:
         logging.error(f"Error creating index '{index_name}': {e}")
         raise e
 
-    return response
-
+    return result.response
 
 if __name__ == "__main__":
     index_name = "vision-ingestion-index-test"
@@ -0,0 +1,301 @@
+import logging
+import time
+import requests
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from AI_Search.Reconciler import reconcile
+from AI_Search.RestClient import SearchRestClient, get_client
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+########################################################
+# Create indexer
+########################################################
+
+
+def build_indexer_body(
+    indexer_name: str,
+    datasource_name: str,
+    search_index_name: str,
+    skillset_name: str,
+    schedule_interval: str = None,
+) -> dict:
+    """
+    Builds the REST definition of an indexer running the chunking skillset.
+
+    Args:
+        indexer_name (str): Name of the indexer
+        datasource_name (str): Datasource the indexer reads from
+        search_index_name (str): Index the chunks are projected to
+        skillset_name (str): Skillset applied to each document
+        schedule_interval (str): Optional ISO 8601 interval, e.g. "PT2H"
+    """
+    body = {
+        "name": indexer_name,
+        "description": f"Indexer for {search_index_name}",
+        "dataSourceName": datasource_name,
+        "targetIndexName": search_index_name,
+        "skillsetName": skillset_name,
+        "parameters": {
+            "configuration": {
+                "dataToExtract": "contentAndMetadata",
+                "parsingMode": "default",
+                "allowSkillsetToReadFileData": False,
+            }
+        },
+        "fieldMappings": [
+            {
+                "sourceFieldName": "metadata_storage_path",
+                "targetFieldName": "document_id",
+                "mappingFunction": {"name": "base64Encode"},
+            }
+        ],
+        "outputFieldMappings": [],
+    }
+    if schedule_interval:
+        body["schedule"] = {"interval": schedule_interval}
+    return body
+
+
+def create_indexer(
+    indexer_name: str,
+    datasource_name: str,
+    search_index_name: str,
+    skillset_name: str,
+    schedule_interval: str = None,
+    service_name: str = None,
+    api_version: str = None,
+    admin_key: str = None,
+    client: SearchRestClient = None,
+):
+    """
+    Creates an indexer or updates it in place.
+
+    Args:
+        indexer_name (str): Name of the indexer
+        datasource_name (str): Datasource the indexer reads from
+        search_index_name (str): Index the chunks are projected to
+        skillset_name (str): Skillset applied to each document
+    """
+    logging.info(f"Starting indexer operation for '{indexer_name}'")
+    start_time = time.time()
+
+    body = build_indexer_body(indexer_name, datasource_name, search_index_name, skillset_name, schedule_interval)
+
+    try:
+        result = reconcile(client or get_client(service_name, admin_key, api_version), "indexers", body)
+        logging.info(f"Indexer '{indexer_name}' {result.action}")
+        logging.info(f"Reconciliation time: {round(time.time() - start_time, 2)} seconds")
+
+    except requests.exceptions.ConnectionError:
+        logging.error("Connection error while creating indexer. Please verify your network connection.")
+        raise
+    except Exception as e:
+        logging.error(f"Error creating indexer '{indexer_name}': {str(e)}")
+        raise
+
+    return result.response
+
+
+########################################################
+# Run and monitor indexer
+########################################################
+
+
+@dataclass
+class IndexerRunMetrics:
+    """Throughput and error telemetry of one indexer execution"""
+
+    indexer_name: str
+    status: str
+    items_processed: int = 0
+    items_failed: int = 0
+    duration_seconds: float = 0.0
+    errors_by_skill: Dict[str, int] = field(default_factory=dict)
+    warnings_by_skill: Dict[str, int] = field(default_factory=dict)
+    error_message: Optional[str] = None
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items_processed / self.duration_seconds if self.duration_seconds > 0 else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        return self.items_failed / self.items_processed if self.items_processed else 0.0
+
+    @property
+    def seconds_per_item(self) -> float:
+        """Average end-to-end enrichment time per document, skills included"""
+        return self.duration_seconds / self.items_processed if self.items_processed else 0.0
+
+    def to_prometheus(self) -> str:
+        """Export the metrics in the Prometheus text exposition format"""
+        label = f'indexer="{self.indexer_name}"'
+        lines = [
+            f"azure_search_indexer_items_processed{{{label}}} {self.items_processed}",
+            f"azure_search_indexer_items_failed{{{label}}} {self.items_failed}",
+            f"azure_search_indexer_duration_seconds{{{label}}} {round(self.duration_seconds, 3)}",
+            f"azure_search_indexer_items_per_second{{{label}}} {round(self.items_per_second, 3)}",
+            f"azure_search_indexer_error_rate{{{label}}} {round(self.error_rate, 4)}",
+        ]
+        for skill, count in sorted(self.errors_by_skill.items()):
+            lines.append(f'azure_search_indexer_skill_errors{{{label},skill="{skill}"}} {count}')
+        for skill, count in sorted(self.warnings_by_skill.items()):
+            lines.append(f'azure_search_indexer_skill_warnings{{{label},skill="{skill}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        return {
+            **asdict(self),
+            "items_per_second": self.items_per_second,
+            "error_rate": self.error_rate,
+            "seconds_per_item": self.seconds_per_item,
+        }
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    # the service returns up to 7 fractional digits, more than fromisoformat accepts
+    value = value.replace("Z", "+00:00")
+    if "." in value:
+        head, tail = value.split(".", 1)
+        digits = len(tail) - len(tail.lstrip("0123456789"))
+        value = f"{head}.{tail[:min(digits, 6)]}{tail[digits:]}"
+    return datetime.fromisoformat(value)
+
+
+def _count_by_skill(items: List[dict]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for item in items or []:
+        # "name" is the skill (or indexer step) that raised the error
+        skill = item.get("name") or "indexer"
+        counts[skill] = counts.get(skill, 0) + 1
+    return counts
+
+
+def execution_metrics(indexer_name: str, execution: dict) -> IndexerRunMetrics:
+    """
+    Compute run metrics from one entry of the indexer execution history
+    """
+    start = _parse_time(execution.get("startTime"))
+    end = _parse_time(execution.get("endTime")) or datetime.now(timezone.utc)
+    return IndexerRunMetrics(
+        indexer_name=indexer_name,
+        status=execution.get("status", "unknown"),
+        items_processed=execution.get("itemsProcessed", 0),
+        items_failed=execution.get("itemsFailed", 0),
+        duration_seconds=(end - start).total_seconds() if start else 0.0,
+        errors_by_skill=_count_by_skill(execution.get("errors")),
+        warnings_by_skill=_count_by_skill(execution.get("warnings")),
+        error_message=execution.get("errorMessage"),
+    )
+
+
+def get_indexer_status(indexer_name: str, client: SearchRestClient) -> dict:
+    return client.request("GET", f"indexers/{indexer_name}/status").json()
+
+
+def run_indexer(indexer_name: str, client: SearchRestClient, reset: bool = False) -> Optional[datetime]:
+    """
+    Trigger an on-demand indexer run, optionally resetting its high-water mark first.
+
+    Returns the start time of the execution before this run (None when there was
+    none), to pass to monitor_indexer(after=...): until the new run starts, the
+    status still reports the previous execution.
+    """
+    previous = _parse_time((get_indexer_status(indexer_name, client).get("lastResult") or {}).get("startTime"))
+    if reset:
+        logging.info(f"Resetting indexer '{indexer_name}'...")
+        client.action("indexers", indexer_name, "reset")
+    logging.info(f"Running indexer '{indexer_name}'...")
+    client.action("indexers", indexer_name, "run")
+    return previous
+
+
+def monitor_indexer(
+    indexer_name: str,
+    client: SearchRestClient,
+    timeout: float = 3600.0,
+    min_interval: float = 1.0,
+    max_interval: float = 30.0,
+    on_progress=None,
+    after: Optional[datetime] = None,
+) -> IndexerRunMetrics:
+    """
+    Poll the execution history until the current run finishes, that is the
+    first execution that started after `after`.
+
+    The polling interval adapts: it shrinks back to min_interval while documents
+    are being processed and doubles (up to max_interval) when nothing changed.
+
+    Args:
+        indexer_name (str): Name of the indexer
+        client (SearchRestClient): client of the search service
+        timeout (float): maximum time to wait for the run
+        on_progress: optional callable receiving IndexerRunMetrics after every poll
+        after: start time of the previous execution, as returned by run_indexer;
+            without it, a run that has not started yet is mistaken for the previous one
+    """
+    deadline = time.time() + timeout
+    interval = min_interval
+    last_processed = None
+
+    while True:
+        status = get_indexer_status(indexer_name, client)
+        execution = status.get("lastResult") or {}
+        started = _parse_time(execution.get("startTime"))
+        if after is not None and (started is None or started <= after):
+            # the run was triggered but hasn't started: this is the previous execution
+            execution = {}
+        metrics = execution_metrics(indexer_name, execution)
+        if on_progress is not None and execution:
+            on_progress(metrics)
+
+        if execution and metrics.status != "inProgress":
+            logging.info(
+                f"Indexer '{indexer_name}' finished with status '{metrics.status}': "
+                f"{metrics.items_processed} items, {metrics.items_failed} failed, "
+                f"{round(metrics.items_per_second, 2)} items/s"
+            )
+            return metrics
+
+        if time.time() >= deadline:
+            raise TimeoutError(f"Indexer '{indexer_name}' did not finish within {timeout} seconds")
+
+        if metrics.items_processed != last_processed:
+            interval = min_interval
+        else:
+            interval = min(interval * 2, max_interval)
+        last_processed = metrics.items_processed
+        time.sleep(min(interval, max(0.0, deadline - time.time())))
+
+
+def execution_history(indexer_name: str, client: SearchRestClient) -> List[IndexerRunMetrics]:
+    """
+    Metrics of the past executions kept by the service, most recent first
+    """
+    status = get_indexer_status(indexer_name, client)
+    return [execution_metrics(indexer_name, execution) for execution in status.get("executionHistory", [])]
+
+
+if __name__ == "__main__":
+    search_index_name = "vision-ingestion-index-test"
+    indexer_name = f"{search_index_name}-indexer"
+    create_indexer(
+        indexer_name=indexer_name,
+        datasource_name="vision-test-datasource",
+        search_index_name=search_index_name,
+        skillset_name=f"{search_index_name}-skillset-chunking",
+    )
+
+    client = get_client()
+    previous_start = run_indexer(indexer_name, client)
+    metrics = monitor_indexer(indexer_name, client, after=previous_start)
+    print(metrics.to_prometheus())
@@ -0,0 +1,253 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from AI_Search.Datasource import create_datasource
+from AI_Search.Index import create_index_body
+from AI_Search.Indexer import create_indexer
+from AI_Search.RestClient import SearchRestClient
+from AI_Search.Skillset import MAX_SKILL_TIMEOUT_SECONDS, create_skillset
+from config import get_settings
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+########################################################
+# Dependency graph execution
+########################################################
+
+
+@dataclass
+class Step:
+    name: str
+    run: Callable[[], Any]
+    depends_on: Tuple[str, ...] = ()
+    ready: Optional[Callable[[], None]] = None  # blocks until the resource is served, before dependents start
+
+
+@dataclass
+class StepResult:
+    name: str
+    status: str  # "succeeded", "failed" or "skipped"
+    seconds: float = 0.0
+    result: Any = None
+    error: Optional[BaseException] = None
+
+
+@dataclass
+class ProvisioningReport:
+    results: Dict[str, StepResult] = field(default_factory=dict)
+    total_seconds: float = 0.0
+
+    @property
+    def succeeded(self) -> bool:
+        return all(r.status == "succeeded" for r in self.results.values())
+
+    def summary(self) -> str:
+        lines = [f"Provisioning finished in {round(self.total_seconds, 2)} seconds"]
+        for result in self.results.values():
+            error = f" ({result.error})" if result.error else ""
+            lines.append(f"  {result.name:<12} {result.status:<10} {round(result.seconds, 2)}s{error}")
+        return "\n".join(lines)
+
+
+def run_steps(steps: List[Step], max_workers: int = 4) -> ProvisioningReport:
+    """
+    Run steps as a dependency graph: every step starts as soon as the steps it
+    depends on have succeeded, independent steps run concurrently. When a step
+    fails, the steps depending on it are skipped.
+
+    Args:
+        steps: the steps to run
+        max_workers: maximum number of steps running at the same time
+    """
+    by_name = {step.name: step for step in steps}
+    for step in steps:
+        unknown = [dep for dep in step.depends_on if dep not in by_name]
+        if unknown:
+            raise ValueError(f"Step '{step.name}' depends on unknown steps: {', '.join(unknown)}")
+
+    report = ProvisioningReport()
+    pending = dict(by_name)
+    running = {}
+    start_time = time.time()
+
+    def execute(step: Step):
+        step_start = time.time()
+        result = step.run()
+        if step.ready is not None:
+            step.ready()
+        return result, time.time() - step_start
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            # skip steps whose dependencies failed
+            for name, step in list(pending.items()):
+                failed = [dep for dep in step.depends_on if dep in report.results and report.results[dep].status != "succeeded"]
+                if failed:
+                    logging.warning(f"Skipping '{name}' because {', '.join(failed)} did not succeed")
+                    report.results[name] = StepResult(name, "skipped")
+                    del pending[name]
+
+            # start every step whose dependencies are done
+            for name, step in list(pending.items()):
+                if all(dep in report.results for dep in step.depends_on):
+                    logging.info(f"Starting step '{name}'")
+                    running[executor.submit(execute, step)] = name
+                    del pending[name]
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    result, seconds = future.result()
+                    report.results[name] = StepResult(name, "succeeded", seconds, result)
+                    logging.info(f"Step '{name}' succeeded in {round(seconds, 2)} seconds")
+                except Exception as e:
+                    report.results[name] = StepResult(name, "failed", error=e)
+                    logging.error(f"Step '{name}' failed: {e}")
+
+    report.total_seconds = time.time() - start_time
+    return report
+
+
+########################################################
+# Provision a full search environment
+########################################################
+
+
+def provision_search_environment(
+    search_index_name: str,
+    datasource_name: str,
+    container_name: str,
+    function_endpoint: str,
+    subfolder=None,
+    connection_string: str = None,
+    service_name: str = None,
+    api_version: str = None,
+    admin_key: str = None,
+    max_workers: int = 4,
+    skill_batch_size: int = 1,
+    skill_degree_of_parallelism: Optional[int] = None,
+    skill_timeout_seconds: int = MAX_SKILL_TIMEOUT_SECONDS,
+    refresh_secrets: bool = False,
+) -> ProvisioningReport:
+    """
+    Provisions index, datasource, skillset and indexer as a dependency graph:
+
+        index ──> skillset ──┐
+        datasource ──────────┴──> indexer
+
+    The index and the datasource are created concurrently, the skillset as soon
+    as the index is ready, and the indexer once everything else is in place.
+    All calls share one pooled SearchRestClient.
+
+    Args:
+        search_index_name (str): Name of the search index
+        datasource_name (str): Name of the blob datasource
+        container_name (str): Blob container to index
+        function_endpoint (str): Endpoint URL for the document chunking function
+        skill_batch_size (int): Documents per call to the chunking function
+        skill_degree_of_parallelism (int): Concurrent calls to the chunking function, the service default (5) when None
+        skill_timeout_seconds (int): Timeout of each call to the chunking function, at most 230 seconds
+        refresh_secrets (bool): Push the keys and the connection string even when nothing else
+            changed, e.g. after rotating them (the service never returns them to compare)
+
+    The connection string and search service arguments default to the settings (config.py).
+    """
+    search = get_settings().search
+    connection_string = connection_string or search.storage_connection_string
+    endpoint = search.service_url if service_name in (None, search.service_name) else None
+    service_name = service_name or search.service_name
+    api_version = api_version or search.api_version
+    admin_key = admin_key or search.admin_key
+    client = SearchRestClient(service_name, admin_key, api_version, pool_size=max(10, max_workers), endpoint=endpoint)
+    skillset_name = f"{search_index_name}-skillset-chunking"
+    indexer_name = f"{search_index_name}-indexer"
+
+    def ready(collection: str, name: str) -> Callable[[], None]:
+        return lambda: client.wait_for(collection, name)
+
+    steps = [
+        Step(
+            "index",
+            lambda: create_index_body(
+                search_index_name, api_version, service_name=service_name, admin_key=admin_key, client=client,
+                refresh_secrets=refresh_secrets,
+            ),
+            ready=ready("indexes", search_index_name),
+        ),
+        Step(
+            "datasource",
+            lambda: create_datasource(
+                service_name,
+                datasource_name,
+                connection_string,
+                container_name,
+                subfolder=subfolder,
+                search_api_version=api_version,
+                admin_key=admin_key,
+                client=client,
+                refresh_secrets=refresh_secrets,
+            ),
+            ready=ready("datasources", datasource_name),
+        ),
+        Step(
+            "skillset",
+            lambda: create_skillset(
+                search_index_name,
+                function_endpoint,
+                service_name=service_name,
+                api_version=api_version,
+                admin_key=admin_key,
+                batch_size=skill_batch_size,
+                degree_of_parallelism=skill_degree_of_parallelism,
+                timeout_seconds=skill_timeout_seconds,
+                client=client,
+                refresh_secrets=refresh_secrets,
+            ),
+            depends_on=("index",),
+            ready=ready("skillsets", skillset_name),
+        ),
+        Step(
+            "indexer",
+            lambda: create_indexer(
+                indexer_name,
+                datasource_name,
+                search_index_name,
+                skillset_name,
+                service_name=service_name,
+                api_version=api_version,
+                admin_key=admin_key,
+                client=client,
+            ),
+            depends_on=("index", "datasource", "skillset"),
+        ),
+    ]
+
+    try:
+        report = run_steps(steps, max_workers=max_workers)
+    finally:
+        client.close()
+
+    logging.info(report.summary())
+    logging.info(f"Search requests:\n{client.report()}")
+    return report
+
+
+if __name__ == "__main__":
+    provision_search_environment(
+        search_index_name="vision-ingestion-index-test",
+        datasource_name="vision-test-datasource",
+        container_name="ragindex-test",
+        function_endpoint="https://document-chunking-az-func.azurewebsites.net",
+    )
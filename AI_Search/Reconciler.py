@@ -0,0 +1,220 @@
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from AI_Search.RestClient import SearchRestClient
+
+########################################################
+# Declarative reconciliation of AI Search resources
+########################################################
+#
+# Instead of deleting and recreating a resource on every run (which wipes an
+# index and forces a full re-ingestion), reconcile() fetches the current
+# definition, computes a structural diff against the desired one and:
+#   - does nothing when they match
+#   - PUTs the desired definition in place when the service allows the change
+#   - PUTs it unchanged with refresh_secrets, to push rotated secrets, which GET
+#     never returns to compare
+#   - deletes and recreates only when the change cannot be applied in place
+#
+# Datasources, skillsets and indexers can always be updated in place. Index
+# updates are restricted by the service: fields can be added but not removed
+# or redefined, except for a handful of attributes.
+
+# keys added by the service that never take part in the diff
+IGNORED_KEYS = {"@odata.context", "@odata.etag"}
+
+# secrets are returned as null by GET, so they can't be compared: a desired secret
+# is reported as a "secret" change, which is only PUT with refresh_secrets
+SECRET_KEYS = {"apiKey", "connectionString", "key", "authResourceId"}
+
+# attributes of an existing index field that can be changed in place
+UPDATABLE_FIELD_ATTRIBUTES = {"retrievable", "searchAnalyzer", "synonymMaps"}
+
+# sections of an index whose existing entries can be modified in place
+UPDATABLE_INDEX_SECTIONS = {
+    ("scoringProfiles",),
+    ("defaultScoringProfile",),
+    ("corsOptions",),
+    ("semantic",),
+    ("description",),
+    ("vectorSearch", "vectorizers"),
+}
+
+
+@dataclass
+class Change:
+    path: Tuple[str, ...]
+    kind: str  # "added", "removed", "modified" or "secret"
+    current: Any = None
+    desired: Any = None
+
+    def __str__(self):
+        return f"{self.kind} {'.'.join(self.path)}"
+
+
+@dataclass
+class ReconcileResult:
+    name: str
+    action: str  # "unchanged", "created", "updated", "secrets-refreshed" or "rebuilt"
+    changes: List[Change] = field(default_factory=list)
+    response: Optional[requests.Response] = None
+
+
+# ISO 8601 durations (skill timeouts, indexer schedules): PT230S and PT3M50S are equal
+_DURATION = re.compile(r"^P(?:(?P<days>\d+)D)?(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?$")
+
+
+def _duration_seconds(value) -> Optional[float]:
+    match = _DURATION.match(value) if isinstance(value, str) and len(value) > 1 else None
+    if match is None or not any(match.groupdict().values()):
+        return None
+    parts = {name: float(part or 0) for name, part in match.groupdict().items()}
+    return parts["days"] * 86400 + parts["hours"] * 3600 + parts["minutes"] * 60 + parts["seconds"]
+
+
+def _is_empty(value) -> bool:
+    return value is None or value == [] or value == {} or value == ""
+
+
+def _is_named_list(value) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(v, dict) and "name" in v for v in value)
+
+
+def diff_definitions(current, desired, path: Tuple[str, ...] = ()) -> List[Change]:
+    """
+    Structural diff of two resource definitions.
+
+    Only keys present in the desired definition are compared, so defaults the
+    service fills in do not show up as changes. Lists of named objects (fields,
+    skills, profiles...) are matched by name rather than position.
+
+    Args:
+        current: the definition returned by the service
+        desired: the definition we want
+    """
+    if isinstance(desired, dict) and isinstance(current, dict):
+        changes = []
+        for key, value in desired.items():
+            if key in IGNORED_KEYS:
+                continue
+            if key in SECRET_KEYS and current.get(key) is None:
+                if not _is_empty(value):
+                    # never log or keep the secret itself
+                    changes.append(Change(path + (key,), "secret", None, "<secret>"))
+                continue
+            changes.extend(diff_definitions(current.get(key), value, path + (key,)))
+        return changes
+
+    if _is_named_list(desired) and (current is None or _is_named_list(current) or current == []):
+        current_by_name = {item["name"]: item for item in current or []}
+        desired_names = {item["name"] for item in desired}
+        changes = []
+        for item in desired:
+            if item["name"] not in current_by_name:
+                changes.append(Change(path + (item["name"],), "added", None, item))
+            else:
+                changes.extend(diff_definitions(current_by_name[item["name"]], item, path + (item["name"],)))
+        for name, item in current_by_name.items():
+            if name not in desired_names:
+                changes.append(Change(path + (name,), "removed", item, None))
+        return changes
+
+    if _is_empty(current) and _is_empty(desired):
+        return []
+    duration = _duration_seconds(desired)
+    if duration is not None and duration == _duration_seconds(current):
+        return []
+    if current != desired:
+        kind = "added" if _is_empty(current) else "modified"
+        return [Change(path, kind, current, desired)]
+    return []
+
+
+def index_rebuild_reasons(changes: List[Change]) -> List[str]:
+    """
+    Return the changes that cannot be applied to an existing index in place
+    """
+    reasons = []
+    for change in changes:
+        path = change.path
+        if change.kind == "secret":
+            continue
+        # new fields and new vector algorithms, profiles, vectorizers or compressions
+        if change.kind == "added" and (
+            (path[0] == "fields" and len(path) == 2) or (path[0] == "vectorSearch" and len(path) == 3)
+        ):
+            continue
+        if path[:1] in UPDATABLE_INDEX_SECTIONS or path[:2] in UPDATABLE_INDEX_SECTIONS:
+            continue
+        if path[0] == "fields" and change.kind == "modified" and len(path) == 3 and path[2] in UPDATABLE_FIELD_ATTRIBUTES:
+            continue
+        if path[:2] == ("vectorSearch", "algorithms") and path[-1] == "efSearch":
+            continue
+        reasons.append(str(change))
+    return reasons
+
+
+########################################################
+# Reconcile
+########################################################
+
+
+def reconcile(
+    client: SearchRestClient,
+    collection: str,
+    desired: Dict[str, Any],
+    allow_rebuild: bool = True,
+    refresh_secrets: bool = False,
+) -> ReconcileResult:
+    """
+    Bring an AI Search resource to the desired definition with the least disruptive operation.
+
+    Args:
+        client: the SearchRestClient of the search service
+        collection: "indexes", "datasources", "skillsets" or "indexers"
+        desired: the full desired definition, including its name
+        allow_rebuild: when False, raise instead of dropping an index that cannot be updated in place
+        refresh_secrets: PUT the desired definition when only its secrets may differ, e.g. after
+            rotating a key. Off by default: secrets can't be compared, so every run would update.
+    """
+    name = desired["name"]
+
+    logging.info(f"Reconciling {collection} '{name}'...")
+    current_response = client.request("GET", f"{collection}/{name}", expected=(200, 404))
+
+    if current_response.status_code == 404:
+        response = client.put(collection, name, desired)
+        logging.info(f"Created {collection} '{name}'")
+        return ReconcileResult(name, "created", response=response)
+
+    changes = diff_definitions(current_response.json(), desired)
+    if all(change.kind == "secret" for change in changes):
+        if changes and refresh_secrets:
+            response = client.put(collection, name, desired)
+            logging.info(f"Refreshed the secrets of {collection} '{name}'")
+            return ReconcileResult(name, "secrets-refreshed", changes, response)
+        logging.info(f"{collection} '{name}' is up to date")
+        return ReconcileResult(name, "unchanged", response=current_response)
+
+    for change in changes:
+        logging.info(f"  {change}")
+
+    reasons = index_rebuild_reasons(changes) if collection == "indexes" else []
+    if not reasons:
+        response = client.put(collection, name, desired)
+        logging.info(f"Updated {collection} '{name}' in place ({len(changes)} changes)")
+        return ReconcileResult(name, "updated", changes, response)
+
+    if not allow_rebuild:
+        raise Exception(f"{collection} '{name}' needs to be rebuilt: {', '.join(reasons)}")
+
+    logging.warning(f"{collection} '{name}' must be rebuilt: {', '.join(reasons)}")
+    client.delete(collection, name)
+    client.wait_for(collection, name, exists=False)
+    response = client.put(collection, name, desired)
+    logging.info(f"Rebuilt {collection} '{name}'")
+    return ReconcileResult(name, "rebuilt", changes, response)
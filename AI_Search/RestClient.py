@@ -0,0 +1,263 @@
+import functools
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from Telemetry import SEARCH, telemetry
+
+########################################################
+# Search management REST client
+########################################################
+#
+# All AI Search management calls go through one pooled keep-alive session with
+# default timeouts, a unified retry/backoff policy for throttling (429) and
+# transient unavailability (503), and per-request latency instrumentation. Every
+# request is also a span of the shared Telemetry (Telemetry.py).
+
+DEFAULT_API_VERSION = "2024-11-01-preview"
+RETRY_STATUS_CODES = {429, 503}
+
+
+class SearchRequestError(Exception):
+    """Raised when the search service returns an unexpected status code"""
+
+    def __init__(self, method: str, path: str, status_code: int, text: str):
+        super().__init__(f"{method} {path} failed with status {status_code}: {text}")
+        self.method = method
+        self.path = path
+        self.status_code = status_code
+        self.text = text
+
+
+@dataclass
+class RequestStats:
+    """Aggregated request metrics per (method, collection)"""
+
+    count: int = 0
+    errors: int = 0
+    retries: int = 0
+    throttled: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    @property
+    def average_seconds(self) -> float:
+        return self.total_seconds / self.count if self.count else 0.0
+
+
+class SearchRestClient:
+    """
+    Typed client for the AI Search management REST API.
+
+    Args:
+        service_name: name of the search service
+        admin_key: the search admin key
+        api_version: REST API version
+        timeout: default (connect, read) timeout in seconds
+        max_retries: retries on 429/503 and connection errors
+        backoff: initial backoff in seconds, doubled on each retry
+        pool_size: maximum number of pooled connections
+        endpoint: base URL override, e.g. a local FakeSearchService
+    """
+
+    def __init__(
+        self,
+        service_name: str,
+        admin_key: str,
+        api_version: str = DEFAULT_API_VERSION,
+        timeout=(5, 60),
+        max_retries: int = 4,
+        backoff: float = 1.0,
+        pool_size: int = 10,
+        endpoint: str = None,
+    ):
+        self.service_name = service_name
+        self.api_version = api_version
+        self.base_url = (endpoint or f"https://{service_name}.search.windows.net").rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json", "api-key": admin_key})
+
+        self._stats: Dict[str, RequestStats] = defaultdict(RequestStats)
+        self._stats_lock = threading.Lock()
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    ########################################################
+    # Low level request with retry and instrumentation
+    ########################################################
+
+    def url(self, path: str) -> str:
+        separator = "&" if "?" in path else "?"
+        return f"{self.base_url}/{path.lstrip('/')}{separator}api-version={self.api_version}"
+
+    def _record(self, key: str, seconds: float, error: bool = False, retry: bool = False, throttled: bool = False):
+        with self._stats_lock:
+            stats = self._stats[key]
+            if retry:
+                stats.retries += 1
+                stats.throttled += int(throttled)
+                return
+            stats.count += 1
+            stats.errors += int(error)
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+
+    def _retry_delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return float(retry_after)
+                except ValueError:
+                    pass
+        # exponential backoff with jitter
+        return self.backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+
+    def request(self, method: str, path: str, expected=(200, 201, 204), **kwargs) -> requests.Response:
+        """
+        Send a request, retrying throttled and transient failures.
+
+        Args:
+            method: HTTP method
+            path: path relative to the service, e.g. "indexes/my-index"
+            expected: status codes returned without raising
+        """
+        url = self.url(path)
+        key = f"{method} {path.split('/')[0]}"
+        # document calls (indexes/<name>/docs/search) are reported apart from index management
+        operation = f"{method} docs/{path.split('?')[0].rsplit('/', 1)[-1]}" if "/docs" in path else key
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+
+        with telemetry.span(SEARCH, operation, service_name=self.service_name) as span:
+            while True:
+                start_time = time.perf_counter()
+                response = None
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    if attempt >= self.max_retries:
+                        self._record(key, time.perf_counter() - start_time, error=True)
+                        raise
+                    logging.warning(f"{method} {path}: {type(e).__name__}, retrying...")
+                else:
+                    span.add(bytes_sent=len(response.request.body or b""), bytes_received=len(response.content))
+                    if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                        seconds = time.perf_counter() - start_time
+                        error = response.status_code not in expected
+                        self._record(key, seconds, error=error)
+                        span.set(status_code=response.status_code)
+                        logging.debug(f"{method} {path} -> {response.status_code} in {round(seconds, 3)} seconds")
+                        if error:
+                            raise SearchRequestError(method, path, response.status_code, response.text)
+                        return response
+                    logging.warning(f"{method} {path}: status {response.status_code}, retrying...")
+
+                delay = self._retry_delay(attempt, response)
+                throttled = response is not None and response.status_code == 429
+                self._record(key, 0.0, retry=True, throttled=throttled)
+                span.retry(throttled)
+                time.sleep(delay)
+                attempt += 1
+
+    ########################################################
+    # Resources
+    ########################################################
+
+    def get(self, collection: str, name: str) -> Optional[Dict[str, Any]]:
+        """Return the definition of a resource, or None when it does not exist"""
+        response = self.request("GET", f"{collection}/{name}", expected=(200, 404))
+        return None if response.status_code == 404 else response.json()
+
+    def exists(self, collection: str, name: str) -> bool:
+        return self.request("GET", f"{collection}/{name}", expected=(200, 404)).status_code == 200
+
+    def list(self, collection: str) -> List[Dict[str, Any]]:
+        return self.request("GET", collection).json().get("value", [])
+
+    def put(self, collection: str, name: str, body: Dict[str, Any]) -> requests.Response:
+        """Create or update a resource"""
+        return self.request("PUT", f"{collection}/{name}", json=body)
+
+    def delete(self, collection: str, name: str) -> bool:
+        """Delete a resource, returning False when it did not exist"""
+        return self.request("DELETE", f"{collection}/{name}", expected=(200, 204, 404)).status_code != 404
+
+    def action(self, collection: str, name: str, action: str, body: Optional[Dict[str, Any]] = None) -> requests.Response:
+        """Run an action on a resource, e.g. action("indexers", name, "reset")"""
+        return self.request("POST", f"{collection}/{name}/{action}", expected=(200, 202, 204), json=body)
+
+    def wait_for(self, collection: str, name: str, exists: bool = True, timeout: float = 60.0, interval: float = 0.25):
+        """
+        Poll a resource until it exists (or is gone), instead of sleeping a fixed delay
+        """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.exists(collection, name) == exists:
+                return
+            time.sleep(interval)
+            interval = min(interval * 2, 5.0)
+        state = "ready" if exists else "deleted"
+        raise TimeoutError(f"{collection}/{name} was not {state} within {timeout} seconds")
+
+    ########################################################
+    # Instrumentation
+    ########################################################
+
+    def stats(self) -> Dict[str, RequestStats]:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def report(self) -> str:
+        lines = [f"{'request':<24}{'count':>6}{'errors':>7}{'retries':>8}{'avg (s)':>9}{'max (s)':>9}"]
+        for key, stats in sorted(self.stats().items()):
+            lines.append(
+                f"{key:<24}{stats.count:>6}{stats.errors:>7}{stats.retries:>8}"
+                f"{round(stats.average_seconds, 3):>9}{round(stats.max_seconds, 3):>9}"
+            )
+        return "\n".join(lines)
+
+
+@functools.lru_cache(maxsize=None)
+def _shared_client(service_name: str, admin_key: str, api_version: str, endpoint: str = None) -> SearchRestClient:
+    return SearchRestClient(service_name, admin_key, api_version, endpoint=endpoint)
+
+
+def get_client(service_name: str = None, admin_key: str = None, api_version: str = None) -> SearchRestClient:
+    """
+    Shared client per service, so every module reuses the same pooled connections.
+    Arguments left out are taken from the search settings (config.get_settings),
+    including the service URL override (AZURE_SEARCH_SERVICE_URL) of the configured service.
+    """
+    endpoint = None
+    if service_name is None or admin_key is None or api_version is None:
+        from config import get_settings
+
+        search = get_settings().search
+        if service_name in (None, search.service_name):
+            endpoint = search.service_url
+        service_name = service_name or search.service_name
+        admin_key = admin_key or search.admin_key
+        api_version = api_version or search.api_version or DEFAULT_API_VERSION
+    return _shared_client(service_name, admin_key, api_version, endpoint)
@@ -0,0 +1,280 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence
+
+from AI_Search.RestClient import SearchRestClient, get_client
+from AI_Search.Schema import CHUNK_INDEX, IndexSchema
+
+logger = logging.getLogger(__name__)
+
+########################################################
+# Query path of the search index
+########################################################
+#
+# Retriever runs keyword, vector and hybrid (keyword + vector, fused by the
+# service) queries against an index described by an IndexSchema, with
+# semantic reranking through the index semantic configuration. Queries go
+# through the pooled SearchRestClient. Two caches keep repeated questions fast:
+#
+#   - query embeddings, so the same text is only embedded once
+#   - results, keyed on the normalized query, mode, filters and precomputed vector
+#
+# Without an embed function, vector queries are sent as text and embedded by
+# the vectorizer of the index.
+#
+#     retriever = Retriever(get_client(service, key), "financial-index", embed=embed)
+#     results = retriever.search("revenue growth in 2023", mode="hybrid", top=5)
+
+KEYWORD = "keyword"
+VECTOR = "vector"
+HYBRID = "hybrid"
+MODES = (KEYWORD, VECTOR, HYBRID)
+
+# vector candidates fed to the fusion of hybrid queries
+HYBRID_VECTOR_K = 50
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold and collapse whitespace, so trivially different questions share cache entries"""
+    return re.sub(r"\s+", " ", query).strip().casefold()
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with an optional time to live
+
+    Args:
+        maxsize: maximum number of entries
+        ttl: seconds an entry stays valid, None to keep entries until evicted
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[1] < self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def info(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+@dataclass
+class SearchResult:
+    id: str
+    score: float
+    content: str
+    reranker_score: Optional[float] = None
+    fields: Dict[str, Any] = field(default_factory=dict)
+
+
+class Retriever:
+    """
+    Keyword, vector and hybrid queries against one index
+
+    Args:
+        client: pooled client of the search service
+        index_name: the index to query
+        schema: schema of the index, CHUNK_INDEX by default
+        embed: optional callable turning a query into a vector; the index vectorizer is used when omitted
+        cache_size: number of cached result lists
+        cache_ttl: seconds a cached result list stays valid
+        embedding_cache_size: number of cached query embeddings
+    """
+
+    def __init__(
+        self,
+        client: SearchRestClient,
+        index_name: str = "financial-index",
+        schema: IndexSchema = CHUNK_INDEX,
+        embed: Optional[Callable[[str], Sequence[float]]] = None,
+        cache_size: int = 256,
+        cache_ttl: Optional[float] = 300.0,
+        embedding_cache_size: int = 1024,
+    ):
+        self.client = client
+        self.index_name = index_name
+        self.schema = schema
+        self.embed = embed
+        self.results = LRUCache(cache_size, cache_ttl)
+        self.embeddings = LRUCache(embedding_cache_size)
+
+        self.key_field = schema.key_field.name
+        self.content_field = schema.content_fields[0]
+        self.vector_field = schema.vector_fields[0].name
+        # vectors are never returned, they are large and not needed by callers
+        self.select = [f.name for f in schema.fields if f.retrievable and not f.vector]
+
+    ########################################################
+    # Embeddings
+    ########################################################
+
+    def embed_query(self, query: str) -> Sequence[float]:
+        """Embed the query through the embedding cache"""
+        key = normalize_query(query)
+        vector = self.embeddings.get(key)
+        if vector is None:
+            start_time = time.perf_counter()
+            vector = self.embed(query)
+            logger.debug(f"Embedded query in {round(time.perf_counter() - start_time, 3)} seconds")
+            self.embeddings.put(key, vector)
+        return vector
+
+    def _vector_query(self, query: str, k: int, vector: Optional[Sequence[float]]) -> dict:
+        if vector is None and self.embed is not None:
+            vector = self.embed_query(query)
+        if vector is None:
+            return {"kind": "text", "text": query, "fields": self.vector_field, "k": k}
+        return {"kind": "vector", "vector": list(vector), "fields": self.vector_field, "k": k}
+
+    ########################################################
+    # Queries
+    ########################################################
+
+    def build_body(
+        self,
+        query: str,
+        mode: str = HYBRID,
+        top: int = 5,
+        filter: Optional[str] = None,
+        semantic: bool = True,
+        vector: Optional[Sequence[float]] = None,
+    ) -> dict:
+        """
+        Build the body of a docs/search request.
+
+        Args:
+            query: the question
+            mode: "keyword", "vector" or "hybrid"
+            top: number of results
+            filter: OData filter, e.g. "page_number le 10"
+            semantic: rerank with the semantic configuration (keyword and hybrid modes)
+            vector: precomputed query embedding, skips the embed call
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown search mode '{mode}', expected one of {', '.join(MODES)}")
+
+        body: Dict[str, Any] = {"top": top, "select": ",".join(self.select)}
+        if filter:
+            body["filter"] = filter
+        if mode in (KEYWORD, HYBRID):
+            body["search"] = query
+            if semantic:
+                body["queryType"] = "semantic"
+                body["semanticConfiguration"] = self.schema.semantic_configuration
+        if mode in (VECTOR, HYBRID):
+            k = max(top, HYBRID_VECTOR_K) if mode == HYBRID else top
+            body["vectorQueries"] = [self._vector_query(query, k, vector)]
+        return body
+
+    def search(
+        self,
+        query: str,
+        mode: str = HYBRID,
+        top: int = 5,
+        filter: Optional[str] = None,
+        semantic: bool = True,
+        vector: Optional[Sequence[float]] = None,
+        use_cache: bool = True,
+    ) -> List[SearchResult]:
+        """
+        Run a query, answering repeated questions from the result cache.
+
+        Args:
+            query: the question
+            mode: "keyword", "vector" or "hybrid"
+            top: number of results
+            filter: OData filter, e.g. "page_number le 10"
+            semantic: rerank with the semantic configuration (keyword and hybrid modes)
+            vector: precomputed query embedding, skips the embed call
+            use_cache: set to False to always query the service
+        """
+        # a precomputed embedding decides the results as much as the text, keyword queries ignore it
+        embedding = tuple(map(float, vector)) if vector is not None and mode != KEYWORD else None
+        key = (mode, normalize_query(query), filter, top, semantic, embedding)
+        if use_cache:
+            cached = self.results.get(key)
+            if cached is not None:
+                logger.debug(f"Result cache hit for {mode} query '{query}'")
+                # a copy, so a caller reordering or trimming its results leaves the cache intact
+                return list(cached)
+
+        start_time = time.perf_counter()
+        body = self.build_body(query, mode, top, filter, semantic, vector)
+        response = self.client.request("POST", f"indexes/{self.index_name}/docs/search", expected=(200,), json=body)
+        results = [self._to_result(document) for document in response.json().get("value", [])]
+        logger.info(f"{mode} query returned {len(results)} results in {round(time.perf_counter() - start_time, 3)} seconds")
+
+        if use_cache:
+            self.results.put(key, list(results))
+        return results
+
+    def keyword(self, query: str, **kwargs) -> List[SearchResult]:
+        return self.search(query, mode=KEYWORD, **kwargs)
+
+    def vector(self, query: str, **kwargs) -> List[SearchResult]:
+        return self.search(query, mode=VECTOR, **kwargs)
+
+    def hybrid(self, query: str, **kwargs) -> List[SearchResult]:
+        return self.search(query, mode=HYBRID, **kwargs)
+
+    def _to_result(self, document: dict) -> SearchResult:
+        fields = {k: v for k, v in document.items() if not k.startswith("@search.")}
+        return SearchResult(
+            id=str(document.get(self.key_field)),
+            score=document.get("@search.score") or 0.0,
+            content=document.get(self.content_field) or "",
+            reranker_score=document.get("@search.rerankerScore"),
+            fields=fields,
+        )
+
+    def cache_info(self) -> Dict[str, Dict[str, Any]]:
+        return {"results": self.results.info(), "embeddings": self.embeddings.info()}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    from config import get_settings
+
+    retriever = Retriever(get_client(), get_settings().search.index_name)
+    for _ in range(2):
+        for result in retriever.hybrid("What was the revenue growth?", top=3):
+            print(round(result.reranker_score or result.score, 3), result.fields.get("url"), result.content[:80])
+    print(retriever.cache_info())
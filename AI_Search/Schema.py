@@ -0,0 +1,286 @@
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from AI_Search.VectorProfiles import VectorProfile, apply_profile, get_profile
+
+########################################################
+# Typed index schemas
+########################################################
+#
+# The fields of each index are declared once, as an IndexSchema. The schema
+# generates the REST body used to create or reconcile the index and validates
+# documents before they are uploaded, so the index definition and the
+# documents pushed to it can't drift apart. Vector dimensions come from the
+# embedding model registry below instead of a live embedding call.
+#
+#     body = CHUNK_INDEX.to_rest("financial-index", vectorizer_uri, api_key=key)
+#     valid, rejected = CHUNK_INDEX.validate_documents(documents)
+#
+# schema.json is an export of CHUNK_INDEX: python -m AI_Search.Schema > schema.json
+
+# output dimensions of the embedding models we deploy
+EMBEDDING_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+
+def embedding_dimensions(model: str, dimensions: Optional[int] = None) -> int:
+    """
+    Dimensions of an embedding model, without calling it.
+
+    Args:
+        model: model name, e.g. "text-embedding-3-small"
+        dimensions: explicit value, for shortened text-embedding-3 outputs or unknown models
+    """
+    if dimensions:
+        return dimensions
+    try:
+        return EMBEDDING_DIMENSIONS[model]
+    except KeyError:
+        raise ValueError(
+            f"Unknown embedding model '{model}', pass its dimensions explicitly "
+            f"or add it to EMBEDDING_DIMENSIONS"
+        ) from None
+
+
+# python types accepted for each EDM type when validating documents
+_PYTHON_TYPES = {
+    "Edm.String": (str,),
+    "Edm.Int32": (int,),
+    "Edm.Int64": (int,),
+    "Edm.Double": (int, float),
+    "Edm.Boolean": (bool,),
+    "Edm.DateTimeOffset": (str,),
+}
+
+
+@dataclass(frozen=True)
+class Field:
+    name: str
+    type: str = "Edm.String"
+    key: bool = False
+    searchable: bool = False
+    filterable: bool = False
+    sortable: bool = False
+    facetable: bool = False
+    retrievable: bool = True
+    stored: bool = True
+    analyzer: Optional[str] = None
+    vector: bool = False  # Collection(Edm.Single) field searched with the vector profile
+
+    def to_rest(self, dimensions: int = None, vector_profile_name: str = None) -> dict:
+        definition = {
+            "name": self.name,
+            "type": "Collection(Edm.Single)" if self.vector else self.type,
+            "searchable": self.searchable or self.vector,
+            "filterable": self.filterable,
+            "retrievable": self.retrievable,
+            "stored": self.stored,
+            "sortable": self.sortable,
+            "facetable": self.facetable,
+            "key": self.key,
+        }
+        if self.analyzer:
+            definition["analyzer"] = self.analyzer
+        if self.vector:
+            definition["dimensions"] = dimensions
+            definition["vectorSearchProfile"] = vector_profile_name
+        definition["synonymMaps"] = []
+        return definition
+
+    def check(self, value: Any, dimensions: int) -> Optional[str]:
+        """Return a problem with value, or None when it can be uploaded to this field"""
+        if value is None:
+            return f"'{self.name}' is the key and can't be empty" if self.key else None
+        if self.vector:
+            if not hasattr(value, "__len__") or isinstance(value, (str, bytes)):
+                return f"'{self.name}' must be a list of floats, got {type(value).__name__}"
+            if len(value) != dimensions:
+                return f"'{self.name}' has {len(value)} dimensions, the index expects {dimensions}"
+            return None
+        expected = _PYTHON_TYPES.get(self.type)
+        # bool is an int subclass, reject it for numeric fields
+        if expected and (not isinstance(value, expected) or (isinstance(value, bool) and bool not in expected)):
+            return f"'{self.name}' must be {self.type}, got {type(value).__name__} {value!r}"
+        if self.key and not value:
+            return f"'{self.name}' is the key and can't be empty"
+        return None
+
+
+@dataclass(frozen=True)
+class IndexSchema:
+    """
+    Args:
+        fields: the fields of the index
+        title_field: semantic ranking title field
+        content_fields: semantic ranking content fields
+        embedding_model: model producing the vectors, used for dimensions and the vectorizer
+        algorithm_name, vector_profile_name, vectorizer_name: names of the vectorSearch entries
+        semantic_configuration: name of the default semantic configuration
+    """
+
+    fields: Tuple[Field, ...]
+    title_field: str
+    content_fields: Tuple[str, ...]
+    algorithm_name: str
+    vector_profile_name: str
+    vectorizer_name: str
+    embedding_model: str = "text-embedding-3-small"
+    semantic_configuration: str = "financial-index-semantic-configuration"
+    _by_name: Dict[str, Field] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_by_name", {f.name: f for f in self.fields})
+
+    @property
+    def key_field(self) -> Field:
+        return next(f for f in self.fields if f.key)
+
+    @property
+    def vector_fields(self) -> List[Field]:
+        return [f for f in self.fields if f.vector]
+
+    def to_rest(
+        self,
+        index_name: str,
+        vectorizer_uri: str,
+        api_key: Optional[str] = None,
+        deployment: Optional[str] = None,
+        dimensions: Optional[int] = None,
+        vector_profile: Union[str, VectorProfile] = "default",
+    ) -> dict:
+        """
+        Generate the REST body of the index.
+
+        Args:
+            index_name: name of the index
+            vectorizer_uri: Azure OpenAI resource used to vectorize queries
+            api_key: Azure OpenAI key of the vectorizer
+            deployment: embedding deployment name, the model name by default
+            dimensions: overrides the dimensions of the model registry
+            vector_profile: preset name or VectorProfile of the vector fields
+        """
+        dimensions = embedding_dimensions(self.embedding_model, dimensions)
+        body = {
+            "name": index_name,
+            "fields": [f.to_rest(dimensions, self.vector_profile_name) for f in self.fields],
+            "scoringProfiles": [],
+            "suggesters": [],
+            "analyzers": [],
+            "normalizers": [],
+            "tokenizers": [],
+            "tokenFilters": [],
+            "charFilters": [],
+            "similarity": {"@odata.type": "#Microsoft.Azure.Search.BM25Similarity"},
+            "semantic": {
+                "defaultConfiguration": self.semantic_configuration,
+                "configurations": [
+                    {
+                        "name": self.semantic_configuration,
+                        "prioritizedFields": {
+                            "titleField": {"fieldName": self.title_field},
+                            "prioritizedContentFields": [{"fieldName": name} for name in self.content_fields],
+                            "prioritizedKeywordsFields": [],
+                        },
+                    }
+                ],
+            },
+            "vectorSearch": {
+                "algorithms": [{"name": self.algorithm_name}],
+                "profiles": [{"name": self.vector_profile_name}],
+                "vectorizers": [
+                    {
+                        "name": self.vectorizer_name,
+                        "kind": "azureOpenAI",
+                        "azureOpenAIParameters": {
+                            "resourceUri": vectorizer_uri,
+                            "deploymentId": deployment or self.embedding_model,
+                            "apiKey": api_key,
+                            "modelName": self.embedding_model,
+                        },
+                    }
+                ],
+                "compressions": [],
+            },
+        }
+        if isinstance(vector_profile, str):
+            vector_profile = get_profile(vector_profile)
+        return apply_profile(body, vector_profile)
+
+    def validate(self, document: Dict[str, Any], dimensions: Optional[int] = None) -> List[str]:
+        """
+        Return the problems that would make the service reject the document, empty when valid
+        """
+        dimensions = embedding_dimensions(self.embedding_model, dimensions)
+        problems = [f"unknown field '{name}'" for name in document if name not in self._by_name]
+        for f in self.fields:
+            if f.key and f.name not in document:
+                problems.append(f"missing key field '{f.name}'")
+                continue
+            problem = f.check(document.get(f.name), dimensions)
+            if problem:
+                problems.append(problem)
+        return problems
+
+    def validate_documents(self, documents: List[Dict[str, Any]], dimensions: Optional[int] = None):
+        """
+        Split documents into (valid, rejected), rejected being (document, problems) pairs
+        """
+        valid, rejected = [], []
+        for document in documents:
+            problems = self.validate(document, dimensions)
+            if problems:
+                rejected.append((document, problems))
+            else:
+                valid.append(document)
+        return valid, rejected
+
+
+########################################################
+# Index schemas
+########################################################
+
+# index filled by AddData2AISearch.upload_to_search, created by CreateAISearchIndex.py
+CHUNK_INDEX = IndexSchema(
+    fields=(
+        Field("doc_id", key=True, filterable=True, sortable=True),
+        Field("page_number", type="Edm.Int32", filterable=True, sortable=True),
+        Field("url", filterable=True),
+        Field("file_name", searchable=True, filterable=True, sortable=True),
+        Field("title", searchable=True, analyzer="en.microsoft"),
+        Field("content", searchable=True, analyzer="en.microsoft"),
+        Field("vector", vector=True),
+    ),
+    title_field="title",
+    content_fields=("content",),
+    algorithm_name="vector-algorithm",
+    vector_profile_name="vector-profile",
+    vectorizer_name="vector-vectorizer",
+)
+
+# index filled by the indexer through the chunking skillset projections, created by AI_Search/Index.py
+PROJECTION_INDEX = IndexSchema(
+    fields=(
+        Field("chunk_id", key=True, searchable=True, filterable=True, sortable=True, analyzer="keyword"),
+        Field("parent_id", filterable=True),
+        Field("chunk", searchable=True),
+        Field("title", searchable=True),
+        Field("document_id", searchable=True, filterable=True, analyzer="standard.lucene"),
+        Field("text_vector", vector=True),
+        Field("date_last_modified", type="Edm.DateTimeOffset", filterable=True, sortable=True, facetable=True),
+        Field("url", searchable=True),
+        Field("file_name", searchable=True),
+    ),
+    title_field="title",
+    content_fields=("chunk",),
+    algorithm_name="financial-index-algorithm",
+    vector_profile_name="financial-index-azureOpenAi-text-profile",
+    vectorizer_name="financial-index-azureOpenAi-text-vectorizer",
+)
+
+
+if __name__ == "__main__":
+    print(json.dumps(CHUNK_INDEX.to_rest("test-index", "<redacted>", api_key="<redacted>"), indent=2))
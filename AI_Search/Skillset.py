@@ -1,11 +1,10 @@
 import logging
 import time
-import os
 import requests
 from typing import Optional
-import json
-from dotenv import load_dotenv
-load_dotenv()
+from AI_Search.Reconciler import reconcile
+from AI_Search.RestClient import SearchRestClient, get_client
+from config import get_settings
 
 # set up logging configuration globally
 # logging.getLogger("azure").setLevel(logging.WARNING)
@@ -21,42 +20,33 @@ logging.basicConfig(
 # Constants
 ########################################################
 
-document_chunking_func_key = os.getenv("DOCUMENT_CHUNKING_FUNCTION_KEY")
-cognitive_service_key = os.getenv("COGNITIVE_SERVICES_KEY")
-storage_connection_string = os.getenv("STORAGE_CONNECTION_STRING")
-search_api_version = "2024-11-01-preview"
-azure_search_admin_key = os.getenv("AZURE_SEARCH_ADMIN_KEY")
-search_service_name = os.getenv("AZURE_SEARCH_SERVICE_NAME")
-azure_openai_api_key = os.getenv("AZURE_OPENAI_API_KEY")
+# the service rejects WebApiSkill timeouts above 230 seconds
+MAX_SKILL_TIMEOUT_SECONDS = 230
 
 ########################################################
 # Delete skillset
 ########################################################
 
 def delete_skillset(skillset_name: str,
-                   service_name: str = search_service_name,
-                   api_version: str = search_api_version,
-                   admin_key: str = azure_search_admin_key):
+                   service_name: str = None,
+                   api_version: str = None,
+                   admin_key: str = None,
+                   client: SearchRestClient = None):
     """
     Deletes an existing skillset.
 
     Args:
         skillset_name (str): Name of the skillset to delete
     """
-    endpoint = f"https://{service_name}.search.windows.net/skillsets/{skillset_name}?api-version={api_version}"
-    headers = {"Content-Type": "application/json", "api-key": admin_key}
+    client = client or get_client(service_name, admin_key, api_version)
 
     try:
         logging.info(f"Attempting to delete skillset '{skillset_name}'...")
-        response = requests.delete(endpoint, headers=headers)
-
-        if response.status_code == 204:
+        if client.delete("skillsets", skillset_name):
             logging.info(f"Skillset '{skillset_name}' deleted successfully!")
-        elif response.status_code == 404:
-            logging.info(f"Skillset '{skillset_name}' does not exist.")
-        else:
-            logging.warning(f"Unexpected status code while deleting skillset: {response.status_code}")
-            logging.warning(f"Response: {response.text}")
+            return True
+        logging.info(f"Skillset '{skillset_name}' does not exist.")
+        return False
 
     except requests.exceptions.ConnectionError:
         logging.error("Connection error while deleting skillset. Please verify your network connection.")
@@ -65,64 +55,45 @@ def delete_skillset(skillset_name: str,
         logging.error(f"Error deleting skillset: {str(e)}")
         raise
 
-    return response
-
 ########################################################
 # Create skillset
 ########################################################
 
-def create_skillset(search_index_name: str,
-                    function_endpoint: str,
-                    function_key: str = document_chunking_func_key,
-                    service_name: str = search_service_name,
-                    api_version: str = search_api_version,
-                    admin_key: str = azure_search_admin_key,
-                    cognitive_services_key: str = cognitive_service_key):
+def _validate_skill_settings(batch_size: int, degree_of_parallelism: Optional[int], timeout_seconds: int):
+    if not 1 <= batch_size <= 1000:
+        raise ValueError(f"batch_size must be between 1 and 1000, got {batch_size}")
+    if degree_of_parallelism is not None and not 1 <= degree_of_parallelism <= 10:
+        raise ValueError(f"degree_of_parallelism must be between 1 and 10, got {degree_of_parallelism}")
+    if not 1 <= timeout_seconds <= MAX_SKILL_TIMEOUT_SECONDS:
+        raise ValueError(f"timeout_seconds must be between 1 and {MAX_SKILL_TIMEOUT_SECONDS}, got {timeout_seconds}")
+
+
+def _iso_duration(seconds: int) -> str:
+    minutes, seconds = divmod(seconds, 60)
+    return f"PT{minutes}M{seconds}S" if minutes else f"PT{seconds}S"
+
+
+def build_skillset_body(search_index_name: str,
+                        function_endpoint: str,
+                        function_key: str,
+                        cognitive_services_key: str,
+                        batch_size: int = 1,
+                        degree_of_parallelism: Optional[int] = None,
+                        timeout_seconds: int = MAX_SKILL_TIMEOUT_SECONDS) -> dict:
     """
-    Creates a skillset for document processing and key phrase extraction.
+    Builds the REST definition of the chunking skillset.
 
     Args:
-        search_index_name (str): Name of the search index
+        search_index_name (str): Name of the search index the chunks are projected to
         function_endpoint (str): Endpoint URL for the document chunking function
+        batch_size (int): Documents sent to the chunking function per call (1-1000)
+        degree_of_parallelism (int): Concurrent calls the indexer makes to the function (1-10),
+            the service default (5) when None
+        timeout_seconds (int): Timeout of each call, at most 230 seconds
     """
-
-    if not function_key:
-        logging.error(
-            "Function key not found. Please set the DOCUMENT_CHUNKING_FUNCTION_KEY environment variable."
-        )
-        raise ValueError(
-            "Function key not found. Please set the DOCUMENT_CHUNKING_FUNCTION_KEY environment variable."
-        )
-    
-    if not cognitive_services_key:
-        logging.error(
-            "Cognitive services key not found. Please set the COGNITIVE_SERVICES_KEY environment variable."
-        )
-        raise ValueError(
-            "Cognitive services key not found. Please set the COGNITIVE_SERVICES_KEY environment variable."
-        )
+    _validate_skill_settings(batch_size, degree_of_parallelism, timeout_seconds)
     skillset_name = f"{search_index_name}-skillset-chunking"
 
-    logging.info(f"Starting skillset operation for '{skillset_name}'")
-    logging.info(f"Using search service: {service_name}")
-    logging.info(f"Using API version: {api_version}")
-
-    # Delete existing skillset if it exists
-    logging.info(f"Checking if skillset '{skillset_name}' exists...")
-    delete_skillset(skillset_name, service_name, api_version, admin_key)
-
-    # Endpoint URL
-    endpoint = f"https://{service_name}.search.windows.net/skillsets/{skillset_name}?api-version={api_version}"
-    logging.info(f"Endpoint URL: {endpoint}")
-
-    # Headers
-    headers = {"Content-Type": "application/json", "api-key": admin_key}
-
-    # If skillset doesn't exist, create it
-    logging.info(f"Starting skillset creation process...")
-    logging.info(f"Initializing skillset configuration...")
-    start_time = time.time()
-
     body = {
         "name": skillset_name,
         "description": "SKillset to do document chunking",
@@ -134,8 +105,8 @@ def create_skillset(search_index_name: str,
                 "context": "/document",
                 "uri": f"{function_endpoint}/api/document-chunking?code={function_key}",
                 "httpMethod": "POST",
-                "timeout": "PT3M50S",
-                "batchSize": 1,
+                "timeout": _iso_duration(timeout_seconds),
+                "batchSize": batch_size,
                 "inputs": [
                     {
                         "name": "documentUrl",
@@ -214,44 +185,104 @@ def create_skillset(search_index_name: str,
             "parameters": {"projectionMode": "skipIndexingParentDocuments"},
         },
     }
+    # left out unless set, so the service default applies
+    if degree_of_parallelism is not None:
+        body["skills"][0]["degreeOfParallelism"] = degree_of_parallelism
+    return body
 
-    response_time = time.time() - start_time
-    logging.info(f"Skillset configuration prepared in {round(response_time,2)} seconds")
+def create_skillset(search_index_name: str,
+                    function_endpoint: str,
+                    function_key: str = None,
+                    service_name: str = None,
+                    api_version: str = None,
+                    admin_key: str = None,
+                    cognitive_services_key: str = None,
+                    batch_size: int = 1,
+                    degree_of_parallelism: Optional[int] = None,
+                    timeout_seconds: int = MAX_SKILL_TIMEOUT_SECONDS,
+                    client: SearchRestClient = None,
+                    refresh_secrets: bool = False):
+    """
+    Creates a skillset for document processing and key phrase extraction, or updates it in place.
 
-    # send a put request to create the skillset
-    try:
-        logging.info(f"Sending request to create skillset '{skillset_name}'...")
-        response = requests.put(endpoint, headers=headers, json=body)
+    Use AI_Search/SkillsetBenchmark.py to find the batch size and degree of
+    parallelism with the best throughput for the chunking function.
+
+    Args:
+        search_index_name (str): Name of the search index
+        function_endpoint (str): Endpoint URL for the document chunking function
+        batch_size (int): Documents sent to the chunking function per call (1-1000)
+        degree_of_parallelism (int): Concurrent calls the indexer makes to the function (1-10),
+            the service default (5) when None
+        timeout_seconds (int): Timeout of each call, at most 230 seconds
+        refresh_secrets (bool): Push the Cognitive Services key even when nothing else
+            changed, e.g. after rotating it
+
+    Keys and search service arguments left out are taken from the settings (config.py).
+    """
+    settings = get_settings()
+    function_key = function_key or settings.functions.chunking_function_key
+    cognitive_services_key = cognitive_services_key or settings.search.cognitive_services_key
+    service_name = service_name or settings.search.service_name
+    api_version = api_version or settings.search.api_version
+
+    if not function_key:
+        logging.error(
+            "Function key not found. Please set the DOCUMENT_CHUNKING_FUNCTION_KEY environment variable."
+        )
+        raise ValueError(
+            "Function key not found. Please set the DOCUMENT_CHUNKING_FUNCTION_KEY environment variable."
+        )
+    
+    if not cognitive_services_key:
+        logging.error(
+            "Cognitive services key not found. Please set the COGNITIVE_SERVICES_KEY environment variable."
+        )
+        raise ValueError(
+            "Cognitive services key not found. Please set the COGNITIVE_SERVICES_KEY environment variable."
+        )
+    skillset_name = f"{search_index_name}-skillset-chunking"
 
-        if response.status_code == 200:
-            logging.info(f"Skillset '{skillset_name}' created successfully!")
-            logging.info(f"Creation time: {round(response_time,2)} seconds")
-            logging.info(f"Skillset details: {response.json()}")
-        elif response.status_code == 201:
-            logging.info(
-                f"Skillset '{skillset_name}' created successfully! (Status: 201)"
-            )
-            logging.info(f"Creation time: {round(response_time,2)} seconds")
-            logging.info(f"Skillset details: {response.json()}")
-        else:
-            logging.error(f"Failed to create skillset '{skillset_name}'")
-            logging.error(f"Status code: {response.status_code}")
-            logging.error(f"Error response: {response.text}")
-            logging.error("Please check your configuration and try again.")
+    logging.info(f"Starting skillset operation for '{skillset_name}'")
+    logging.info(f"Using search service: {service_name}")
+    logging.info(f"Using API version: {api_version}")
+
+    # Skillsets are updated in place, so the existing one is no longer deleted first
+    logging.info("Starting skillset creation process...")
+    logging.info("Initializing skillset configuration...")
+    start_time = time.time()
+
+    body = build_skillset_body(
+        search_index_name,
+        function_endpoint,
+        function_key,
+        cognitive_services_key,
+        batch_size=batch_size,
+        degree_of_parallelism=degree_of_parallelism,
+        timeout_seconds=timeout_seconds,
+    )
+
+    # create the skillset or update it in place
+    try:
+        logging.info(f"Reconciling skillset '{skillset_name}'...")
+        result = reconcile(client or get_client(service_name, admin_key, api_version), "skillsets", body,
+                           refresh_secrets=refresh_secrets)
+        logging.info(f"Skillset '{skillset_name}' {result.action}")
+        logging.info(f"Reconciliation time: {round(time.time() - start_time,2)} seconds")
 
     except requests.exceptions.ConnectionError:
         logging.error(
-            f"Connection error while creating skillset. Please verify your network connection."
+            "Connection error while creating skillset. Please verify your network connection."
         )
         raise
     except requests.exceptions.Timeout:
-        logging.error(f"Request timed out while creating skillset. Please try again.")
+        logging.error("Request timed out while creating skillset. Please try again.")
         raise
     except Exception as e:
         logging.error(f"Unexpected error while creating skillset: {str(e)}")
         raise
 
-    return response
+    return result.response
 
 if __name__ == "__main__":
     search_index_name = "vision-ingestion-index-test"
@@ -0,0 +1,206 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+########################################################
+# Chunking skill throughput benchmark
+########################################################
+#
+# The indexer calls the chunking WebApiSkill with batchSize records per request
+# and up to degreeOfParallelism requests at a time. This module replays that
+# traffic pattern against the chunking function (or its local stand-in,
+# FakeServices.FakeChunkingFunction) for a grid of settings and recommends the
+# fastest one that stays within the error budget:
+#
+#     with FakeChunkingFunction(overhead=0.2, per_record=0.05, capacity=4) as fake:
+#         results = benchmark(fake.endpoint, batch_sizes=(1, 5, 10), degrees_of_parallelism=(1, 2, 5))
+#         print(report(results))
+#         best = recommend(results)
+#
+# The recommended values are passed to create_skillset(batch_size=..., degree_of_parallelism=...).
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+@dataclass
+class BenchmarkResult:
+    """Throughput and latency of one (batch size, degree of parallelism) setting"""
+
+    batch_size: int
+    degree_of_parallelism: int
+    documents: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    latencies: List[float] = field(default_factory=list, repr=False)
+
+    @property
+    def documents_per_second(self) -> float:
+        succeeded = self.documents - self.failed
+        return succeeded / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        return self.failed / self.documents if self.documents else 0.0
+
+    @property
+    def p50(self) -> float:
+        return _percentile(self.latencies, 50)
+
+    @property
+    def p99(self) -> float:
+        return _percentile(self.latencies, 99)
+
+
+def build_records(document_urls: Iterable[str], content_type: str = "application/pdf") -> List[dict]:
+    """
+    Records in the shape the indexer sends to the chunking WebApiSkill
+    """
+    return [
+        {
+            "recordId": str(i),
+            "data": {
+                "documentUrl": url,
+                "documentContent": "",
+                "documentSasToken": "",
+                "documentContentType": content_type,
+            },
+        }
+        for i, url in enumerate(document_urls)
+    ]
+
+
+def _send_batch(session: requests.Session, url: str, batch: List[dict], timeout: float):
+    """
+    Send one batch, returning (latency, failed record count)
+    """
+    start_time = time.perf_counter()
+    try:
+        response = session.post(url, json={"values": batch}, timeout=timeout)
+        latency = time.perf_counter() - start_time
+        if response.status_code != 200:
+            return latency, len(batch)
+        values = response.json().get("values", [])
+        returned = {value.get("recordId") for value in values if not value.get("errors")}
+        return latency, sum(1 for record in batch if record["recordId"] not in returned)
+    except requests.exceptions.RequestException as e:
+        logging.warning(f"Batch of {len(batch)} records failed: {type(e).__name__}")
+        return time.perf_counter() - start_time, len(batch)
+
+
+def run_setting(
+    url: str,
+    records: List[dict],
+    batch_size: int,
+    degree_of_parallelism: int,
+    timeout: float = 230.0,
+) -> BenchmarkResult:
+    """
+    Push all records through the function the way the indexer would for one setting
+    """
+    batches = [records[i:i + batch_size] for i in range(0, len(records), batch_size)]
+    result = BenchmarkResult(batch_size, degree_of_parallelism, documents=len(records))
+
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=degree_of_parallelism)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=degree_of_parallelism) as executor:
+            for latency, failed in executor.map(lambda batch: _send_batch(session, url, batch, timeout), batches):
+                result.latencies.append(latency)
+                result.failed += failed
+        result.seconds = time.perf_counter() - start_time
+
+    logging.info(
+        f"batchSize={batch_size} degreeOfParallelism={degree_of_parallelism}: "
+        f"{round(result.documents_per_second, 2)} docs/s, p99 {round(result.p99, 3)}s, "
+        f"{result.failed} failed"
+    )
+    return result
+
+
+def benchmark(
+    function_endpoint: str,
+    function_key: Optional[str] = None,
+    document_urls: Optional[List[str]] = None,
+    documents: int = 50,
+    batch_sizes=(1, 2, 5, 10),
+    degrees_of_parallelism=(1, 2, 5, 10),
+    timeout: float = 230.0,
+) -> List[BenchmarkResult]:
+    """
+    Measure chunking throughput for every combination of batch size and degree of parallelism.
+
+    Args:
+        function_endpoint (str): Endpoint URL of the chunking function, as passed to create_skillset
+        function_key (str): Function key, omitted for a local function
+        document_urls (list): Documents to send; synthetic URLs are used when omitted
+        documents (int): Number of synthetic documents when document_urls is omitted
+    """
+    url = f"{function_endpoint.rstrip('/')}/api/document-chunking"
+    if function_key:
+        url += f"?code={function_key}"
+    document_urls = document_urls or [f"https://example.blob.core.windows.net/docs/{i}.pdf" for i in range(documents)]
+    records = build_records(document_urls)
+
+    return [
+        run_setting(url, records, batch_size, degree_of_parallelism, timeout)
+        for batch_size in batch_sizes
+        for degree_of_parallelism in degrees_of_parallelism
+    ]
+
+
+def recommend(results: List[BenchmarkResult], max_error_rate: float = 0.0, max_p99: Optional[float] = None) -> BenchmarkResult:
+    """
+    Pick the setting with the highest throughput within the error and latency budget.
+    On ties the smaller degree of parallelism wins, as it puts less load on the function.
+    """
+    candidates = [
+        r for r in results
+        if r.error_rate <= max_error_rate and (max_p99 is None or r.p99 <= max_p99)
+    ]
+    if not candidates:
+        raise ValueError("No setting stayed within the error and latency budget")
+    best = max(r.documents_per_second for r in candidates)
+    # settings within 5% of the best are considered equivalent
+    equivalent = [r for r in candidates if r.documents_per_second >= best * 0.95]
+    return min(equivalent, key=lambda r: (r.degree_of_parallelism, r.batch_size))
+
+
+def report(results: List[BenchmarkResult]) -> str:
+    lines = [f"{'batchSize':>10}{'DOP':>5}{'docs/s':>9}{'p50 (s)':>9}{'p99 (s)':>9}{'errors':>8}"]
+    for r in sorted(results, key=lambda r: -r.documents_per_second):
+        lines.append(
+            f"{r.batch_size:>10}{r.degree_of_parallelism:>5}{round(r.documents_per_second, 2):>9}"
+            f"{round(r.p50, 3):>9}{round(r.p99, 3):>9}{r.failed:>8}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    from FakeServices import FakeChunkingFunction
+
+    with FakeChunkingFunction(overhead=0.2, per_record=0.05, capacity=4) as fake:
+        results = benchmark(fake.endpoint, documents=40, batch_sizes=(1, 5, 10), degrees_of_parallelism=(1, 2, 4, 8))
+    print(report(results))
+    best = recommend(results)
+    print(f"Recommended: batch_size={best.batch_size}, degree_of_parallelism={best.degree_of_parallelism}")
@@ -0,0 +1,230 @@
+import argparse
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from AI_Search.VectorProfiles import (
+    BINARY_QUANTIZATION,
+    EXHAUSTIVE_KNN,
+    PRESETS,
+    SCALAR_QUANTIZATION,
+    VectorProfile,
+)
+from AI_Search.VectorStore import VectorStore
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+########################################################
+# Offline recall / latency benchmark of vector profiles
+########################################################
+#
+# Compares the presets of AI_Search/VectorProfiles.py on a local sample of
+# vectors against an exact (exhaustive float32) baseline:
+#
+#     python -m AI_Search.VectorBenchmark --sample chunks.json --queries 200 --k 10
+#
+# The sample is a .npy matrix or a JSON list of documents with a "vector" field,
+# the shape produced by upload_to_search. Without a sample, clustered synthetic
+# vectors are used. Quantization is simulated by searching the quantized
+# vectors and rescoring the oversampled candidates with the originals, as the
+# service does. The HNSW graph is simulated with hnswlib when it is installed;
+# otherwise the quantized vectors are scanned exhaustively, which isolates the
+# recall lost to compression.
+
+
+@dataclass
+class ProfileResult:
+    name: str
+    engine: str
+    recall: float
+    p50_ms: float
+    p99_ms: float
+    mb_per_10k: float
+
+
+def load_sample(path: str) -> np.ndarray:
+    if path.endswith(".npy"):
+        vectors = np.load(path)
+    else:
+        with open(path, "r") as f:
+            documents = json.load(f)
+        if isinstance(documents, dict):
+            documents = documents.get("value", [])
+        vectors = np.array([d["vector"] for d in documents if d.get("vector")], dtype=np.float32)
+    return _normalize(vectors.astype(np.float32))
+
+
+def synthetic_sample(count: int = 10000, dimensions: int = 1536, clusters: int = 50, seed: int = 0) -> np.ndarray:
+    """Clustered vectors, closer to real embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    labels = rng.integers(0, clusters, count)
+    vectors = centers[labels] + 0.8 * rng.standard_normal((count, dimensions)).astype(np.float32)
+    return _normalize(vectors)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Ground truth: exhaustive float32 cosine search of the local vector store"""
+    return VectorStore.from_vectors(vectors).top_k(queries, k)[0]
+
+
+########################################################
+# Simulation of a profile
+########################################################
+
+
+def quantize(vectors: np.ndarray, profile: VectorProfile) -> np.ndarray:
+    """
+    The vectors as the index scores them, returned as normalized float32
+    """
+    if profile.compression == SCALAR_QUANTIZATION:
+        low, high = vectors.min(axis=0), vectors.max(axis=0)
+        scale = np.maximum(high - low, 1e-12) / 255
+        codes = np.round((vectors - low) / scale).astype(np.uint8)
+        return _normalize(codes.astype(np.float32) * scale + low)
+    if profile.compression == BINARY_QUANTIZATION:
+        return _normalize(np.where(vectors > 0, 1.0, -1.0).astype(np.float32))
+    if profile.vector_type == "Edm.Half":
+        return _normalize(vectors.astype(np.float16).astype(np.float32))
+    return vectors
+
+
+class _Searcher:
+    def __init__(self, vectors: np.ndarray, profile: VectorProfile):
+        self.profile = profile
+        self.originals = vectors
+        self.quantized = quantize(vectors, profile)
+        self.index = None
+        if profile.kind != EXHAUSTIVE_KNN and hnswlib is not None:
+            self.index = hnswlib.Index(space="cosine", dim=vectors.shape[1])
+            self.index.init_index(max_elements=len(vectors), M=profile.m, ef_construction=profile.ef_construction)
+            self.index.add_items(self.quantized)
+
+    @property
+    def engine(self) -> str:
+        return "hnsw" if self.index is not None else "flat"
+
+    def search(self, query: np.ndarray, k: int) -> np.ndarray:
+        compressed = self.profile.compression is not None
+        candidates = int(k * self.profile.oversampling) if compressed and self.profile.rescore else k
+        if self.profile.compression == BINARY_QUANTIZATION:
+            scored_query = _normalize(np.where(query > 0, 1.0, -1.0).astype(np.float32)[None, :])[0]
+        else:
+            scored_query = query
+
+        if self.index is not None:
+            self.index.set_ef(max(self.profile.ef_search, candidates))
+            ids = self.index.knn_query(scored_query, k=candidates)[0][0]
+        else:
+            scores = self.quantized @ scored_query
+            ids = np.argpartition(-scores, candidates - 1)[:candidates]
+
+        if compressed and self.profile.rescore:
+            # rescore the oversampled candidates with the full precision originals
+            rescored = self.originals[ids] @ query
+            return ids[np.argsort(-rescored)[:k]]
+        scores = self.quantized[ids] @ scored_query
+        return ids[np.argsort(-scores)[:k]]
+
+
+def evaluate(
+    name: str,
+    profile: VectorProfile,
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    k: int,
+) -> ProfileResult:
+    searcher = _Searcher(vectors, profile)
+    latencies: List[float] = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start_time = time.perf_counter()
+        found = searcher.search(query, k)
+        latencies.append(time.perf_counter() - start_time)
+        hits += len(set(found.tolist()) & set(expected.tolist()))
+
+    latencies_ms = np.array(latencies) * 1000
+    return ProfileResult(
+        name=name,
+        engine=searcher.engine,
+        recall=hits / (len(queries) * k),
+        p50_ms=float(np.percentile(latencies_ms, 50)),
+        p99_ms=float(np.percentile(latencies_ms, 99)),
+        mb_per_10k=profile.bytes_per_vector(vectors.shape[1]) * 10000 / 1024 ** 2,
+    )
+
+
+def run_benchmark(
+    vectors: np.ndarray,
+    profiles: Optional[Dict[str, VectorProfile]] = None,
+    queries: int = 100,
+    k: int = 10,
+    seed: int = 0,
+) -> List[ProfileResult]:
+    """
+    Evaluate every profile on the sample; queries are held out from the searched vectors.
+
+    Args:
+        vectors: normalized sample vectors
+        profiles: the profiles to compare, all presets by default
+        queries: number of held-out query vectors
+        k: number of results per query
+    """
+    profiles = profiles or PRESETS
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(vectors))
+    query_vectors, corpus = vectors[order[:queries]], vectors[order[queries:]]
+    truth = exact_top_k(corpus, query_vectors, k)
+
+    results = []
+    for name, profile in profiles.items():
+        logging.info(f"Evaluating vector profile '{name}'...")
+        results.append(evaluate(name, profile, corpus, query_vectors, truth, k))
+    return results
+
+
+def report(results: List[ProfileResult], k: int = 10) -> str:
+    lines = [f"{'profile':<14}{'engine':>7}{f'recall@{k}':>11}{'p50 (ms)':>10}{'p99 (ms)':>10}{'MB/10k':>9}"]
+    for r in results:
+        lines.append(
+            f"{r.name:<14}{r.engine:>7}{round(r.recall, 4):>11}{round(r.p50_ms, 3):>10}"
+            f"{round(r.p99_ms, 3):>10}{round(r.mb_per_10k, 1):>9}"
+        )
+    if hnswlib is None:
+        lines.append("hnswlib is not installed: HNSW profiles were scanned exhaustively (compression loss only)")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare vector profiles against exact search")
+    parser.add_argument("--sample", help=".npy matrix or JSON list of documents with a 'vector' field")
+    parser.add_argument("--count", type=int, default=10000, help="synthetic vectors when no sample is given")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--profiles", nargs="*", choices=list(PRESETS), help="presets to compare, all by default")
+    args = parser.parse_args()
+
+    sample = load_sample(args.sample) if args.sample else synthetic_sample(args.count, args.dimensions)
+    selected = {name: PRESETS[name] for name in args.profiles} if args.profiles else None
+    print(report(run_benchmark(sample, selected, args.queries, args.k), args.k))
@@ -0,0 +1,176 @@
+import copy
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+########################################################
+# Vector search profiles
+########################################################
+#
+# A VectorProfile describes how the vector field of an index is searched and
+# stored: the algorithm (HNSW or exhaustive KNN) and its parameters, optional
+# scalar or binary quantization with rescoring, a narrower vector type and
+# whether a retrievable copy of the vectors is stored. apply_profile() rewrites
+# the vectorSearch section and the vector fields of an index body, so the same
+# presets work for AI_Search/Index.py and for schema.json:
+#
+#     body = apply_profile(build_index_body("my-index"), get_profile("scalar"))
+#
+# Use AI_Search/VectorBenchmark.py to compare recall and latency of the presets
+# on a local sample before switching an index.
+
+HNSW = "hnsw"
+EXHAUSTIVE_KNN = "exhaustiveKnn"
+SCALAR_QUANTIZATION = "scalarQuantization"
+BINARY_QUANTIZATION = "binaryQuantization"
+
+# vector types that accept the float embeddings returned by the embedding models
+VECTOR_TYPES = {"Edm.Single": 4, "Edm.Half": 2}
+
+
+@dataclass(frozen=True)
+class VectorProfile:
+    """
+    Args:
+        kind: "hnsw" or "exhaustiveKnn"
+        metric: similarity metric of the algorithm
+        m: HNSW bi-directional links per node (4-10)
+        ef_construction: HNSW candidate list size while building (100-1000)
+        ef_search: HNSW candidate list size at query time (100-1000)
+        compression: None, "scalarQuantization" or "binaryQuantization"
+        rescore: rescore compressed results with the original vectors
+        oversampling: candidates retrieved per requested result before rescoring
+        vector_type: "Edm.Single" or "Edm.Half" element type of the vector field
+        stored: keep a retrievable copy of the vectors; not needed for search
+    """
+
+    kind: str = HNSW
+    metric: str = "cosine"
+    m: int = 4
+    ef_construction: int = 400
+    ef_search: int = 500
+    compression: Optional[str] = None
+    rescore: bool = True
+    oversampling: float = 4.0
+    vector_type: str = "Edm.Single"
+    stored: bool = True
+
+    def __post_init__(self):
+        if self.kind not in (HNSW, EXHAUSTIVE_KNN):
+            raise ValueError(f"Unknown vector algorithm '{self.kind}'")
+        if self.compression not in (None, SCALAR_QUANTIZATION, BINARY_QUANTIZATION):
+            raise ValueError(f"Unknown vector compression '{self.compression}'")
+        if self.vector_type not in VECTOR_TYPES:
+            raise ValueError(f"Vector type must be one of {', '.join(VECTOR_TYPES)}, got '{self.vector_type}'")
+        if self.kind == HNSW and not (4 <= self.m <= 10 and 100 <= self.ef_construction <= 1000 and 100 <= self.ef_search <= 1000):
+            raise ValueError("HNSW parameters out of range: m 4-10, efConstruction and efSearch 100-1000")
+        if self.compression and self.kind != HNSW:
+            raise ValueError("Compression is only supported with HNSW")
+
+    def algorithm(self, name: str) -> dict:
+        if self.kind == EXHAUSTIVE_KNN:
+            return {"name": name, "kind": EXHAUSTIVE_KNN, "exhaustiveKnnParameters": {"metric": self.metric}}
+        return {
+            "name": name,
+            "kind": HNSW,
+            "hnswParameters": {
+                "metric": self.metric,
+                "m": self.m,
+                "efConstruction": self.ef_construction,
+                "efSearch": self.ef_search,
+            },
+        }
+
+    def compression_definition(self, name: str) -> Optional[dict]:
+        if self.compression is None:
+            return None
+        definition = {
+            "name": name,
+            "kind": self.compression,
+            "rescoringOptions": {
+                "enableRescoring": self.rescore,
+                "defaultOversampling": self.oversampling,
+                # keep full precision originals for rescoring even when stored is false
+                "rescoreStorageMethod": "preserveOriginals",
+            },
+        }
+        if self.compression == SCALAR_QUANTIZATION:
+            definition["scalarQuantizationParameters"] = {"quantizedDataType": "int8"}
+        return definition
+
+    def bytes_per_vector(self, dimensions: int) -> float:
+        """Approximate in-memory size of one vector in the index, graph links included"""
+        if self.compression == BINARY_QUANTIZATION:
+            size = dimensions / 8
+        elif self.compression == SCALAR_QUANTIZATION:
+            size = dimensions
+        else:
+            size = dimensions * VECTOR_TYPES[self.vector_type]
+        links = 2 * self.m * 4 if self.kind == HNSW else 0
+        return size + links
+
+
+PRESETS: Dict[str, VectorProfile] = {
+    # the settings the indexes were created with
+    "default": VectorProfile(),
+    "fast": VectorProfile(m=4, ef_construction=200, ef_search=100),
+    "balanced": VectorProfile(m=8, ef_construction=400, ef_search=200),
+    "high_recall": VectorProfile(m=10, ef_construction=800, ef_search=800),
+    "exhaustive": VectorProfile(kind=EXHAUSTIVE_KNN),
+    "half": VectorProfile(m=8, ef_construction=400, ef_search=200, vector_type="Edm.Half", stored=False),
+    "scalar": VectorProfile(m=8, ef_construction=400, ef_search=200, compression=SCALAR_QUANTIZATION, stored=False),
+    "binary": VectorProfile(
+        m=8, ef_construction=400, ef_search=200, compression=BINARY_QUANTIZATION, oversampling=10.0, stored=False
+    ),
+}
+
+
+def get_profile(name: str) -> VectorProfile:
+    try:
+        return PRESETS[name]
+    except KeyError:
+        raise ValueError(f"Unknown vector profile '{name}', expected one of {', '.join(PRESETS)}") from None
+
+
+def apply_profile(body: dict, profile: VectorProfile, prefix: Optional[str] = None) -> dict:
+    """
+    Return a copy of an index body using the given profile for all its vector fields.
+
+    The vectorizers of the body are kept; algorithms, compressions and profiles
+    are replaced by one of each. The names of an existing algorithm and profile
+    are reused so that switching presets does not rename them, new names are
+    derived from prefix (the index name by default).
+
+    Args:
+        body: index REST body
+        profile: the vector profile to apply
+        prefix: prefix of the algorithm, compression and profile names
+    """
+    body = copy.deepcopy(body)
+    prefix = prefix or body["name"]
+    vector_search = body.setdefault("vectorSearch", {})
+    vectorizers: List[dict] = vector_search.get("vectorizers") or []
+
+    algorithms = vector_search.get("algorithms") or [{"name": f"{prefix}-algorithm"}]
+    profiles = vector_search.get("profiles") or [{"name": f"{prefix}-vector-profile"}]
+    algorithm_name = algorithms[0]["name"]
+    profile_name = profiles[0]["name"]
+    compression_name = f"{prefix}-compression"
+
+    compression = profile.compression_definition(compression_name)
+    vector_profile = {"name": profile_name, "algorithm": algorithm_name}
+    if vectorizers:
+        vector_profile["vectorizer"] = vectorizers[0]["name"]
+    if compression:
+        vector_profile["compression"] = compression_name
+
+    vector_search["algorithms"] = [profile.algorithm(algorithm_name)]
+    vector_search["compressions"] = [compression] if compression else []
+    vector_search["profiles"] = [vector_profile]
+
+    for field in body.get("fields", []):
+        if field.get("type", "").startswith("Collection(Edm.") and field.get("dimensions"):
+            field["type"] = f"Collection({profile.vector_type})"
+            field["vectorSearchProfile"] = profile_name
+            field["stored"] = profile.stored
+            field["retrievable"] = field.get("retrievable", True) and profile.stored
+    return body
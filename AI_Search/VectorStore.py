@@ -0,0 +1,248 @@
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from AI_Search.Retrieval import SearchResult
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+########################################################
+# In-process vector store
+########################################################
+#
+# A local retrieval tier that needs no search service, for CI, offline
+# benchmarks and as ground truth for recall measurements. It loads the
+# documents produced by upload_to_search (content, url, page_number, vector...)
+# and keeps the vectors L2-normalized in one contiguous float32 matrix, so a
+# batch of cosine queries is a single matrix product:
+#
+#     store = VectorStore.from_documents(documents)
+#     results = store.search(query_vector, k=5)
+#     store.save("vectors/financial-index")
+#     store = VectorStore.load("vectors/financial-index")  # memory-mapped
+#
+# An optional HNSW index (hnswlib) answers approximate queries on large stores.
+
+VECTORS_FILE = "vectors.npy"
+DOCUMENTS_FILE = "documents.json"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class VectorStore:
+    """
+    Args:
+        dimensions: length of the vectors
+        vector_field: name of the vector field of the documents
+        key_field: name of the document key, the row number is used when a document has none
+        content_field: name of the text field returned as SearchResult.content
+    """
+
+    def __init__(self, dimensions: int, vector_field: str = "vector", key_field: str = "doc_id", content_field: str = "content"):
+        self.dimensions = dimensions
+        self.vector_field = vector_field
+        self.key_field = key_field
+        self.content_field = content_field
+        self.documents: List[Dict[str, Any]] = []
+        self._vectors = np.empty((0, dimensions), dtype=np.float32)
+        self._size = 0
+        self._ann = None
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """The normalized vectors, one row per document"""
+        return self._vectors[: self._size]
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes
+
+    ########################################################
+    # Loading
+    ########################################################
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[Dict[str, Any]], dimensions: Optional[int] = None, **kwargs) -> "VectorStore":
+        documents = list(documents)
+        vector_field = kwargs.get("vector_field", "vector")
+        if dimensions is None:
+            dimensions = next((len(d[vector_field]) for d in documents if d.get(vector_field) is not None), 0)
+        store = cls(dimensions, **kwargs)
+        store.add(documents)
+        return store
+
+    @classmethod
+    def from_vectors(cls, vectors: np.ndarray, documents: Optional[List[Dict[str, Any]]] = None, **kwargs) -> "VectorStore":
+        """Wrap an existing (n, dimensions) matrix, e.g. a benchmark sample"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        store = cls(vectors.shape[1], **kwargs)
+        store._vectors = np.ascontiguousarray(_normalize(vectors))
+        store._size = len(vectors)
+        store.documents = documents if documents is not None else [{} for _ in range(len(vectors))]
+        return store
+
+    def _reserve(self, count: int):
+        """Grow the matrix geometrically, so appending stays amortized O(1) and contiguous"""
+        needed = self._size + count
+        if needed <= len(self._vectors) and self._vectors.flags.writeable:
+            return
+        capacity = max(needed, 2 * len(self._vectors), 1024)
+        grown = np.empty((capacity, self.dimensions), dtype=np.float32)
+        grown[: self._size] = self._vectors[: self._size]
+        self._vectors = grown
+
+    def add(self, documents: Iterable[Dict[str, Any]]) -> int:
+        """
+        Add documents with a vector; documents without one are skipped.
+        Returns the number of documents added.
+        """
+        rows, metadata = [], []
+        for document in documents:
+            vector = document.get(self.vector_field)
+            if vector is None or len(vector) == 0:
+                continue
+            if len(vector) != self.dimensions:
+                raise ValueError(f"Vector of {len(vector)} dimensions, the store expects {self.dimensions}")
+            rows.append(vector)
+            metadata.append({k: v for k, v in document.items() if k != self.vector_field})
+        if not rows:
+            return 0
+
+        self._reserve(len(rows))
+        self._vectors[self._size : self._size + len(rows)] = _normalize(np.asarray(rows, dtype=np.float32))
+        self._size += len(rows)
+        self.documents.extend(metadata)
+        self._ann = None
+        return len(rows)
+
+    ########################################################
+    # Search
+    ########################################################
+
+    def build_ann(self, m: int = 16, ef_construction: int = 200, ef_search: int = 100):
+        """
+        Build an HNSW index for approximate queries. Requires the hnswlib package.
+        """
+        if hnswlib is None:
+            raise ImportError("Approximate search requires the hnswlib package: pip install hnswlib")
+        index = hnswlib.Index(space="ip", dim=self.dimensions)
+        index.init_index(max_elements=max(1, self._size), M=m, ef_construction=ef_construction)
+        if self._size:
+            index.add_items(self.vectors, np.arange(self._size))
+        index.set_ef(ef_search)
+        self._ann = index
+        return self
+
+    def top_k(self, queries: np.ndarray, k: int = 5, exact: bool = True, batch_size: int = 256):
+        """
+        Top k rows for a batch of query vectors.
+
+        Returns (ids, scores), two (queries, k) arrays sorted by decreasing cosine similarity.
+
+        Args:
+            queries: (n, dimensions) or (dimensions,) query vectors
+            k: number of results per query
+            exact: brute-force search; False uses the HNSW index built with build_ann
+            batch_size: queries scored per matrix product, bounds the (batch, documents) score matrix
+        """
+        queries = _normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        k = min(k, self._size)
+        # no documents or no queries: nothing to score, and np.vstack needs at least one batch
+        if k == 0 or len(queries) == 0:
+            empty = np.empty((len(queries), k))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        if not exact:
+            if self._ann is None:
+                raise ValueError("Call build_ann() before approximate searches")
+            ids, distances = self._ann.knn_query(queries, k=k)
+            # hnswlib returns 1 - inner product for the "ip" space
+            return ids.astype(np.int64), (1.0 - distances).astype(np.float32)
+
+        all_ids, all_scores = [], []
+        vectors = self.vectors
+        for start in range(0, len(queries), batch_size):
+            scores = queries[start : start + batch_size] @ vectors.T
+            ids = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, ids, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            all_ids.append(np.take_along_axis(ids, order, axis=1))
+            all_scores.append(np.take_along_axis(top_scores, order, axis=1))
+        return np.vstack(all_ids), np.vstack(all_scores)
+
+    def search(self, vector: Sequence[float], k: int = 5, exact: bool = True) -> List[SearchResult]:
+        """Top k documents for one query vector, in the same shape as Retriever.search"""
+        return self.search_batch([vector], k, exact)[0]
+
+    def search_batch(self, vectors: Sequence[Sequence[float]], k: int = 5, exact: bool = True) -> List[List[SearchResult]]:
+        if len(vectors) == 0:
+            return []
+        ids, scores = self.top_k(np.asarray(vectors, dtype=np.float32), k, exact)
+        return [
+            [self._to_result(int(i), float(score)) for i, score in zip(row_ids, row_scores)]
+            for row_ids, row_scores in zip(ids, scores)
+        ]
+
+    def _to_result(self, row: int, score: float) -> SearchResult:
+        document = self.documents[row]
+        return SearchResult(
+            id=str(document.get(self.key_field, row)),
+            score=score,
+            content=document.get(self.content_field) or "",
+            fields=document,
+        )
+
+    ########################################################
+    # Persistence
+    ########################################################
+
+    def save(self, path: str):
+        """Write the vectors as .npy and the documents as JSON under the path directory"""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, VECTORS_FILE), np.ascontiguousarray(self.vectors))
+        with open(os.path.join(path, DOCUMENTS_FILE), "w") as f:
+            json.dump(
+                {
+                    "dimensions": self.dimensions,
+                    "vector_field": self.vector_field,
+                    "key_field": self.key_field,
+                    "content_field": self.content_field,
+                    "documents": self.documents,
+                },
+                f,
+            )
+        logger.info(f"Saved {self._size} vectors to {path}")
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "VectorStore":
+        """
+        Load a saved store. With mmap the vectors stay on disk and are paged in on
+        demand, so opening a large store is instant and processes share the pages.
+        """
+        with open(os.path.join(path, DOCUMENTS_FILE), "r") as f:
+            saved = json.load(f)
+        store = cls(
+            saved["dimensions"],
+            vector_field=saved["vector_field"],
+            key_field=saved["key_field"],
+            content_field=saved["content_field"],
+        )
+        store._vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r" if mmap else None)
+        store._size = len(store._vectors)
+        store.documents = saved["documents"]
+        logger.info(f"Loaded {store._size} vectors from {path}{' (memory-mapped)' if mmap else ''}")
+        return store
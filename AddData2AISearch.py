@@ -1,75 +1,171 @@
+import functools
 import requests
-import logging
-from azure.identity import DefaultAzureCredential
-from azure.search.documents import SearchClient
-import json 
+import time
 import uuid
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+from AI_Search.Schema import CHUNK_INDEX
+from config import get_credential, get_settings
+from IngestionState import IngestionState
+from ShardedIngestion import Shard
+from StructuredLog import INGESTION_LOGGER, configure_logging, describe_payload, get_logger
+from Telemetry import FUNCTION, SEARCH, telemetry
 
-# Create a logger for the 'azure' SDK
-logger = logging.getLogger('azure')
-logger.setLevel(logging.DEBUG)
+# Structured, sampled logging (StructuredLog.py): payloads are described by their
+# counts, never dumped, and the azure SDK logs at WARNING unless AZURE_LOG_LEVEL says otherwise
+log = get_logger(INGESTION_LOGGER)
 
 
-#############################################
-# Env variables 
-#############################################
+class ChunkingError(RuntimeError):
+    """The chunking function failed or returned errors for the document"""
+
+
+class UploadError(RuntimeError):
+    """The search service rejected documents of an upload batch"""
+
+
+@dataclass(frozen=True)
+class UploadResult:
+    key: str
+    succeeded: bool
+    status_code: int
+    error_message: Optional[str] = None
 
-config = json.load(open('config.json'))
-service_endpoint = config["search_service_url"]
-# index_name = config["search_index_name"]
-storage_account_name = config["storage_account_name"]
-ingestion_function_url = config["ingestion_function_url"] + "/api/document-chunking"
-index_name = 'financial-index'
-container_name = 'namstorage'
 
 #############################################
-# Authentication 
+# Clients
 #############################################
+# Created on first use from the settings, so importing this module neither
+# authenticates nor touches the network. Run the ingestion with
+# ingest_container() or `python cli.py ingest`.
+
+@functools.lru_cache(maxsize=None)
+def get_search_client():
+    from azure.search.documents import SearchClient
+
+    search = get_settings().search
+    return SearchClient(search.endpoint, search.index_name, get_credential())
+
+
+@functools.lru_cache(maxsize=None)
+def get_blob_storage():
+    from BlobStorageAccess import EntraIDBlobStorage
+
+    return EntraIDBlobStorage(container_name=get_settings().storage.container_name)
 
-credential = DefaultAzureCredential()
-search_client = SearchClient(service_endpoint, index_name, credential)
 
 #############################################
 # Add documents to index
 #############################################
 
-def upload_to_search(chunks):
+def document_id(inner_chunk, position: int, source: str = None) -> str:
+    # Stable per chunk, so uploading a blob again (a resumed run, a retry) overwrites
+    # its documents instead of adding duplicates. Keyed by the blob the chunk comes from:
+    # the function does not always send a url or filepath, and chunks without either
+    # would share their keys across blobs and overwrite each other
+    source = source or inner_chunk.get('url') or inner_chunk.get('filepath') or ''
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source}#{inner_chunk.get('page')}#{position}"))
+
+
+def upload_batch(documents) -> List[UploadResult]:
+    """
+    Upload one batch of documents. Their vectors stay float32 arrays: the body is
+    written by VectorPayload (float32 precision, no list of Python floats) and sent
+    through the pipeline of the search client, which keeps its authentication and retries.
+    """
+    # numpy is only imported when documents are uploaded, not with this module
+    import VectorPayload
+    from azure.core.rest import HttpRequest
+
+    body = VectorPayload.dumps({"value": [{"@search.action": "upload", **document} for document in documents]})
+    request = HttpRequest(
+        "POST",
+        "/docs/search.index",
+        params={"api-version": get_settings().search.api_version},
+        headers={"Content-Type": "application/json"},
+        content=body,
+    )
+    with telemetry.span(SEARCH, "upload_documents", index=get_settings().search.index_name) as span:
+        response = get_search_client().send_request(request)
+        span.add(bytes_sent=len(body), bytes_received=len(response.content))
+        span.set(documents=len(documents))
+        # 207: some documents were rejected, reported per document below
+        if response.status_code not in (200, 207):
+            raise UploadError(f"Upload of {len(documents)} documents failed with status {response.status_code}: "
+                              f"{response.text()[:200]}")
+    return [
+        UploadResult(result["key"], result["status"], result["statusCode"], result.get("errorMessage"))
+        for result in response.json()["value"]
+    ]
+
+
+def upload_to_search(chunks, batch_size: int = None, skip_batches: int = 0,
+                     on_batch: Optional[Callable[[int, int], None]] = None, blob: str = None):
+    """
+    Upload the chunks in batches of batch_size documents (the ingestion settings by default).
+    The first skip_batches batches are not sent again, they were written by an earlier
+    attempt; on_batch(batch, documents) is called after each batch is written.
+    The documents are keyed by blob, the name of the chunked blob (by default the
+    recordId of the chunks, which chunk_document sets to the blob name).
+    Raises UploadError when the service rejects documents.
+    """
     try:
-        # Debug print to see the structure of chunks
-        print("Received chunks structure:", json.dumps(chunks, indent=2))
-        
+        log.debug("chunks.received", sample=True, **describe_payload(chunks))
+
+        from VectorPayload import to_vector
+
         documents = []
         # Check if chunks is a list or has 'values' key
         chunk_list = chunks.get('values', []) if isinstance(chunks, dict) else chunks
         
+        container = get_settings().storage.container_name
         for chunk in chunk_list:
             if 'data' in chunk:
+                source = blob or chunk.get('recordId')
+                source = f"{container}/{source}" if source else None
                 
                 # Each chunk['data']['chunks'] contains an array of chunks
-                for inner_chunk in chunk['data']['chunks']:
-                    unique_id = str(uuid.uuid4())
+                for position, inner_chunk in enumerate(chunk['data']['chunks']):
                     document = {
                         'content': inner_chunk.get('content', ''),
                         'file_name': inner_chunk.get('filepath', ''),
                         'title': inner_chunk.get('filepath', ''),
-                        'doc_id': unique_id,
+                        'doc_id': document_id(inner_chunk, position, source),
                         'url': inner_chunk.get('url', ''),
-                        'page_number': inner_chunk.get('page', ''),
-                        'vector': inner_chunk.get('contentVector', '')
+                        'page_number': inner_chunk.get('page'),
+                        # a float32 array from chunk_document (VectorPayload), or a list
+                        'vector': to_vector(inner_chunk.get('contentVector'))
                     }
                     documents.append(document)
-        
+
+        # Reject documents the index would refuse, instead of failing the whole batch
+        documents, rejected = CHUNK_INDEX.validate_documents(documents, get_settings().openai.embedding_dimensions)
+        for document, problems in rejected:
+            log.warning("chunk.skipped", file_name=document['file_name'], problems="; ".join(problems))
+
         if documents:
-            print(f"Uploading {len(documents)} documents to search")
-            result = search_client.upload_documents(documents=documents)
-            print(f"Upload results: {result}")
-            return result
+            batch_size = batch_size or get_settings().ingestion.upload_batch_size
+            batches = [documents[i:i + batch_size] for i in range(0, len(documents), batch_size)]
+            log.info("upload.start", documents=len(documents), batches=len(batches), skipped_batches=skip_batches)
+            results = []
+            for number, batch in enumerate(batches):
+                if number < skip_batches:
+                    continue
+                result = upload_batch(batch)
+                failed = [r for r in result if not r.succeeded]
+                if failed:
+                    raise UploadError(f"{len(failed)} of {len(batch)} documents rejected in batch {number}: "
+                                      f"{failed[0].key}: {failed[0].error_message}")
+                results.extend(result)
+                if on_batch is not None:
+                    on_batch(number, len(batch))
+            log.info("upload.done", documents=len(results))
+            return results
         else:
-            print("No valid documents to upload")
+            log.info("upload.empty")
             return None
-    except Exception as e:
-        print(f"Error uploading to search index: {e}")
-        print("Chunks structure that caused error:", json.dumps(chunks, indent=2))
+    except Exception:
+        log.error("upload.failed", exc_info=True, **describe_payload(chunks))
         raise
 
 """ 
@@ -83,13 +179,18 @@ Now what we need do is to send the documents to the chunking function and then s
 """
 
 
-# get data from blob storage 
-from BlobStorageAccess import EntraIDBlobStorage
-
-BlobStorageManager = EntraIDBlobStorage(container_name="namstorage")
-
 # create a function to send the file to the chunking function 
 def chunk_document(document_name):
+    """
+    Chunk the blob with the chunking function. Raises ChunkingError when the call
+    fails or the function reports errors, instead of returning no chunks.
+    """
+    settings = get_settings()
+    BlobStorageManager = get_blob_storage()
+    storage_account_name = settings.storage.account_name
+    container_name = settings.storage.container_name
+    ingestion_function_url = f"{settings.functions.ingestion_function_url}/api/document-chunking"
+
     # Handle spaces in the URL by encoding them, but only in the path portion
     path_parts = document_name.split('/')
     filename = path_parts[-1]
@@ -116,30 +217,133 @@ def chunk_document(document_name):
         ]
     }
 
+    # numpy is only imported when a blob is chunked, not with this module
+    import VectorPayload
+
     # Add error handling for the request
     try:
-        print(f"Sending payload: {json.dumps(payload, indent=2)}")
-        response = requests.post(ingestion_function_url, json=payload)
-        response.raise_for_status()
-        
-        print(f"Response status code: {response.status_code}")
-        print(f"Response content: {response.text}")
-        
-        return response.json() if response.text else {}
-    except requests.exceptions.RequestException as e:
-        print(f"Error making request: {e}")
-        return {}
+        # the payload carries a SAS token, so only the blob and its content type are logged
+        log.debug("chunking.request", sample=True, blob=document_name,
+                  content_type=payload["values"][0]["data"]["documentContentType"])
+        with telemetry.span(FUNCTION, "document-chunking", blob=document_name) as span:
+            # a function that hangs fails the blob (dead letter) instead of stalling the run
+            response = requests.post(ingestion_function_url, json=payload,
+                                     timeout=(10, settings.ingestion.chunking_timeout))
+            span.add(bytes_sent=len(response.request.body or b""), bytes_received=len(response.content))
+            response.raise_for_status()
+
+        log.debug("chunking.response", sample=True, blob=document_name,
+                  status=response.status_code, bytes=len(response.content))
+        # vectors are parsed straight into float32 arrays instead of lists of Python floats
+        chunks = VectorPayload.loads(response.content) if response.content else {}
+    except (requests.exceptions.RequestException, ValueError) as e:
+        raise ChunkingError(f"Chunking request for {document_name} failed: {e}") from e
+
+    # the function reports per record errors in a successful response
+    errors = [error.get('message', str(error)) for value in chunks.get('values', []) for error in value.get('errors') or []]
+    if errors or not chunks.get('values'):
+        raise ChunkingError(f"Chunking {document_name} failed: {'; '.join(errors) or 'empty response'}")
+    return chunks
+
+#############################################
+# Ingestion runs
+#############################################
+# The progress of a run is checkpointed in IngestionState.py: an interrupted run
+# resumes at the blob (and upload batch) where it stopped, and failed blobs are
+# kept as dead letters with their error until retry_failed() processes them again.
+
+def process_blob(blob, state: IngestionState, run_id: str):
+    """Chunk and upload one blob, checkpointing each upload batch. Returns the documents uploaded."""
+    container = get_settings().storage.container_name
+    state.start_blob(run_id, blob)
+    stage = "chunking"
+    try:
+        chunks = chunk_document(blob)
+        stage = "upload"
+        skip_batches = state.batches_done(run_id, blob)
+        results = upload_to_search(
+            chunks,
+            skip_batches=skip_batches,
+            on_batch=lambda batch, documents: state.complete_batch(run_id, blob, batch, documents),
+            blob=blob,
+        )
+    except Exception as e:
+        state.fail_blob(run_id, container, blob, stage, e)
+        log.error("blob.failed", blob=blob, stage=stage, error=str(e))
+        raise
+    state.complete_blob(run_id, blob, container)
+    log.info("blob.done", blob=blob, documents=len(results or []), resumed_batches=skip_batches)
+    return len(results or [])
+
 
 # Process blobs and upload chunks
-for blob in BlobStorageManager.list_blobs():  # Process first 2 blobs
-    print(f"\nProcessing: {blob}")
-    if blob.endswith('.txt'):
-        try:
-            chunks = chunk_document(blob)
-            if chunks:
-                print(f"Number of values in chunks: {len(chunks.get('values', []))}")
-                upload_result = upload_to_search(chunks)
-                print(f"Upload completed for {blob}")
-        except Exception as e:
-            print(f"Error processing {blob}: {e}")
+def ingest_container(suffix: str = ".txt", state_path: str = None, restart: bool = False,
+                     shard: Optional[Shard] = None, report: bool = True):
+    """
+    Chunk every blob of the container ending with suffix and upload the chunks,
+    or only the blobs of shard (ShardedIngestion.py). Resumes the unfinished run
+    of the container (and shard), if any, unless restart is set; failed blobs are
+    left for retry_failed(). Returns the run summary: blobs done and failed,
+    documents uploaded, blobs settled before a resume and seconds taken.
+    report prints the telemetry summary at the end.
+    """
+    configure_logging()
+    start_time = time.perf_counter()
+    container = get_settings().storage.container_name
+    with IngestionState(state_path) as state:
+        run = state.start_run(container, suffix, resume=not restart, shard=shard.label if shard else "")
+        settled = state.settled_blobs(run.run_id)
+        log.info("ingestion.start", run_id=run.run_id, shard=run.shard or None, resumed=run.resumed,
+                 settled=len(settled), **state.checkpoint(run.run_id))
+        for blob in get_blob_storage().list_blobs():
+            if not blob.endswith(suffix):
+                log.debug("blob.ignored", blob=blob)
+                continue
+            if shard is not None and not shard.owns(blob):
+                # ingested by the process of its own shard
+                continue
+            if blob in settled:
+                # done, or failed and dead-lettered, by the run being resumed
+                continue
+            log.info("blob.start", blob=blob)
+            try:
+                process_blob(blob, state, run.run_id)
+            except Exception:
+                # recorded as a dead letter, the run goes on with the next blob
+                pass
+        state.finish_run(run.run_id)
+        summary = {"run_id": run.run_id, "resumed": len(settled), **state.summary(run.run_id),
+                   "seconds": round(time.perf_counter() - start_time, 3)}
+    log.info("ingestion.summary", dropped_debug_events=log.dropped, **summary)
+    if report:
+        print(telemetry.summary())
+    return summary
+
+
+def retry_failed(state_path: str = None, max_attempts: int = None):
+    """
+    Process the dead-lettered blobs of the container again. Blobs that already
+    failed max_attempts times are left alone. Returns the blobs retried, fixed and still failing.
+    """
+    configure_logging()
+    container = get_settings().storage.container_name
+    summary = {"retried": 0, "fixed": 0, "failed": 0, "skipped": 0}
+    with IngestionState(state_path) as state:
+        for letter in state.dead_letters(container):
+            if max_attempts is not None and letter.attempts >= max_attempts:
+                summary["skipped"] += 1
+                continue
+            summary["retried"] += 1
+            log.info("blob.retry", blob=letter.blob, attempts=letter.attempts, stage=letter.stage)
+            try:
+                process_blob(letter.blob, state, letter.run_id)
+                summary["fixed"] += 1
+            except Exception:
+                summary["failed"] += 1
+    log.info("retry.summary", **summary)
+    print(telemetry.summary())
+    return summary
+
 
+if __name__ == "__main__":
+    ingest_container()
@@ -4,17 +4,18 @@ Authenticated with Microsoft Entra ID
 to avoid exposing the API key in the code.
 """
 
-import os 
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+from azure.identity import get_bearer_token_provider
 from langchain_openai import AzureChatOpenAI
 from openai import AzureOpenAI
 from langchain_azure_ai.chat_models import AzureAIChatCompletionsModel
 from pydantic import BaseModel, Field
-from typing import Dict, Union
+from typing import Dict, Iterator, List, Union
 import logging
 from langchain_core.messages import HumanMessage, SystemMessage
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from openai import APIError, RateLimitError, APITimeoutError
+from config import get_credential, get_settings
+from Telemetry import CHAT, EMBEDDING, telemetry
 
 logging.basicConfig(
     level=logging.INFO,
@@ -29,10 +30,11 @@ class LLMConfig(BaseModel):
 
     """Configuration for the Azure OpenAI API for Microsoft Entra ID Authentication """
 
-    api_base: str = Field(default=os.getenv("AZURE_OPENAI_API_BASE"), description="The base URL for the Azure OpenAI API")
-    api_version: str = Field(default=os.getenv("AZURE_OPENAI_API_VERSION"), description="The API version for the Azure OpenAI API")
+    # defaults are read from the settings when a config is created, not when this module is imported
+    api_base: str = Field(default_factory=lambda: get_settings().openai.api_base, description="The base URL for the Azure OpenAI API")
+    api_version: str = Field(default_factory=lambda: get_settings().openai.api_version, description="The API version for the Azure OpenAI API")
     deployment_name: str = Field(..., description="The name of the Azure OpenAI model to use")
-    api_key: str = Field(default=os.getenv("AZURE_OPENAI_API_KEY"), description="The API key for the Azure OpenAI API in case of no Microsoft Entra ID Authentication")
+    api_key: str = Field(default_factory=lambda: get_settings().openai.api_key, description="The API key for the Azure OpenAI API in case of no Microsoft Entra ID Authentication")
 
     class Config: 
         frozen = True # makes the config object immutable 
@@ -44,7 +46,7 @@ class LLMConfig(BaseModel):
         logger.info("Attempting to get bearer token for Azure OpenAI API")
         try:
             token = get_bearer_token_provider(
-                DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default")
+                get_credential(), "https://cognitiveservices.azure.com/.default")
             logger.info("Successfully obtained bearer token")
             return token
         except Exception as e:
@@ -84,6 +86,11 @@ class LLMManager:
             use_langchain: whether to use langchain or not
         """
 
+        key = f"{client_type}:langchain" if use_langchain else client_type
+        if key in self._clients:
+            # reuse the client and its connection pool instead of rebuilding it per request
+            return self._clients[key]
+
         try:
             if use_langchain:
                 logger.info("Creating LangChain client")
@@ -102,7 +109,7 @@ class LLMManager:
                 )
             
             logger.info(f"Successfully created client: {type(client).__name__}")
-            self._clients[client_type] = client
+            self._clients[key] = client
             return client
         except Exception as e:
             logger.error(f"Failed to create client: {str(e)}", exc_info=True)
@@ -129,14 +136,17 @@ class LLMManager:
     )
     def _make_chat_request(self, client, prompt, user_message):
         try:
-            response = client.chat.completions.create(
-                model=self.config.deployment_name,
-                messages=[
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": user_message}
-                ],
-                max_tokens=600
-            )
+            with telemetry.span(CHAT, "chat.completions", model=self.config.deployment_name) as span:
+                response = client.chat.completions.create(
+                    model=self.config.deployment_name,
+                    messages=[
+                        {"role": "system", "content": prompt},
+                        {"role": "user", "content": user_message}
+                    ],
+                    max_tokens=600
+                )
+                if response.usage is not None:
+                    span.add(input_tokens=response.usage.prompt_tokens, output_tokens=response.usage.completion_tokens)
             return response.choices[0].message.content
         except (APIError, RateLimitError, APITimeoutError) as e:
             logger.error(f"OpenAI API error: {str(e)}")
@@ -151,7 +161,10 @@ class LLMManager:
                 SystemMessage(content=prompt),
                 HumanMessage(content=user_message)
             ]
-            response = client.invoke(messages)
+            with telemetry.span(CHAT, "langchain.invoke", model=self.config.deployment_name) as span:
+                response = client.invoke(messages)
+                usage = getattr(response, "usage_metadata", None) or {}
+                span.add(input_tokens=usage.get("input_tokens"), output_tokens=usage.get("output_tokens"))
             return response.content
         except (APIError, RateLimitError, APITimeoutError) as e:
             logger.error(f"LangChain Azure OpenAI API error: {str(e)}")
@@ -177,6 +190,53 @@ class LLMManager:
             logger.error(f"Error getting response: {str(e)}", exc_info=True)
             raise
 
+    def stream_response(self, prompt_type: str = None, client_type: str = None, custom_prompt: str = None, user_message: str = "Hello!", max_tokens: int = 600) -> Iterator[str]:
+        """
+        Stream the answer token by token instead of waiting for the full completion
+        """
+        logger.info(f"Streaming response using prompt_type: {prompt_type}, client_type: {client_type}")
+        client = self.get_client(client_type)
+        prompt = custom_prompt if custom_prompt else self.get_prompt(prompt_type)
+        try:
+            with telemetry.span(CHAT, "chat.completions.stream", model=self.config.deployment_name) as span:
+                stream = client.chat.completions.create(
+                    model=self.config.deployment_name,
+                    messages=[
+                        {"role": "system", "content": prompt},
+                        {"role": "user", "content": user_message}
+                    ],
+                    max_tokens=max_tokens,
+                    stream=True
+                )
+                for chunk in stream:
+                    # Azure sends chunks without choices, e.g. content filter results
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if not span.output_tokens:
+                            span.set(first_token_seconds=round(span.elapsed, 4))
+                        # one content chunk per generated token
+                        span.add(output_tokens=1)
+                        yield chunk.choices[0].delta.content
+        except (APIError, RateLimitError, APITimeoutError) as e:
+            logger.error(f"OpenAI API error while streaming: {str(e)}")
+            raise
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((APIError, RateLimitError, APITimeoutError)),
+        before_sleep=lambda retry_state: logger.warning(f"Retrying after error. Attempt {retry_state.attempt_number}/3")
+    )
+    def get_embedding(self, text: str, client_type: str = "embedding") -> List[float]:
+        """
+        Embed text with the deployment of this manager, e.g. LLMManager("text-embedding-3-small")
+        """
+        client = self.get_client(client_type)
+        with telemetry.span(EMBEDDING, "embeddings", model=self.config.deployment_name) as span:
+            response = client.embeddings.create(input=text, model=self.config.deployment_name)
+            if response.usage is not None:
+                span.add(input_tokens=response.usage.prompt_tokens)
+        return response.data[0].embedding
+
 if __name__ == "__main__":
     # llm_manager = LLMManager(deployment_name="Agent")
     # print(llm_manager.get_response("basic_system_prompt", "Agent"))
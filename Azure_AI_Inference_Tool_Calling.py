@@ -38,7 +38,6 @@ def sample_chat_completions_with_tools():
         print("Set them before running this sample.")
         exit()
 
-    from azure.ai.inference import ChatCompletionsClient
     from azure.ai.inference.models import (
         AssistantMessage,
         ChatCompletionsToolDefinition,
@@ -48,7 +47,9 @@ def sample_chat_completions_with_tools():
         ToolMessage,
         UserMessage,
     )
-    from azure.core.credentials import AzureKeyCredential
+    from InferenceClient import InferenceClient, AZURE_AI_INFERENCE
+    from ToolExecutor import ToolExecutor, ToolResultCache
+    from ConversationManager import ConversationManager
 
     # Define a function that retrieves flight information
     def get_flight_info(origin_city: str, destination_city: str):
@@ -91,17 +92,29 @@ def sample_chat_completions_with_tools():
         )
     )
 
+    # Register the tool with an executor that validates arguments against the declared schema
+    # and caches results, so repeated calls with the same arguments don't run the tool again.
+    # Set TOOL_CACHE_PATH to persist the cache across sessions.
+    tool_executor = ToolExecutor(cache=ToolResultCache(os.getenv("TOOL_CACHE_PATH")), default_ttl=3600)
+    tool_executor.register_definition(get_flight_info, flight_info)
+
     # Create a chat completion client. Make sure you selected a model that supports tools.
-    client = ChatCompletionsClient(endpoint=endpoint, credential=AzureKeyCredential(key), model="DeepSeek-V3")
+    # The underlying ChatCompletionsClient shares the pooled keep-alive transport of InferenceClient.
+    client = InferenceClient(AZURE_AI_INFERENCE, endpoint=endpoint, model="DeepSeek-V3", api_key=key).client
 
     # Make a chat completions call asking for flight information, while providing a tool to handle the request
-    messages = [
-        SystemMessage("You an assistant that helps users find flight information."),
-        UserMessage("What is the next flights from Seattle to Miami?"),
-    ]
+    # The conversation manager keeps the history sent on every turn within a token budget,
+    # truncating large tool outputs and dropping the oldest turns as the session grows.
+    messages = ConversationManager(max_tokens=4000, max_tool_output_tokens=500)
+    messages.extend(
+        [
+            SystemMessage("You an assistant that helps users find flight information."),
+            UserMessage("What is the next flights from Seattle to Miami?"),
+        ]
+    )
 
     response = client.complete(
-        messages=messages,
+        messages=messages.window(),
         tools=[flight_info],
     )
 
@@ -122,18 +135,15 @@ def sample_chat_completions_with_tools():
             tool_call = response.choices[0].message.tool_calls[0]
 
             # Only tools of type function are supported. Make a function call.
-            function_args = json.loads(tool_call.function.arguments.replace("'", '"'))
-            print(f"Calling function `{tool_call.function.name}` with arguments {function_args}.")
-            callable_func = locals()[tool_call.function.name]
-
-            function_response = callable_func(**function_args)
+            print(f"Calling function `{tool_call.function.name}` with arguments {tool_call.function.arguments}.")
+            function_response = tool_executor.execute_tool_call(tool_call)
             print(f"Function response = {function_response}")
 
             # Provide the tool response to the model, by appending it to the chat history
             messages.append(ToolMessage(function_response, tool_call_id=tool_call.id))
 
             # With the additional tools information on hand, get another response from the model
-            response = client.complete(messages=messages, tools=[flight_info])
+            response = client.complete(messages=messages.window(), tools=[flight_info])
 
             print(f"Model response = {response.choices[0].message.content}")
 
@@ -0,0 +1,477 @@
+"""
+In this module, we will be benchmarking the ingestion and inference paths against local stand-ins.
+
+The scenarios call the functions of the project as they are, with the settings
+pointed at local fakes instead of Azure: blobs (FakeServices.FakeBlobService),
+the chunking function (FakeServices.FakeChunkingFunction),
+embeddings and chat (FakeServices.FakeOpenAIService) and the search index
+(AI_Search.FakeSearchService). Every fake can add latency and throttle, so the
+client overhead, the retry paths and the concurrency of a change can be
+measured in isolation, without a subscription and without noise from the network.
+
+    chunk_document       AddData2AISearch.chunk_document, one blob
+    upload_to_search     AddData2AISearch.upload_to_search, the chunks of one blob
+    ingest_blob          both, as ingest_container does for every blob
+    generate_embedding   CreateAISearchIndex.generate_embedding, one text
+    get_response         AzureOpenAI.LLMManager.get_response, one chat completion
+    provision            AI_Search.Provisioner.provision_search_environment
+
+Each scenario reports throughput, p50/p99 latency and the peak memory of a
+traced pass. Runs are appended to a JSON lines file with the git version, and
+--compare flags the scenarios that regressed against the last run made with
+the same options:
+
+    python Benchmark.py
+    python Benchmark.py --scenarios ingest_blob generate_embedding --iterations 200 --concurrency 8
+    python Benchmark.py --latency 0.02 --throttle-every 10 --compare --fail-on-regression
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+from unittest import mock
+
+import AddData2AISearch
+import CreateAISearchIndex
+from AI_Search.FakeSearchService import FakeSearchService
+from AI_Search.RestClient import _shared_client
+from BlobStorageAccess import EntraIDBlobStorage
+from FakeServices import ACCOUNT_KEY, ACCOUNT_NAME, FakeBlobService, FakeChunkingFunction, FakeOpenAIService
+from Telemetry import telemetry
+from config import reload_settings
+
+RESULTS_PATH = "benchmark_results.jsonl"
+SCENARIOS = ("chunk_document", "upload_to_search", "ingest_blob", "generate_embedding", "get_response", "provision")
+# a scenario regresses when p50 or p99 grow, or the throughput drops, by more than this fraction
+REGRESSION_THRESHOLD = 0.2
+CHAT_DEPLOYMENT = "Agent"
+INDEX_NAME = "benchmark-index"
+
+
+@dataclass(frozen=True)
+class BenchmarkOptions:
+    """
+    Args:
+        iterations: operations per scenario
+        concurrency: threads running the operations
+        latency: seconds added by every fake to every call
+        throttle_every: every fake throttles every Nth call (0 disables throttling)
+        chunks_per_blob: chunks the chunking function returns per blob
+        dimensions: embedding dimensions of chunks and embeddings
+        memory_iterations: operations of the traced pass measuring memory
+    """
+
+    iterations: int = 50
+    concurrency: int = 4
+    latency: float = 0.0
+    throttle_every: int = 0
+    chunks_per_blob: int = 10
+    dimensions: int = 1536
+    memory_iterations: int = 10
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    operations: int
+    errors: int
+    seconds: float
+    p50: float
+    p99: float
+    throughput: float
+    peak_memory_mb: Optional[float]  # None when the scenario has no traced pass
+
+    @classmethod
+    def from_latencies(cls, name: str, latencies: List[float], errors: int, seconds: float, peak_memory_mb: Optional[float]):
+        ordered = sorted(latencies) or [0.0]
+        return cls(
+            name=name,
+            operations=len(latencies),
+            errors=errors,
+            seconds=round(seconds, 4),
+            p50=round(statistics.median(ordered), 6),
+            p99=round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 6),
+            throughput=round((len(latencies) - errors) / seconds, 2) if seconds else 0.0,
+            peak_memory_mb=round(peak_memory_mb, 3) if peak_memory_mb is not None else None,
+        )
+
+
+########################################################
+# Local environment
+########################################################
+
+
+class LocalBlobStorage(EntraIDBlobStorage):
+    """EntraIDBlobStorage on the shared key of a FakeBlobService, Entra ID tokens need https"""
+
+    def __init__(self, fake: FakeBlobService):
+        from azure.storage.blob import BlobServiceClient, LinearRetry
+
+        # the default retry policy backs off 15 s on a throttled call
+        self.blob_service_client = BlobServiceClient.from_connection_string(
+            fake.connection_string, retry_policy=LinearRetry(backoff=0.05, random_jitter_range=0)
+        )
+        self.container_client = self.blob_service_client.get_container_client(fake.container_name)
+        self.account_key = ACCOUNT_KEY
+
+
+def _search_client(fake: FakeSearchService):
+    from azure.core.credentials import AzureKeyCredential
+    from azure.search.documents import SearchClient
+
+    return SearchClient(fake.endpoint, INDEX_NAME, AzureKeyCredential("local"))
+
+
+def _clear_cached_clients():
+    AddData2AISearch.get_search_client.cache_clear()
+    AddData2AISearch.get_blob_storage.cache_clear()
+    CreateAISearchIndex.get_embeddings_client.cache_clear()
+    _shared_client.cache_clear()
+
+
+@contextlib.contextmanager
+def local_environment(options: BenchmarkOptions) -> Iterator[Dict[str, Any]]:
+    """
+    Start the fakes and point the settings and the shared clients at them.
+    Everything is restored on exit, and nothing reaches Azure in between.
+    """
+    blobs = {f"reports/report {i:05d}.txt": b"revenue grew " * 400 for i in range(options.iterations)}
+    fakes = {
+        "blob": FakeBlobService(blobs, latency=options.latency, throttle_every=options.throttle_every),
+        "chunking": FakeChunkingFunction(
+            overhead=options.latency,
+            per_record=0.0,
+            capacity=max(16, options.concurrency),
+            chunks_per_record=options.chunks_per_blob,
+            chunk_characters=1000,
+            dimensions=options.dimensions,
+        ),
+        "openai": FakeOpenAIService(dimensions=options.dimensions, latency=options.latency, throttle_every=options.throttle_every),
+        "search": FakeSearchService(latency=options.latency, throttle_every=options.throttle_every, items_per_second=1e6),
+    }
+
+    with contextlib.ExitStack() as stack:
+        for fake in fakes.values():
+            stack.enter_context(fake)
+        config_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        config_path = os.path.join(config_dir, "config.json")
+        with open(config_path, "w") as f:
+            json.dump({}, f)
+
+        # the environment wins over .env and config.json, so a developer's configuration can't leak in
+        environment = {
+            "CONFIG_PATH": config_path,
+            "AZURE_VAULT_URL": "",
+            "AZURE_SEARCH_SERVICE_NAME": "local",
+            "AZURE_SEARCH_SERVICE_URL": fakes["search"].endpoint,
+            "AZURE_SEARCH_ADMIN_KEY": "local",
+            "AZURE_SEARCH_INDEX_NAME": INDEX_NAME,
+            "AZURE_STORAGE_ACCOUNT_NAME": ACCOUNT_NAME,
+            "AZURE_STORAGE_CONTAINER": fakes["blob"].container_name,
+            "INGESTION_FUNCTION_URL": fakes["chunking"].endpoint,
+            "DOCUMENT_CHUNKING_FUNCTION_KEY": "local",
+            "COGNITIVE_SERVICES_KEY": "local",
+            "AZURE_OPENAI_API_BASE": fakes["openai"].endpoint,
+            "AZURE_OPENAI_API_KEY": "local",
+            "AZURE_OPENAI_API_VERSION": "2024-10-21",
+            "AZURE_OPENAI_EMBEDDING_API_BASE": fakes["openai"].endpoint,
+            "AZURE_OPENAI_EMBEDDING_API_KEY": "local",
+            "AZURE_OPENAI_EMBEDDING_API_VERSION": "2024-10-21",
+            "AZURE_OPENAI_EMBEDDING_DIMENSIONS": str(options.dimensions),
+            "INGESTION_LOG_LEVEL": "WARNING",
+        }
+        stack.enter_context(mock.patch.dict(os.environ, environment))
+        stack.callback(reload_settings)
+        stack.callback(_clear_cached_clients)
+        reload_settings()
+        _clear_cached_clients()
+
+        blob_storage = LocalBlobStorage(fakes["blob"])
+        search_client = _search_client(fakes["search"])
+        stack.enter_context(mock.patch.object(AddData2AISearch, "get_blob_storage", lambda: blob_storage))
+        stack.enter_context(mock.patch.object(AddData2AISearch, "get_search_client", lambda: search_client))
+
+        # the index upload_to_search writes to, as CreateAISearchIndex.py creates it
+        CreateAISearchIndex.create_index()
+        yield {**fakes, "blobs": sorted(blobs)}
+
+
+########################################################
+# Measurement
+########################################################
+
+
+def measure(
+    name: str,
+    operation: Callable[[Any], Any],
+    items: Sequence[Any],
+    concurrency: int = 1,
+    memory_items: Sequence[Any] = (),
+) -> ScenarioResult:
+    """
+    Run operation over items on concurrency threads and time every call,
+    then run it over memory_items alone with tracemalloc for the peak memory.
+    """
+    latencies: List[float] = []
+    errors = 0
+
+    def timed(item):
+        start_time = time.perf_counter()
+        try:
+            operation(item)
+            return time.perf_counter() - start_time, None
+        except Exception as e:
+            return time.perf_counter() - start_time, e
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for seconds, error in executor.map(timed, items):
+            latencies.append(seconds)
+            if error is not None:
+                errors += 1
+                logging.warning(f"{name}: {error}")
+    seconds = time.perf_counter() - start_time
+
+    peak_memory_mb = None
+    if memory_items:
+        tracemalloc.start()
+        try:
+            for item in memory_items:
+                timed(item)
+            peak_memory_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return ScenarioResult.from_latencies(name, latencies, errors, seconds, peak_memory_mb)
+
+
+def _scenario_operations(environment: Dict[str, Any], options: BenchmarkOptions) -> Dict[str, Callable[[int], Callable[[Any], Any]]]:
+    """Per scenario, a factory building the operation (the clients are created outside of the timings)"""
+
+    def chunk_document(count):
+        return AddData2AISearch.chunk_document
+
+    def upload_to_search(count):
+        payloads = {blob: AddData2AISearch.chunk_document(blob) for blob in environment["blobs"][:count]}
+        return lambda blob: AddData2AISearch.upload_to_search(payloads[blob], blob=blob)
+
+    def ingest_blob(count):
+        return lambda blob: AddData2AISearch.upload_to_search(AddData2AISearch.chunk_document(blob), blob=blob)
+
+    def generate_embedding(count):
+        return lambda blob: CreateAISearchIndex.generate_embedding(f"What happened to the revenue in {blob}?")
+
+    def get_response(count):
+        # imported here, the chat stack (langchain, openai) is only loaded by the chat scenario
+        from AzureOpenAI import LLMConfig, LLMManager
+
+        token = mock.patch.object(LLMConfig, "get_token", lambda self: (lambda: "local-token"))
+        token.start()
+        environment["patches"].append(token)
+        manager = LLMManager(deployment_name=CHAT_DEPLOYMENT)
+        return lambda blob: manager.get_response(
+            prompt_type="basic_system_prompt", client_type=CHAT_DEPLOYMENT, user_message=f"Summarize {blob}"
+        )
+
+    def provision(count):
+        from AI_Search.Provisioner import provision_search_environment
+
+        def run(blob):
+            suffix = environment["blobs"].index(blob)
+            report = provision_search_environment(
+                search_index_name=f"benchmark-{suffix}",
+                datasource_name=f"benchmark-{suffix}-datasource",
+                container_name=environment["blob"].container_name,
+                function_endpoint=environment["chunking"].endpoint,
+                connection_string=environment["blob"].connection_string,
+            )
+            if not report.succeeded:
+                raise RuntimeError(report.summary())
+        return run
+
+    return {
+        "chunk_document": chunk_document,
+        "upload_to_search": upload_to_search,
+        "ingest_blob": ingest_blob,
+        "generate_embedding": generate_embedding,
+        "get_response": get_response,
+        "provision": provision,
+    }
+
+
+def run_benchmark(scenarios: Sequence[str] = SCENARIOS, options: BenchmarkOptions = BenchmarkOptions()) -> List[ScenarioResult]:
+    results = []
+    # patches started by the scenarios, stopped even when a scenario raises
+    patches: List[Any] = []
+    previous = logging.root.manager.disable
+    # the modules log every call at INFO, which would be measured too
+    logging.disable(logging.INFO)
+    try:
+        with local_environment(options) as environment:
+            environment["patches"] = patches
+            factories = _scenario_operations(environment, options)
+            blobs = environment["blobs"]
+            memory_items = blobs[: options.memory_iterations]
+            for name in scenarios:
+                telemetry.reset()
+                operation = factories[name](len(blobs))
+                # one call first, so the clients and connection pools exist before the timings
+                with contextlib.suppress(Exception):
+                    operation(blobs[0])
+                # provisioning is concurrent on its own, and its names must stay distinct across calls
+                concurrency = 1 if name == "provision" else options.concurrency
+                items = blobs[1:] if name == "provision" else blobs
+                memory = [] if name == "provision" else memory_items
+                results.append(measure(name, operation, items, concurrency, memory))
+    finally:
+        for patch in patches:
+            patch.stop()
+        logging.disable(previous)
+    return results
+
+
+########################################################
+# Stored runs and comparison
+########################################################
+
+
+def _version() -> str:
+    try:
+        commit = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return commit.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_run(results: List[ScenarioResult], options: BenchmarkOptions, path: str = RESULTS_PATH, label: str = None) -> Dict[str, Any]:
+    """Append the run to the JSON lines file at path and return it"""
+    run = {
+        "version": _version(),
+        "label": label,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "options": asdict(options),
+        "scenarios": {result.name: asdict(result) for result in results},
+    }
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run) + "\n")
+    return run
+
+
+def load_runs(path: str = RESULTS_PATH) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_baseline(runs: List[Dict[str, Any]], options: BenchmarkOptions, version: str = None) -> Optional[Dict[str, Any]]:
+    """The last run made with the same options, of the given version or label if any"""
+    for run in reversed(runs):
+        if run["options"] != asdict(options):
+            continue
+        if version is None or version in (run["version"], run.get("label")):
+            return run
+    return None
+
+
+def compare(results: List[ScenarioResult], baseline: Dict[str, Any], threshold: float = REGRESSION_THRESHOLD):
+    """
+    Returns the comparison table and the names of the scenarios that regressed
+    """
+    lines = [f"Compared with {baseline['version']} ({baseline['timestamp']}):"]
+    lines.append(f"{'scenario':<22}{'p50':>10}{'p99':>10}{'ops/s':>10}")
+    regressions = []
+
+    def change(current: float, previous: float) -> float:
+        return (current - previous) / previous if previous else 0.0
+
+    for result in results:
+        previous = baseline["scenarios"].get(result.name)
+        if previous is None:
+            lines.append(f"{result.name:<22}{'new':>10}")
+            continue
+        p50, p99 = change(result.p50, previous["p50"]), change(result.p99, previous["p99"])
+        throughput = change(result.throughput, previous["throughput"])
+        regressed = p50 > threshold or p99 > threshold or throughput < -threshold
+        if regressed:
+            regressions.append(result.name)
+        lines.append(f"{result.name:<22}{p50:>+10.0%}{p99:>+10.0%}{throughput:>+10.0%}{'  REGRESSION' if regressed else ''}")
+    return "\n".join(lines), regressions
+
+
+def report(results: List[ScenarioResult]) -> str:
+    lines = [f"{'scenario':<22}{'ops':>6}{'errors':>8}{'ops/s':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}{'peak MiB':>10}"]
+    for r in results:
+        lines.append(
+            f"{r.name:<22}{r.operations:>6}{r.errors:>8}{r.throughput:>10}"
+            f"{round(r.p50 * 1000, 2):>10}{round(r.p99 * 1000, 2):>10}{r.peak_memory_mb if r.peak_memory_mb is not None else '-':>10}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    defaults = BenchmarkOptions()
+    parser = argparse.ArgumentParser(description="Benchmark the ingestion and inference paths against local fakes")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--iterations", type=int, default=defaults.iterations, help="operations per scenario")
+    parser.add_argument("--concurrency", type=int, default=defaults.concurrency, help="threads per scenario")
+    parser.add_argument("--latency", type=float, default=defaults.latency, help="seconds added to every call by the fakes")
+    parser.add_argument("--throttle-every", type=int, default=defaults.throttle_every, help="throttle every Nth call, 0 never")
+    parser.add_argument("--chunks-per-blob", type=int, default=defaults.chunks_per_blob)
+    parser.add_argument("--dimensions", type=int, default=defaults.dimensions)
+    parser.add_argument("--results", default=RESULTS_PATH, help="JSON lines file the runs are appended to")
+    parser.add_argument("--label", help="name of this run, e.g. the change being measured")
+    parser.add_argument("--no-save", action="store_true", help="don't append this run to the results")
+    parser.add_argument("--compare", nargs="?", const="", metavar="VERSION",
+                        help="compare with the last run with the same options, or the last one of VERSION (version or label)")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="relative change counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with 1 when a scenario regressed")
+    args = parser.parse_args(argv)
+
+    options = BenchmarkOptions(
+        iterations=args.iterations,
+        concurrency=args.concurrency,
+        latency=args.latency,
+        throttle_every=args.throttle_every,
+        chunks_per_blob=args.chunks_per_blob,
+        dimensions=args.dimensions,
+    )
+    # read before saving, so the run isn't compared with itself
+    runs = load_runs(args.results)
+    results = run_benchmark(args.scenarios, options)
+    print(report(results))
+    if not args.no_save:
+        save_run(results, options, args.results, args.label)
+
+    if args.compare is None:
+        return 0
+    baseline = find_baseline(runs, options, args.compare or None)
+    if baseline is None:
+        print("No stored run with the same options to compare with")
+        return 0
+    table, regressions = compare(results, baseline, args.threshold)
+    print(table)
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,17 @@
 from azure.identity import ClientSecretCredential
 from azure.storage.blob import BlobServiceClient
-from dotenv import load_dotenv
-from config import CONTAINER_NAME
+from config import get_settings
 from datetime import datetime, timezone, timedelta
 from typing import List
-import os
 from azure.storage.blob import generate_blob_sas, BlobSasPermissions
-load_dotenv()
+from Telemetry import BLOB, telemetry
+
+
+def _download_text(blob_client, blob_name: str) -> str:
+    with telemetry.span(BLOB, "download_blob", blob=blob_name) as span:
+        data = blob_client.download_blob().readall()
+        span.add(bytes_received=len(data))
+    return data.decode("utf-8")
 
 
 ##################################
@@ -14,13 +19,16 @@ load_dotenv()
 ##################################
 
 class ConStrBlobStorage:
-    def __init__(self, container_name: str = CONTAINER_NAME, connection_str: str = os.getenv("AZURE_CONNECTION_STRING")):
+    def __init__(self, container_name: str = None, connection_str: str = None):
+        storage = get_settings().storage
+        container_name = container_name or storage.container_name
+        connection_str = connection_str or storage.connection_string
         self.blob_service_client = BlobServiceClient.from_connection_string(connection_str)
         self.container_client = self.blob_service_client.get_container_client(container_name)
     
     def download_blob(self, blob_name):
         blob_client = self.container_client.get_blob_client(blob = blob_name)
-        downloaded_data = blob_client.download_blob().readall().decode("utf-8")
+        downloaded_data = _download_text(blob_client, blob_name)
         return downloaded_data
     
 
@@ -35,15 +43,19 @@ class ConStrBlobStorage:
 
 class SASBlobStorage:
     def __init__(self, 
-                 container_name: str = CONTAINER_NAME,
-                 sas_token: str = os.getenv("AZURE_SAS_TOKEN"), 
-                 storage_url: str = os.getenv("AZURE_STORAGE_URL")):
+                 container_name: str = None,
+                 sas_token: str = None,
+                 storage_url: str = None):
+        storage = get_settings().storage
+        container_name = container_name or storage.container_name
+        sas_token = sas_token or storage.sas_token
+        storage_url = storage_url or storage.url
         self.blob_service_client = BlobServiceClient(account_url = storage_url, credential = sas_token)
         self.container_client = self.blob_service_client.get_container_client(container_name)
 
     def download_blob(self, blob_name):
         blob_client = self.container_client.get_blob_client(blob = blob_name)
-        downloaded_data = blob_client.download_blob().readall().decode("utf-8")
+        downloaded_data = _download_text(blob_client, blob_name)
         return downloaded_data
 
 ##################################
@@ -54,15 +66,24 @@ class SASBlobStorage:
 
 class EntraIDBlobStorage:
     def __init__(self,
-                 container_name: str = CONTAINER_NAME,
-                 storage_url: str = os.getenv("AZURE_STORAGE_URL"),
-                 client_id: str = os.getenv("AZURE_CLIENT_ID"),
-                 client_secret: str = os.getenv("AZURE_CLIENT_SECRET"),
-                 tenant_id: str = os.getenv("AZURE_TENANT_ID"),
-                 account_key: str = os.getenv("BLOB_ACCOUNT_KEY")):
+                 container_name: str = None,
+                 storage_url: str = None,
+                 client_id: str = None,
+                 client_secret: str = None,
+                 tenant_id: str = None,
+                 account_key: str = None):
         
+        # Arguments left out come from the settings (config.py)
+        settings = get_settings()
+        container_name = container_name or settings.storage.container_name
+        storage_url = storage_url or settings.storage.url
+        client_id = client_id or settings.identity.client_id
+        client_secret = client_secret or settings.identity.client_secret
+        tenant_id = tenant_id or settings.identity.tenant_id
+        account_key = account_key or settings.storage.account_key
+
         # Clean up storage URL
-        storage_url = storage_url.rstrip('/')
+        storage_url = (storage_url or "").rstrip('/')
         
         # Validate inputs
         if not all([container_name, storage_url, client_id, client_secret, tenant_id, account_key]):
@@ -100,7 +121,7 @@ class EntraIDBlobStorage:
             if not blob_client.exists():
                 raise ValueError(f"Blob '{blob_name}' does not exist")
                 
-            downloaded_data = blob_client.download_blob().readall().decode("utf-8")
+            downloaded_data = _download_text(blob_client, blob_name)
             return downloaded_data
         except Exception as e:
             print(f"Error downloading blob '{blob_name}': {str(e)}")
@@ -108,8 +129,10 @@ class EntraIDBlobStorage:
     
     def list_blobs(self) -> List[str]:
         blob_list = []
-        for blob in self.container_client.list_blobs():
-            blob_list.append(blob.name)
+        with telemetry.span(BLOB, "list_blobs") as span:
+            for blob in self.container_client.list_blobs():
+                blob_list.append(blob.name)
+            span.set(blobs=len(blob_list))
         return blob_list
     
     def create_service_sas_blob(self, blob_name: str):
@@ -130,7 +153,8 @@ class EntraIDBlobStorage:
     
     def get_content_type(self, blob_name) -> str:
         blob_client = self.container_client.get_blob_client(blob=blob_name)
-        content_type = blob_client.get_blob_properties().content_settings.content_type
+        with telemetry.span(BLOB, "get_blob_properties", blob=blob_name):
+            content_type = blob_client.get_blob_properties().content_settings.content_type
         return content_type
     
     
@@ -0,0 +1,205 @@
+"""
+In this module, we will be keeping the chat history of multi-turn tool loops
+within a fixed token budget.
+
+Every message appended to the conversation is measured once. When the history
+is sent to the model, large tool outputs are truncated and the oldest turns are
+dropped (or folded into a summary) so that the prompt stays at a roughly
+constant size no matter how long the agent session runs.
+
+Messages can be Azure AI Inference message models (SystemMessage, UserMessage,
+AssistantMessage, ToolMessage) or plain OpenAI-style dicts.
+"""
+
+import copy
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# rough per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def _default_token_counter() -> Callable[[str], int]:
+    """
+    Use tiktoken when it is installed, otherwise estimate ~4 characters per token
+    """
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception:
+        return lambda text: (len(text) + 3) // 4
+
+
+def _get(message, name: str, default=None):
+    if isinstance(message, dict):
+        return message.get(name, default)
+    return getattr(message, name, default)
+
+
+def _with_content(message, content: str):
+    """Return a copy of the message with its content replaced"""
+    if isinstance(message, dict):
+        updated = dict(message)
+        updated["content"] = content
+        return updated
+    # a shallow copy of an azure-ai-inference model shares its data with the original
+    updated = copy.deepcopy(message)
+    updated.content = content
+    return updated
+
+
+def _text_of(message) -> str:
+    content = _get(message, "content")
+    if content is None:
+        text = ""
+    elif isinstance(content, str):
+        text = content
+    else:
+        text = json.dumps(content, default=str)
+
+    tool_calls = _get(message, "tool_calls")
+    if tool_calls:
+        text += json.dumps(
+            [
+                {"name": _get(_get(call, "function"), "name"), "arguments": _get(_get(call, "function"), "arguments")}
+                for call in tool_calls
+            ]
+        )
+    return text
+
+
+@dataclass
+class TrackedMessage:
+    message: Any
+    role: str
+    tokens: int
+    # the message as sent in the window (tool output truncated), computed once
+    sent: Optional["TrackedMessage"] = field(default=None, repr=False)
+
+
+class ConversationManager:
+    """
+    Budget-bounded chat history.
+
+    Args:
+        max_tokens: token budget of the history sent to the model
+        max_tool_output_tokens: tool outputs larger than this are truncated in the window
+        summarizer: optional callable that receives the dropped messages and returns
+            a short summary string; when omitted, old turns are simply dropped
+        token_counter: optional callable returning the number of tokens in a string
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 8000,
+        max_tool_output_tokens: int = 1000,
+        summarizer: Optional[Callable[[List[Any]], str]] = None,
+        token_counter: Optional[Callable[[str], int]] = None,
+    ):
+        self.max_tokens = max_tokens
+        self.max_tool_output_tokens = max_tool_output_tokens
+        self.summarizer = summarizer
+        self.count_tokens = token_counter or _default_token_counter()
+        self._messages: List[TrackedMessage] = []
+        self._summary: Optional[TrackedMessage] = None
+
+    def __len__(self):
+        return len(self._messages)
+
+    def append(self, message):
+        role = _get(message, "role") or "user"
+        role = getattr(role, "value", role)
+        tokens = self.count_tokens(_text_of(message)) + MESSAGE_OVERHEAD_TOKENS
+        self._messages.append(TrackedMessage(message=message, role=str(role), tokens=tokens))
+
+    def extend(self, messages):
+        for message in messages:
+            self.append(message)
+
+    @property
+    def total_tokens(self) -> int:
+        """Tokens of the messages currently held, excluding the summary"""
+        return sum(m.tokens for m in self._messages)
+
+    def _truncate_tool_output(self, tracked: TrackedMessage) -> TrackedMessage:
+        """The message as sent in the window; the history keeps the whole tool output"""
+        if tracked.role != "tool" or tracked.tokens <= self.max_tool_output_tokens:
+            return tracked
+        if tracked.sent is None:
+            text = _text_of(tracked.message)
+            # keep the head of the output, proportionally to the allowed tokens
+            keep_chars = max(1, int(len(text) * self.max_tool_output_tokens / tracked.tokens))
+            truncated = text[:keep_chars] + f"\n...[truncated {len(text) - keep_chars} characters]"
+            tracked.sent = TrackedMessage(
+                message=_with_content(tracked.message, truncated),
+                role=tracked.role,
+                tokens=self.count_tokens(truncated) + MESSAGE_OVERHEAD_TOKENS,
+            )
+        return tracked.sent
+
+    def _turns(self, messages: List[TrackedMessage]) -> List[List[TrackedMessage]]:
+        """
+        Group messages into turns starting at each user message, so an assistant
+        tool call is never separated from its tool results
+        """
+        turns: List[List[TrackedMessage]] = []
+        for tracked in messages:
+            if tracked.role == "user" or not turns:
+                turns.append([tracked])
+            else:
+                turns[-1].append(tracked)
+        return turns
+
+    def _summarize(self, dropped: List[TrackedMessage]):
+        previous = [self._summary.message] if self._summary else []
+        summary = self.summarizer(previous + [m.message for m in dropped])
+        message = {"role": "system", "content": f"Summary of the earlier conversation: {summary}"}
+        self._summary = TrackedMessage(
+            message=message, role="system", tokens=self.count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+        )
+
+    def compact(self):
+        """
+        Drop (or summarize) the oldest turns until the history fits the budget.
+        System messages and the latest turn are always kept.
+        """
+        system = [m for m in self._messages if m.role == "system"]
+        turns = self._turns([m for m in self._messages if m.role != "system"])
+
+        def size():
+            # measured as sent, with tool outputs truncated
+            summary_tokens = self._summary.tokens if self._summary else 0
+            return (sum(m.tokens for m in system) + summary_tokens
+                    + sum(self._truncate_tool_output(m).tokens for turn in turns for m in turn))
+
+        dropped: List[TrackedMessage] = []
+        while len(turns) > 1 and size() > self.max_tokens:
+            dropped.extend(turns.pop(0))
+
+        if dropped:
+            logger.info(f"Compacted {len(dropped)} messages out of the conversation window")
+            if self.summarizer is not None:
+                self._summarize(dropped)
+
+        self._messages = system + [m for turn in turns for m in turn]
+
+    def window(self) -> List[Any]:
+        """
+        Return the messages to send to the model, compacted to the token budget
+        """
+        self.compact()
+        system = [m.message for m in self._messages if m.role == "system"]
+        summary = [self._summary.message] if self._summary else []
+        rest = [self._truncate_tool_output(m).message for m in self._messages if m.role != "system"]
+        return system + summary + rest
+
+    @property
+    def window_tokens(self) -> int:
+        summary_tokens = self._summary.tokens if self._summary else 0
+        return summary_tokens + sum(self._truncate_tool_output(m).tokens for m in self._messages)
@@ -1,10 +1,11 @@
-from openai import AzureOpenAI
-import io
+import functools
 import json
-import openai
 import time
-import requests
-from AzureOpenAI import LLMManager
+from AI_Search.Reconciler import reconcile
+from AI_Search.RestClient import get_client
+from AI_Search.Schema import CHUNK_INDEX, embedding_dimensions
+from config import get_settings
+from Telemetry import EMBEDDING, telemetry
 
 #############################################
 # Constants
@@ -16,36 +17,28 @@ MAX_BACKOFF = 60
 #############################################
 # Configuration
 #############################################
-
-config = json.load(open("config.json"))
-index_schema_file = config['search_index_schema_file']
-# index_name = config["search_index_name"]
-index_name = "financial-index"
-search_service_name = config["search_service_name"]
-search_service_url = "https://{}.search.windows.net/".format(search_service_name)
-search_admin_key = config["search_admin_key"]
-search_headers = {  
-    'Content-Type': 'application/json',  
-    'api-key': search_admin_key  
-}  
-search_api_version = config["search_api_version"]
-openai_embeddings_model = config["openai_embedding_model"]
-openai_embedding_api_key = config["openai_embedding_api_key"]
-openai_embedding_api_base = config["openai_embedding_api_base"]
-openai_gpt_model = config["openai_gpt_model"]
-openai_embedding_api_version = config["openai_embedding_api_version"]
-ingestion_function_url = config["ingestion_function_url"]
+# Read from config.json, .env and the environment by config.get_settings(),
+# once, on first use. The search settings also carry the vector profile preset
+# (AI_Search/VectorProfiles.py) and, for models missing from
+# AI_Search.Schema.EMBEDDING_DIMENSIONS or shortened outputs, the dimensions.
 
 
 #############################################
 # Embeddings Client
 #############################################
-embeddings_client = AzureOpenAI(
-    api_version=openai_embedding_api_version,
-    azure_endpoint=openai_embedding_api_base,
-    api_key=openai_embedding_api_key,
-    azure_deployment=openai_gpt_model
-)
+
+@functools.lru_cache(maxsize=None)
+def get_embeddings_client():
+    """One client for every embedding call, created on first use"""
+    # the openai SDK is only imported when embeddings are needed, create_index doesn't use it
+    from openai import AzureOpenAI
+
+    openai_settings = get_settings().openai
+    return AzureOpenAI(
+        api_version=openai_settings.embedding_api_version,
+        azure_endpoint=openai_settings.embedding_api_base,
+        api_key=openai_settings.embedding_api_key,
+    )
 
 
 #############################################
@@ -59,33 +52,38 @@ def generate_embedding(text):
     if len(text) < 10:
         return None
         
-    client = AzureOpenAI(
-        api_version=openai_embedding_api_version,
-        azure_endpoint=openai_embedding_api_base,
-        api_key=openai_embedding_api_key
-    )    
+    import openai
+
+    client = get_embeddings_client()
+    openai_embeddings_model = get_settings().openai.embedding_model
     counter = 0
     incremental_backoff = 1   # seconds to wait on throttline - this will be incremental backoff
-    while True and counter < MAX_ATTEMPTS:
-        try:
-            # text-embedding-3-small == 1536 dims
-            response = client.embeddings.create(
-                input=text,
-                model=openai_embeddings_model
-            )
-            return json.loads(response.model_dump_json())["data"][0]['embedding']
-        except openai.APIError as ex:
-            # Handlethrottling - code 429
-            if str(ex.code) == "429":
-                incremental_backoff = min(MAX_BACKOFF, incremental_backoff * 1.5)
-                print ('Waiting to retry after', incremental_backoff, 'seconds...')
-                time.sleep(incremental_backoff)
-            elif str(ex.code) == "content_filter":
-                print ('API Error', ex.code)
-                return None
-        except Exception as ex:
-            counter += 1
-            print ('Error - Retry count:', counter, ex)
+    with telemetry.span(EMBEDDING, "embeddings", model=openai_embeddings_model) as span:
+        while True and counter < MAX_ATTEMPTS:
+            try:
+                # text-embedding-3-small == 1536 dims
+                response = client.embeddings.create(
+                    input=text,
+                    model=openai_embeddings_model
+                )
+                if response.usage is not None:
+                    span.add(input_tokens=response.usage.prompt_tokens)
+                return json.loads(response.model_dump_json())["data"][0]['embedding']
+            except openai.APIError as ex:
+                # Handlethrottling - code 429
+                if str(ex.code) == "429":
+                    span.retry(throttled=True)
+                    incremental_backoff = min(MAX_BACKOFF, incremental_backoff * 1.5)
+                    print ('Waiting to retry after', incremental_backoff, 'seconds...')
+                    time.sleep(incremental_backoff)
+                elif str(ex.code) == "content_filter":
+                    print ('API Error', ex.code)
+                    span.set(content_filter=True)
+                    return None
+            except Exception as ex:
+                counter += 1
+                span.retry()
+                print ('Error - Retry count:', counter, ex)
     return None
 
 
@@ -95,38 +93,30 @@ def generate_embedding(text):
 
 
 def create_index():
-    dims = len(generate_embedding('That quick brown fox'))
+    # The schema is generated from the typed model in AI_Search/Schema.py. The vector
+    # dimensions come from its model registry, no embedding call is needed to learn them.
+    settings = get_settings()
+    index_name = settings.search.index_name
+    dims = embedding_dimensions(CHUNK_INDEX.embedding_model, settings.openai.embedding_dimensions)
     print ('Dimensions in Embedding Model:', dims)
-    
-    with open(index_schema_file, "r") as f_in:
-        index_schema = json.loads(f_in.read())
-        index_schema['name'] = index_name
-        index_schema['vectorSearch']['vectorizers'][0]['azureOpenAIParameters']['resourceUri'] = openai_embedding_api_base
-        index_schema['vectorSearch']['vectorizers'][0]['azureOpenAIParameters']['deploymentId'] = openai_embeddings_model
-        index_schema['vectorSearch']['vectorizers'][0]['azureOpenAIParameters']['apiKey'] = openai_embedding_api_key
 
-    
-    # Making the POST requests to re-create the index  
-    delete_url = f"{search_service_url}/indexes/{index_name}?api-version={search_api_version}"  
-    response = requests.delete(delete_url, headers=search_headers)  
-    if response.status_code == 204:  
-        print(f"Index {index_name} deleted successfully.")  
-        # print(json.dumps(response.json(), indent=2))  
-    else:  
-        print("Error deleting index, it may not exist.")  
-    
-    # The endpoint URL for creating the index  
-    create_index_url = f"{search_service_url}/indexes?api-version={search_api_version}"  
-    response = requests.post(create_index_url, headers=search_headers, json=index_schema)  
-      
-    # Check the response  
-    if response.status_code == 201:  
-        print(f"Index {index_name} created successfully.")  
-        # print(json.dumps(response.json(), indent=2))  
-    else:  
-        print(f"Error creating index {index_name} :")  
-        print(response.json())  
+    index_schema = CHUNK_INDEX.to_rest(
+        index_name,
+        vectorizer_uri=settings.openai.embedding_api_base,
+        api_key=settings.openai.embedding_api_key,
+        deployment=settings.openai.embedding_model,
+        dimensions=dims,
+        vector_profile=settings.search.vector_profile,
+    )
 
+    
+    # Create the index, or update it in place when the change allows it.
+    # The index is only dropped and rebuilt when a field can't be changed in place.
+    search_client = get_client()
+    result = reconcile(search_client, "indexes", index_schema)
+    print(f"Index {index_name} {result.action}.")
+    for change in result.changes:
+        print(f"  {change}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,433 @@
+"""
+In this module, we will be standing in for Blob Storage, Azure OpenAI and our Azure Functions with local HTTP servers.
+
+The fakes speak enough of the real wire protocols for the real clients to talk
+to them: the azure-storage-blob SDK (with the shared-key connection string of
+the fake, as for Azurite), the openai SDK (AzureOpenAI with azure_endpoint set
+to the fake), the chunking skill and AddData2AISearch.chunk_document
+(FakeChunkingFunction), and FunctionClient (FakeFunction, the HTML-to-PDF
+function). Together with AI_Search/FakeSearchService.py they let the ingestion
+and inference paths run end to end without a subscription (see Benchmark.py).
+
+Blob Storage and Azure OpenAI take a latency per call and a throttle_every to
+answer every Nth call as throttled, to exercise the retry paths of the clients.
+The functions have their own cost and failure models.
+
+    with FakeBlobService({"report.txt": b"..."}) as blobs, FakeOpenAIService(dimensions=1536) as openai:
+        service = BlobServiceClient.from_connection_string(blobs.connection_string)
+        client = AzureOpenAI(azure_endpoint=openai.endpoint, api_key="local", api_version="2024-10-21")
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+from xml.sax.saxutils import escape
+
+# the well-known development account of the storage emulator (Azurite)
+ACCOUNT_NAME = "devstoreaccount1"
+ACCOUNT_KEY = "Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=="
+
+_DEPLOYMENT_PATH = re.compile(r"^/openai/deployments/(?P<deployment>[^/]+)/(?P<operation>embeddings|chat/completions)$")
+
+
+class _FakeServer:
+    """Lifecycle shared by the fakes: a threaded server on a free local port"""
+
+    def __init__(self, latency: float = 0.0, throttle_every: int = 0):
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @staticmethod
+    def _json(status: int, payload: dict) -> Tuple[int, Dict[str, str], bytes]:
+        return status, {"Content-Type": "application/json"}, json.dumps(payload).encode()
+
+    def _begin_call(self) -> bool:
+        """Count the call and apply the latency; False when the call is throttled"""
+        with self._lock:
+            self.calls += 1
+            throttled = bool(self.throttle_every) and self.calls % self.throttle_every == 0
+        if self.latency:
+            time.sleep(self.latency)
+        return not throttled
+
+    def handle(self, method: str, path: str, query: Dict[str, str], headers, body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        raise NotImplementedError
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                url = urlparse(self.path)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                status, headers, data = fake.handle(self.command, unquote(url.path), query, self.headers, body)
+                self.send_response(status)
+                headers.setdefault("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(data)
+
+            do_GET = do_HEAD = do_PUT = do_POST = do_DELETE = _handle
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+########################################################
+# Blob Storage
+########################################################
+
+
+class FakeBlobService(_FakeServer):
+    """
+    Blob endpoint of one storage account: container properties, list blobs,
+    blob properties and (ranged) downloads. Throttled calls get 503 ServerBusy,
+    as the service answers when an account is over its limits.
+
+    Args:
+        blobs: blob name -> content
+        container_name: the single container of the account
+        content_type: content type reported for every blob
+        latency: seconds per call
+        throttle_every: answer every Nth call with 503 (0 disables throttling)
+    """
+
+    def __init__(
+        self,
+        blobs: Optional[Dict[str, bytes]] = None,
+        container_name: str = "benchmark",
+        content_type: str = "text/plain",
+        latency: float = 0.0,
+        throttle_every: int = 0,
+    ):
+        super().__init__(latency, throttle_every)
+        self.blobs = dict(blobs or {})
+        self.container_name = container_name
+        self.content_type = content_type
+        self._modified = formatdate(usegmt=True)
+
+    @property
+    def url(self) -> str:
+        return f"{self.endpoint}/{ACCOUNT_NAME}"
+
+    @property
+    def connection_string(self) -> str:
+        return f"DefaultEndpointsProtocol=http;AccountName={ACCOUNT_NAME};AccountKey={ACCOUNT_KEY};BlobEndpoint={self.url};"
+
+    def _headers(self, **extra: str) -> Dict[str, str]:
+        return {
+            "x-ms-request-id": f"{random.getrandbits(64):016x}",
+            "x-ms-version": "2025-01-05",
+            "Last-Modified": self._modified,
+            "ETag": '"0x8D000000000000"',
+            **extra,
+        }
+
+    def _blob_headers(self, name: str, length: int) -> Dict[str, str]:
+        return self._headers(**{
+            "Content-Type": self.content_type,
+            "x-ms-blob-type": "BlockBlob",
+            "x-ms-creation-time": self._modified,
+            "Accept-Ranges": "bytes",
+            "Content-Length": str(length),
+        })
+
+    def _list(self) -> bytes:
+        blobs = "".join(
+            f"<Blob><Name>{escape(name)}</Name><Properties>"
+            f"<Creation-Time>{self._modified}</Creation-Time><Last-Modified>{self._modified}</Last-Modified>"
+            f"<Etag>0x8D000000000000</Etag><Content-Length>{len(data)}</Content-Length>"
+            f"<Content-Type>{self.content_type}</Content-Type><BlobType>BlockBlob</BlobType>"
+            f"</Properties></Blob>"
+            for name, data in sorted(self.blobs.items())
+        )
+        return (
+            f'<?xml version="1.0" encoding="utf-8"?><EnumerationResults ServiceEndpoint="{self.url}/" '
+            f'ContainerName="{escape(self.container_name)}"><Blobs>{blobs}</Blobs><NextMarker /></EnumerationResults>'
+        ).encode()
+
+    def handle(self, method, path, query, headers, body):
+        if not self._begin_call():
+            return 503, self._headers(**{"x-ms-error-code": "ServerBusy"}), b""
+
+        parts = path.lstrip("/").split("/", 2)
+        if len(parts) < 2 or parts[0] != ACCOUNT_NAME or parts[1] != self.container_name:
+            return 404, self._headers(**{"x-ms-error-code": "ContainerNotFound"}), b""
+        if len(parts) == 2:
+            if query.get("comp") == "list":
+                return 200, self._headers(**{"Content-Type": "application/xml"}), self._list()
+            return 200, self._headers(), b""
+
+        name = parts[2]
+        if name not in self.blobs:
+            return 404, self._headers(**{"x-ms-error-code": "BlobNotFound"}), b""
+        data = self.blobs[name]
+        if method == "HEAD":
+            return 200, self._blob_headers(name, len(data)), b""
+
+        byte_range = headers.get("x-ms-range") or headers.get("Range")
+        if byte_range and data:
+            start, _, end = byte_range.split("=", 1)[1].partition("-")
+            start, end = int(start), min(int(end or len(data) - 1), len(data) - 1)
+            chunk = data[start:end + 1]
+            response_headers = self._blob_headers(name, len(chunk))
+            response_headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            return 206, response_headers, chunk
+        return 200, self._blob_headers(name, len(data)), data
+
+
+########################################################
+# Azure OpenAI
+########################################################
+
+
+class FakeOpenAIService(_FakeServer):
+    """
+    Embeddings and chat completions (plain and streamed) of any deployment.
+    Throttled calls get 429 with a short retry-after-ms, as Azure OpenAI answers
+    when a deployment is over its tokens per minute.
+
+    Args:
+        dimensions: length of the returned embeddings
+        completion_tokens: tokens in every chat answer
+        latency: seconds per call, before the first token
+        per_token: seconds per generated token
+        throttle_every: answer every Nth call with 429 (0 disables throttling)
+    """
+
+    def __init__(
+        self,
+        dimensions: int = 1536,
+        completion_tokens: int = 50,
+        latency: float = 0.0,
+        per_token: float = 0.0,
+        throttle_every: int = 0,
+    ):
+        super().__init__(latency, throttle_every)
+        self.dimensions = dimensions
+        self.completion_tokens = completion_tokens
+        self.per_token = per_token
+
+    def _embeddings(self, deployment: str, request: dict):
+        inputs = request.get("input")
+        inputs = inputs if isinstance(inputs, list) else [inputs]
+        tokens = sum(len(str(text).split()) for text in inputs)
+        return self._json(200, {
+            "object": "list",
+            "model": deployment,
+            "data": [
+                {"object": "embedding", "index": i, "embedding": [random.uniform(-1, 1) for _ in range(self.dimensions)]}
+                for i in range(len(inputs))
+            ],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    def _chat(self, deployment: str, request: dict):
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in request.get("messages", []))
+        tokens = min(self.completion_tokens, request.get("max_tokens") or self.completion_tokens)
+        created = int(time.time())
+        if self.per_token:
+            time.sleep(self.per_token * tokens)
+        if not request.get("stream"):
+            return self._json(200, {
+                "id": "chatcmpl-local",
+                "object": "chat.completion",
+                "created": created,
+                "model": deployment,
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": " ".join(["token"] * tokens)}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": tokens, "total_tokens": prompt_tokens + tokens},
+            })
+
+        def event(delta: dict, finish_reason: str = None) -> str:
+            chunk = {
+                "id": "chatcmpl-local",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": deployment,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(chunk)}\n\n"
+
+        events = [event({"role": "assistant", "content": ""})]
+        events += [event({"content": "token "}) for _ in range(tokens)]
+        events += [event({}, "stop"), "data: [DONE]\n\n"]
+        return 200, {"Content-Type": "text/event-stream"}, "".join(events).encode()
+
+    def handle(self, method, path, query, headers, body):
+        if not self._begin_call():
+            status, response_headers, data = self._json(429, {"error": {"code": "429", "message": "Rate limit is exceeded."}})
+            response_headers["retry-after-ms"] = "10"
+            return status, response_headers, data
+
+        match = _DEPLOYMENT_PATH.match(path)
+        if method != "POST" or not match:
+            return self._json(404, {"error": {"code": "404", "message": "Resource not found"}})
+        request = json.loads(body or b"{}")
+        if match.group("operation") == "embeddings":
+            return self._embeddings(match.group("deployment"), request)
+        return self._chat(match.group("deployment"), request)
+
+
+########################################################
+# Azure Functions
+########################################################
+
+
+class FakeChunkingFunction(_FakeServer):
+    """
+    Answers like the document-chunking function, for the chunking skill
+    (AI_Search/SkillsetBenchmark.py) and AddData2AISearch.chunk_document.
+
+    A call costs overhead + per_record * batch size seconds. At most capacity
+    calls are served at the same time; once saturated, calls are rejected with
+    429 when throttle is set, otherwise they queue.
+
+    Args:
+        overhead: fixed seconds per call (cold path, document download, auth)
+        per_record: seconds per record in the batch
+        capacity: number of calls processed concurrently
+        throttle: reject calls above capacity with 429 instead of queuing them
+        chunks_per_record: chunks returned for every record
+        chunk_characters: characters of content per chunk
+        dimensions: length of the contentVector of every chunk, 0 for no vectors
+    """
+
+    def __init__(
+        self,
+        overhead: float = 0.1,
+        per_record: float = 0.02,
+        capacity: int = 4,
+        throttle: bool = False,
+        chunks_per_record: int = 1,
+        chunk_characters: int = 0,
+        dimensions: int = 0,
+    ):
+        super().__init__()
+        self.overhead = overhead
+        self.per_record = per_record
+        self.capacity = capacity
+        self.throttle = throttle
+        self.chunks_per_record = chunks_per_record
+        self.chunk_characters = chunk_characters
+        self.dimensions = dimensions
+        self._slots = threading.BoundedSemaphore(capacity)
+
+    def _chunk(self, value: dict, page: int) -> dict:
+        chunk = {
+            "content": ("lorem ipsum " * (self.chunk_characters // 12 + 1))[: self.chunk_characters],
+            "filepath": value["recordId"],
+            "url": value["data"].get("documentUrl", ""),
+            "page": page,
+        }
+        if self.dimensions:
+            chunk["contentVector"] = [random.uniform(-1, 1) for _ in range(self.dimensions)]
+        return chunk
+
+    def handle(self, method, path, query, headers, body):
+        self._begin_call()
+        if method != "POST":
+            return self._json(404, {"error": "Not found"})
+        if not self._slots.acquire(blocking=not self.throttle):
+            return self._json(429, {"error": "Too many requests"})
+        try:
+            values = json.loads(body or b"{}").get("values", [])
+            time.sleep(self.overhead + self.per_record * len(values))
+            return self._json(200, {
+                "values": [
+                    {
+                        "recordId": value["recordId"],
+                        "data": {"chunks": [self._chunk(value, page) for page in range(self.chunks_per_record)]},
+                        "errors": [],
+                        "warnings": [],
+                    }
+                    for value in values
+                ]
+            })
+        finally:
+            self._slots.release()
+
+
+class FakeFunction(_FakeServer):
+    """
+    Answers like the HTML-to-PDF function called by FunctionClient, at url.
+
+    Args:
+        latency: seconds per call
+        pdf_bytes: size of the returned document
+        fail_every: answer every Nth call with 503 (0 disables failures)
+        key: expected x-functions-key header, None accepts any caller
+    """
+
+    def __init__(self, latency: float = 0.05, pdf_bytes: int = 200_000, fail_every: int = 0, key: str = None):
+        super().__init__(latency)
+        self.pdf_bytes = pdf_bytes
+        self.fail_every = fail_every
+        self.key = key
+        self.max_in_flight = 0
+        self._in_flight = 0
+
+    @property
+    def url(self) -> str:
+        return f"{self.endpoint}/api/html-to-pdf"
+
+    def _answer(self, call: int, headers, body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        if self.key is not None and headers.get("x-functions-key") != self.key:
+            return self._json(401, {"error": "Unauthorized"})
+        if self.fail_every and call % self.fail_every == 0:
+            status, response_headers, data = self._json(503, {"error": "Service unavailable"})
+            response_headers["Retry-After"] = "0"
+            return status, response_headers, data
+        if "html" not in json.loads(body or b"{}"):
+            return self._json(400, {"error": "Missing html"})
+        return 200, {"Content-Type": "application/pdf"}, b"%PDF-1.7\n" + b"0" * max(0, self.pdf_bytes - 9)
+
+    def handle(self, method, path, query, headers, body):
+        if method != "POST":
+            return self._json(404, {"error": "Not found"})
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            time.sleep(self.latency)
+            return self._answer(call, headers, body)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
@@ -0,0 +1,230 @@
+"""
+In this module, we will be calling HTTP-triggered Azure Functions (such as the
+HTML-to-PDF converter) at volume.
+
+FunctionClient resolves the function key once (from Key Vault through the
+cached SecretProvider), keeps one pooled keep-alive session and sends documents
+concurrently under a concurrency cap. Responses are streamed to disk in chunks
+instead of being buffered in memory, transient failures (429, 5xx, dropped
+connections) are retried with backoff, and every batch reports its throughput.
+
+    client = FunctionClient(get_settings().functions.html_to_pdf_url, key_secret_name="AZURE-FUNCTION-HTML-TO-PDF")
+    report = client.convert_many([(html, "out/1.pdf"), (other_html, "out/2.pdf")])
+    print(report.summary())
+
+FakeServices.FakeFunction stands in for the function to run the client without Azure.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import unquote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from Telemetry import FUNCTION, telemetry
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+CHUNK_SIZE = 64 * 1024
+
+
+class FunctionError(Exception):
+    """Raised when the function keeps failing or returns a non retryable status"""
+
+    def __init__(self, status_code: Optional[int], text: str):
+        super().__init__(f"Function call failed with status {status_code}: {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+@dataclass
+class ConversionReport:
+    documents: int = 0
+    failed: int = 0
+    bytes_written: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+    latencies: List[float] = field(default_factory=list, repr=False)
+    errors: List[Tuple[str, str]] = field(default_factory=list)  # (output path, error)
+
+    @property
+    def documents_per_second(self) -> float:
+        return (self.documents - self.failed) / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.bytes_written / 1024 ** 2 / self.seconds if self.seconds > 0 else 0.0
+
+    def percentile(self, percentile: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))]
+
+    def summary(self) -> str:
+        return (
+            f"{self.documents - self.failed}/{self.documents} documents in {round(self.seconds, 2)} seconds "
+            f"({round(self.documents_per_second, 2)} docs/s, {round(self.megabytes_per_second, 2)} MB/s), "
+            f"p50 {round(self.percentile(50), 3)}s, p99 {round(self.percentile(99), 3)}s, "
+            f"{self.retries} retries, {self.failed} failed"
+        )
+
+
+class FunctionClient:
+    """
+    Args:
+        function_url: URL of the HTTP-triggered function
+        key: the function key; resolved from key_secret_name when omitted
+        key_secret_name: Key Vault secret holding the (URL-encoded) function key
+        provider: SecretProvider used to read the key, the shared one by default
+        max_concurrency: maximum requests in flight, also the connection pool size
+        timeout: (connect, read) timeout in seconds
+        max_retries: retries on 429/5xx and connection errors
+        backoff: initial backoff in seconds, doubled on each retry
+    """
+
+    def __init__(
+        self,
+        function_url: str,
+        key: str = None,
+        key_secret_name: str = None,
+        provider=None,
+        max_concurrency: int = 8,
+        timeout=(5, 120),
+        max_retries: int = 3,
+        backoff: float = 1.0,
+    ):
+        self.function_url = function_url
+        self.key_secret_name = key_secret_name
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._key = unquote(key) if key else None
+        self._key_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def key(self) -> Optional[str]:
+        # the secret is URL-encoded; decode it once and keep it
+        if self._key is None and self.key_secret_name:
+            with self._key_lock:
+                if self._key is None:
+                    if self.provider is None:
+                        from config import get_settings
+                        from KeyVault import get_provider
+
+                        self.provider = get_provider(get_settings().key_vault.vault_url)
+                    self._key = unquote(self.provider.get(self.key_secret_name))
+        return self._key
+
+    def _retry_delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return float(retry_after)
+                except ValueError:
+                    pass
+        return self.backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+
+    def invoke(self, payload: dict, output_path: str) -> Tuple[int, int]:
+        """
+        Call the function and stream the response body to output_path.
+
+        The body is written to a temporary file and renamed once complete, so a
+        failed or retried call never leaves a truncated file behind.
+        Returns (bytes written, retries).
+        """
+        headers = {"x-functions-key": self.key} if self.key else {}
+        temporary_path = f"{output_path}.part"
+        attempt = 0
+
+        with telemetry.span(FUNCTION, "invoke", url=self.function_url) as span:
+            while True:
+                response = None
+                try:
+                    with self.session.post(self.function_url, json=payload, headers=headers, timeout=self.timeout, stream=True) as response:
+                        span.add(bytes_sent=len(response.request.body or b""))
+                        if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                            if not response.ok:
+                                raise FunctionError(response.status_code, response.text[:500])
+                            written = 0
+                            with open(temporary_path, "wb") as f:
+                                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                                    f.write(chunk)
+                                    written += len(chunk)
+                            os.replace(temporary_path, output_path)
+                            span.add(bytes_received=written)
+                            return written, attempt
+                        logger.warning(f"Function returned {response.status_code}, retrying...")
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                    if os.path.exists(temporary_path):
+                        os.remove(temporary_path)
+                    if attempt >= self.max_retries:
+                        raise FunctionError(None, f"{type(e).__name__}: {e}") from e
+                    logger.warning(f"Function call failed with {type(e).__name__}, retrying...")
+
+                span.retry(throttled=response is not None and response.status_code == 429)
+                time.sleep(self._retry_delay(attempt, response))
+                attempt += 1
+
+    def convert_html(self, html: str, output_path: str) -> int:
+        """Convert one HTML document to a PDF file, returns the PDF size in bytes"""
+        return self.invoke({"html": html}, output_path)[0]
+
+    def convert_many(self, documents: Iterable[Tuple[str, str]]) -> ConversionReport:
+        """
+        Convert (html, output path) pairs concurrently, at most max_concurrency at a time.
+        Failures are recorded in the report instead of stopping the batch.
+        """
+        documents = list(documents)
+        report = ConversionReport(documents=len(documents))
+        lock = threading.Lock()
+
+        def convert(document: Tuple[str, str]):
+            html, output_path = document
+            start_time = time.perf_counter()
+            try:
+                written, retries = self.invoke({"html": html}, output_path)
+            except Exception as e:
+                logger.error(f"Conversion to {output_path} failed: {e}")
+                with lock:
+                    report.failed += 1
+                    report.errors.append((output_path, str(e)))
+                return
+            with lock:
+                report.bytes_written += written
+                report.retries += retries
+                report.latencies.append(time.perf_counter() - start_time)
+
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            list(executor.map(convert, documents))
+        report.seconds = time.perf_counter() - start_time
+        logger.info(report.summary())
+        return report
+
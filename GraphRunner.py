@@ -0,0 +1,239 @@
+"""
+In this module, we will be running LangGraph workflows without blocking on the full answer.
+
+GraphRunner wraps a StateGraph and adds:
+    - token streaming from the chat models called inside nodes
+    - parallel fan-out of independent branches (nodes in the same step run concurrently)
+    - checkpointing to a local SQLite file, so an interrupted run resumes from the
+      last completed step instead of redoing finished nodes (pass the same thread_id;
+      a run started without one gets a new id, logged and kept in last_thread_id)
+    - per-node timing to show where the latency goes
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from langgraph.graph import END, START, StateGraph
+
+logger = logging.getLogger(__name__)
+
+
+########################################################
+# Per-node timing
+########################################################
+
+
+class NodeTimings:
+    """
+    Collects wall-clock durations of graph nodes
+    """
+
+    def __init__(self):
+        self._durations: Dict[str, List[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, node: str, seconds: float):
+        with self._lock:
+            self._durations[node].append(seconds)
+        logger.info(f"Node '{node}' completed in {round(seconds, 3)} seconds")
+
+    def wrap(self, node: str, func: Callable) -> Callable:
+        """Wrap a sync or async node function so each call is timed"""
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start_time = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.record(node, time.perf_counter() - start_time)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(node, time.perf_counter() - start_time)
+
+        return wrapper
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                node: {"calls": len(values), "total": round(sum(values), 3), "max": round(max(values), 3)}
+                for node, values in self._durations.items()
+            }
+
+    def report(self) -> str:
+        lines = [f"{'node':<24}{'calls':>6}{'total (s)':>12}{'max (s)':>10}"]
+        for node, stats in sorted(self.summary().items(), key=lambda item: -item[1]["total"]):
+            lines.append(f"{node:<24}{stats['calls']:>6}{stats['total']:>12}{stats['max']:>10}")
+        return "\n".join(lines)
+
+
+########################################################
+# Graph runner
+########################################################
+
+
+def _sqlite_checkpointer(path: str):
+    """
+    Create a SQLite checkpointer and its connection. Requires the langgraph-checkpoint-sqlite package.
+    """
+    import sqlite3
+
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    connection = sqlite3.connect(path, check_same_thread=False)
+    return SqliteSaver(connection), connection
+
+
+class GraphRunner:
+    """
+    Build and run a LangGraph workflow with streaming, checkpointing and node timing.
+
+    Args:
+        state_schema: the graph state type, e.g. MessagesState
+        checkpoint_path: optional SQLite file used to checkpoint runs; when omitted
+            runs are not resumable. close() (or a with block) closes the file.
+    """
+
+    def __init__(self, state_schema, checkpoint_path: Optional[str] = None):
+        self.workflow = StateGraph(state_schema)
+        self.timings = NodeTimings()
+        self.checkpoint_path = checkpoint_path
+        # thread of the latest run, to resume it when it was started without a thread_id
+        self.last_thread_id: Optional[str] = None
+        self._graph = None
+        self._checkpointer = None
+        self._connection = None
+
+    def add_node(self, name: str, func: Callable):
+        self.workflow.add_node(name, self.timings.wrap(name, func))
+        self._graph = None
+        return self
+
+    def add_edge(self, source: str, target: str):
+        self.workflow.add_edge(source, target)
+        self._graph = None
+        return self
+
+    def add_sequence(self, nodes: Dict[str, Callable], source: str = START, target: str = END):
+        """Add nodes that run one after another between source and target"""
+        previous = source
+        for name, func in nodes.items():
+            self.add_node(name, func)
+            self.add_edge(previous, name)
+            previous = name
+        self.add_edge(previous, target)
+        return self
+
+    def add_parallel(self, branches: Dict[str, Callable], source: str = START, join: Optional[str] = None):
+        """
+        Fan out from source to independent branches that run concurrently in the
+        same step. When join is given (a node added beforehand), it runs once after
+        all branches finish. Branches that write the same state key need a reducer
+        on that key.
+        """
+        for name, func in branches.items():
+            self.add_node(name, func)
+            self.add_edge(source, name)
+        if join is not None:
+            self.workflow.add_edge(list(branches), join)
+            self._graph = None
+        return self
+
+    @property
+    def graph(self):
+        if self._graph is None:
+            checkpointer = None
+            if self.checkpoint_path:
+                if self._connection is None:
+                    self._checkpointer, self._connection = _sqlite_checkpointer(self.checkpoint_path)
+                checkpointer = self._checkpointer
+            self._graph = self.workflow.compile(checkpointer=checkpointer)
+        return self._graph
+
+    def close(self):
+        """Close the checkpoint file; the graph is compiled again on next use"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+            self._graph = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _config(self, thread_id: Optional[str]) -> Dict[str, Any]:
+        if self.checkpoint_path is None:
+            return {}
+        if thread_id is None:
+            thread_id = str(uuid.uuid4())
+            logger.info(f"Checkpointing the run as thread '{thread_id}', pass it as thread_id to resume")
+        self.last_thread_id = thread_id
+        return {"configurable": {"thread_id": thread_id}}
+
+    def _resume_input(self, inputs, config):
+        """
+        Return None (resume) when the thread has an unfinished checkpoint, else the inputs
+        """
+        if not config:
+            return inputs
+        state = self.graph.get_state(config)
+        if state.next:
+            logger.info(f"Resuming thread '{config['configurable']['thread_id']}' at nodes {list(state.next)}")
+            return None
+        return inputs
+
+    def invoke(self, inputs, thread_id: Optional[str] = None):
+        """
+        Run the graph to completion, resuming an interrupted run of the same thread
+        """
+        config = self._config(thread_id)
+        start_time = time.perf_counter()
+        result = self.graph.invoke(self._resume_input(inputs, config), config or None)
+        logger.info(f"Graph completed in {round(time.perf_counter() - start_time, 3)} seconds")
+        return result
+
+    async def ainvoke(self, inputs, thread_id: Optional[str] = None):
+        config = self._config(thread_id)
+        return await self.graph.ainvoke(self._resume_input(inputs, config), config or None)
+
+    def stream_tokens(self, inputs, thread_id: Optional[str] = None, nodes: Optional[List[str]] = None) -> Iterator[str]:
+        """
+        Yield model tokens as they are produced by the nodes of the graph.
+
+        Args:
+            inputs: the graph input
+            thread_id: checkpoint thread, used to resume interrupted runs
+            nodes: only stream tokens emitted by these nodes (all nodes by default)
+        """
+        config = self._config(thread_id)
+        start_time = time.perf_counter()
+        first_token_time = None
+        for chunk, metadata in self.graph.stream(
+            self._resume_input(inputs, config), config or None, stream_mode="messages"
+        ):
+            if nodes is not None and metadata.get("langgraph_node") not in nodes:
+                continue
+            text = chunk.content if isinstance(chunk.content, str) else ""
+            if not text:
+                continue
+            if first_token_time is None:
+                first_token_time = time.perf_counter() - start_time
+                logger.info(f"First token after {round(first_token_time, 3)} seconds")
+            yield text
+        logger.info(f"Graph streamed in {round(time.perf_counter() - start_time, 3)} seconds")
@@ -0,0 +1,394 @@
+"""
+In this module, we will be talking to every chat endpoint through one client.
+
+InferenceClient covers Azure AI Inference (serverless / AI Foundry models such as
+DeepSeek), Azure OpenAI and OpenAI-compatible endpoints (OpenAI, GitHub Models).
+All clients share pooled keep-alive HTTP connections, HTTP/2 when the h2 package is
+installed, and expose the same sync, async and streaming calls. Async connections
+belong to the event loop that opened them, so async clients share one pool per loop;
+close_async_pools() closes the pools of a loop before it ends.
+"""
+
+import asyncio
+import functools
+import importlib.util
+import logging
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import httpx
+
+from Telemetry import CHAT, telemetry
+
+logger = logging.getLogger(__name__)
+
+AZURE_AI_INFERENCE = "azure_ai_inference"
+AZURE_OPENAI = "azure_openai"
+OPENAI = "openai"
+PROVIDERS = (AZURE_AI_INFERENCE, AZURE_OPENAI, OPENAI)
+
+COGNITIVE_SERVICES_SCOPE = "https://cognitiveservices.azure.com/.default"
+
+
+########################################################
+# Shared HTTP transport
+########################################################
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    """Connection pool settings shared by all inference clients"""
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 120.0
+    connect_timeout: float = 5.0
+    read_timeout: float = 120.0
+
+
+DEFAULT_POOL = PoolConfig()
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def _httpx_kwargs(pool: PoolConfig) -> Dict[str, Any]:
+    return {
+        "http2": _http2_available(),
+        "limits": httpx.Limits(
+            max_connections=pool.max_connections,
+            max_keepalive_connections=pool.max_keepalive_connections,
+            keepalive_expiry=pool.keepalive_expiry,
+        ),
+        "timeout": httpx.Timeout(pool.read_timeout, connect=pool.connect_timeout),
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def get_http_client(pool: PoolConfig = DEFAULT_POOL) -> httpx.Client:
+    """Process-wide pooled httpx client used by the OpenAI SDK clients"""
+    return httpx.Client(**_httpx_kwargs(pool))
+
+
+# async pools per event loop, dropped with their loop (a second asyncio.run gets new ones)
+_loop_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Any, Any]]" = weakref.WeakKeyDictionary()
+# closes of async clients left behind by an earlier event loop, referenced until they are done
+_closing: "set[asyncio.Future]" = set()
+
+
+def _loop_pool(kind: str, pool: PoolConfig, create):
+    pools = _loop_pools.setdefault(asyncio.get_running_loop(), {})
+    if (kind, pool) not in pools:
+        pools[(kind, pool)] = create()
+    return pools[(kind, pool)]
+
+
+def get_async_http_client(pool: PoolConfig = DEFAULT_POOL) -> httpx.AsyncClient:
+    """Pooled httpx async client of the running event loop, used by the OpenAI SDK clients"""
+    return _loop_pool("httpx", pool, lambda: httpx.AsyncClient(**_httpx_kwargs(pool)))
+
+
+def get_aiohttp_session(pool: PoolConfig = DEFAULT_POOL):
+    """
+    Pooled aiohttp session of the running event loop, used as the azure-core
+    transport of async Azure AI Inference clients
+    """
+    import aiohttp
+
+    def create():
+        connector = aiohttp.TCPConnector(limit=pool.max_connections, keepalive_timeout=pool.keepalive_expiry)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=pool.connect_timeout, sock_read=pool.read_timeout)
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    return _loop_pool("aiohttp", pool, create)
+
+
+async def close_async_pools():
+    """Close the async pools of the running event loop, e.g. at the end of the coroutine given to asyncio.run"""
+    for client in _loop_pools.pop(asyncio.get_running_loop(), {}).values():
+        await (client.aclose() if isinstance(client, httpx.AsyncClient) else client.close())
+
+
+@functools.lru_cache(maxsize=None)
+def get_requests_session(pool: PoolConfig = DEFAULT_POOL):
+    """
+    Process-wide pooled requests session used as the azure-core transport of
+    Azure AI Inference clients (azure-core does not ship an httpx transport)
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool.max_keepalive_connections, pool_maxsize=pool.max_connections)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+########################################################
+# Inference client
+########################################################
+
+
+@dataclass
+class ChatResult:
+    content: str
+    finish_reason: Optional[str]
+    usage: Optional[Dict[str, int]]
+    latency: float
+    raw: Any
+
+
+def _usage_dict(usage) -> Optional[Dict[str, int]]:
+    if usage is None:
+        return None
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+        "total_tokens": getattr(usage, "total_tokens", None),
+    }
+
+
+class InferenceClient:
+    """
+    One chat client for Azure AI Inference, Azure OpenAI and OpenAI-compatible endpoints.
+
+    Args:
+        provider: one of "azure_ai_inference", "azure_openai" or "openai"
+        endpoint: the endpoint (or base URL) of the service
+        model: the model or deployment name sent with every request
+        api_key: key of the endpoint; when omitted, Microsoft Entra ID is used for Azure providers
+        api_version: API version, required for Azure OpenAI
+        pool: connection pool settings
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        endpoint: str,
+        model: str,
+        api_key: Optional[str] = None,
+        api_version: Optional[str] = None,
+        pool: PoolConfig = DEFAULT_POOL,
+    ):
+        if provider not in PROVIDERS:
+            raise ValueError(f"Unknown provider '{provider}', expected one of {PROVIDERS}")
+        self.provider = provider
+        self.endpoint = endpoint
+        self.model = model
+        self.api_key = api_key
+        self.api_version = api_version
+        self.pool = pool
+        self._client = None
+        self._async_client = None
+        self._async_loop = None
+
+    ########################################################
+    # Underlying SDK clients, created lazily
+    ########################################################
+
+    def _token_provider(self):
+        from azure.identity import get_bearer_token_provider
+        from config import get_credential
+
+        return get_bearer_token_provider(get_credential(), COGNITIVE_SERVICES_SCOPE)
+
+    def _azure_credential(self, asynchronous: bool = False):
+        if self.api_key:
+            from azure.core.credentials import AzureKeyCredential
+
+            return AzureKeyCredential(self.api_key)
+        from config import get_credential
+
+        return get_credential(asynchronous=asynchronous)
+
+    def _openai_kwargs(self, http_client) -> Dict[str, Any]:
+        if self.provider == AZURE_OPENAI:
+            kwargs = {"azure_endpoint": self.endpoint, "api_version": self.api_version, "http_client": http_client}
+            if self.api_key:
+                kwargs["api_key"] = self.api_key
+            else:
+                kwargs["azure_ad_token_provider"] = self._token_provider()
+            return kwargs
+        return {"base_url": self.endpoint, "api_key": self.api_key, "http_client": http_client}
+
+    @property
+    def client(self):
+        """The underlying synchronous SDK client"""
+        if self._client is None:
+            if self.provider == AZURE_AI_INFERENCE:
+                from azure.ai.inference import ChatCompletionsClient
+                from azure.core.pipeline.transport import RequestsTransport
+
+                self._client = ChatCompletionsClient(
+                    endpoint=self.endpoint,
+                    credential=self._azure_credential(),
+                    credential_scopes=[COGNITIVE_SERVICES_SCOPE],
+                    transport=RequestsTransport(session=get_requests_session(self.pool), session_owner=False),
+                    model=self.model,
+                )
+            elif self.provider == AZURE_OPENAI:
+                from openai import AzureOpenAI
+
+                self._client = AzureOpenAI(**self._openai_kwargs(get_http_client(self.pool)))
+            else:
+                from openai import OpenAI
+
+                self._client = OpenAI(**self._openai_kwargs(get_http_client(self.pool)))
+            logger.info(f"Created {self.provider} client for {self.endpoint}")
+        return self._client
+
+    def _close_stale_async_client(self, loop: asyncio.AbstractEventLoop):
+        """Close the async client of an earlier event loop, on that loop while it still runs"""
+        client, previous_loop = self._async_client, self._async_loop
+        self._async_client = None
+        self._async_loop = None
+        # the OpenAI clients only hold the httpx pool of their loop, closed by close_async_pools()
+        if self.provider != AZURE_AI_INFERENCE:
+            return
+        if previous_loop is not None and previous_loop.is_running():
+            closing = asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.close(), previous_loop))
+        else:
+            closing = loop.create_task(client.close())
+        _closing.add(closing)
+        closing.add_done_callback(_closing.discard)
+        closing.add_done_callback(
+            lambda done: done.cancelled() or done.exception() is None
+            or logger.debug(f"Closing the previous async client failed: {done.exception()}")
+        )
+
+    @property
+    def async_client(self):
+        """The underlying asynchronous SDK client of the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._async_client is not None and self._async_loop is not loop:
+            self._close_stale_async_client(loop)
+        if self._async_client is None:
+            self._async_loop = loop
+            if self.provider == AZURE_AI_INFERENCE:
+                from azure.ai.inference.aio import ChatCompletionsClient
+                from azure.core.pipeline.transport import AioHttpTransport
+
+                self._async_client = ChatCompletionsClient(
+                    endpoint=self.endpoint,
+                    credential=self._azure_credential(asynchronous=True),
+                    credential_scopes=[COGNITIVE_SERVICES_SCOPE],
+                    transport=AioHttpTransport(session=get_aiohttp_session(self.pool), session_owner=False),
+                    model=self.model,
+                )
+            elif self.provider == AZURE_OPENAI:
+                from openai import AsyncAzureOpenAI
+
+                self._async_client = AsyncAzureOpenAI(**self._openai_kwargs(get_async_http_client(self.pool)))
+            else:
+                from openai import AsyncOpenAI
+
+                self._async_client = AsyncOpenAI(**self._openai_kwargs(get_async_http_client(self.pool)))
+        return self._async_client
+
+    ########################################################
+    # Chat calls
+    ########################################################
+
+    def _request_kwargs(self, messages: List[Any], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return {"messages": messages, "model": self.model, **kwargs}
+
+    def _result(self, response, start_time: float) -> ChatResult:
+        choice = response.choices[0]
+        finish_reason = choice.finish_reason
+        return ChatResult(
+            content=choice.message.content or "",
+            finish_reason=getattr(finish_reason, "value", finish_reason),
+            usage=_usage_dict(getattr(response, "usage", None)),
+            latency=time.perf_counter() - start_time,
+            raw=response,
+        )
+
+    @staticmethod
+    def _delta(update) -> str:
+        if not update.choices:
+            return ""
+        return update.choices[0].delta.content or ""
+
+    @staticmethod
+    def _count_tokens(span, result: ChatResult):
+        if result.usage:
+            span.add(input_tokens=result.usage.get("prompt_tokens"), output_tokens=result.usage.get("completion_tokens"))
+
+    def complete(self, messages: List[Any], **kwargs) -> ChatResult:
+        """Blocking chat completion"""
+        start_time = time.perf_counter()
+        with telemetry.span(CHAT, "complete", provider=self.provider, model=self.model) as span:
+            if self.provider == AZURE_AI_INFERENCE:
+                response = self.client.complete(**self._request_kwargs(messages, kwargs))
+            else:
+                response = self.client.chat.completions.create(**self._request_kwargs(messages, kwargs))
+            result = self._result(response, start_time)
+            self._count_tokens(span, result)
+        logger.info(f"Chat completion from {self.provider} in {round(result.latency, 3)} seconds")
+        return result
+
+    def stream(self, messages: List[Any], **kwargs) -> Iterator[str]:
+        """Yield content tokens as they arrive"""
+        with telemetry.span(CHAT, "stream", provider=self.provider, model=self.model) as span:
+            if self.provider == AZURE_AI_INFERENCE:
+                response = self.client.complete(stream=True, **self._request_kwargs(messages, kwargs))
+            else:
+                response = self.client.chat.completions.create(stream=True, **self._request_kwargs(messages, kwargs))
+            try:
+                for update in response:
+                    text = self._delta(update)
+                    if text:
+                        if not span.output_tokens:
+                            span.set(first_token_seconds=round(span.elapsed, 4))
+                        # one content update per generated token
+                        span.add(output_tokens=1)
+                        yield text
+            finally:
+                close = getattr(response, "close", None)
+                if close is not None:
+                    close()
+
+    async def acomplete(self, messages: List[Any], **kwargs) -> ChatResult:
+        """Asynchronous chat completion"""
+        start_time = time.perf_counter()
+        with telemetry.span(CHAT, "complete", provider=self.provider, model=self.model) as span:
+            if self.provider == AZURE_AI_INFERENCE:
+                response = await self.async_client.complete(**self._request_kwargs(messages, kwargs))
+            else:
+                response = await self.async_client.chat.completions.create(**self._request_kwargs(messages, kwargs))
+            result = self._result(response, start_time)
+            self._count_tokens(span, result)
+        return result
+
+    async def astream(self, messages: List[Any], **kwargs) -> AsyncIterator[str]:
+        """Asynchronously yield content tokens as they arrive"""
+        with telemetry.span(CHAT, "stream", provider=self.provider, model=self.model) as span:
+            if self.provider == AZURE_AI_INFERENCE:
+                response = await self.async_client.complete(stream=True, **self._request_kwargs(messages, kwargs))
+            else:
+                response = await self.async_client.chat.completions.create(
+                    stream=True, **self._request_kwargs(messages, kwargs)
+                )
+            async for update in response:
+                text = self._delta(update)
+                if text:
+                    if not span.output_tokens:
+                        span.set(first_token_seconds=round(span.elapsed, 4))
+                    span.add(output_tokens=1)
+                    yield text
+
+    def close(self):
+        """Close the SDK clients; the shared connection pool stays open for other clients"""
+        if self._client is not None and self.provider == AZURE_AI_INFERENCE:
+            self._client.close()
+        self._client = None
+
+    async def aclose(self):
+        if self._async_client is not None and self.provider == AZURE_AI_INFERENCE:
+            await self._async_client.close()
+        self._async_client = None
+        self._async_loop = None
@@ -0,0 +1,271 @@
+"""
+In this module, we will be keeping the state of ingestion runs on disk, so a run can resume and failures are kept.
+
+The state lives in a local SQLite file (INGESTION_STATE_PATH, ingestion_state.sqlite
+by default) with three tables:
+
+    runs          one row per run of a container (and shard): the checkpoint (last
+                  completed blob and upload batch), when it started and when it finished
+    blobs         per run, the blobs in progress, done or failed, with the number of
+                  upload batches already written, so a run that died resumes
+                  where it stopped instead of at the first blob
+    dead_letters  blobs that failed, with the stage (chunking, upload), the
+                  error and the number of attempts, until a retry succeeds
+
+A run that did not finish is resumed by the next ingest of the same container,
+suffix and shard. Every write is committed right away, so a crash loses at most
+the blob in progress. The worker processes of a sharded ingestion
+(ShardedIngestion.py) share the file, each with its own run.
+
+    with IngestionState() as state:
+        run = state.start_run("namstorage", ".txt")
+        if blob not in state.settled_blobs(run.run_id):
+            state.start_blob(run.run_id, blob)
+            ...
+            state.complete_blob(run.run_id, blob, "namstorage")
+"""
+
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+# blob status within a run
+IN_PROGRESS = "in_progress"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    container TEXT NOT NULL,
+    suffix TEXT NOT NULL,
+    shard TEXT NOT NULL DEFAULT '',
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    last_blob TEXT,
+    last_batch INTEGER
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    run_id TEXT NOT NULL,
+    blob TEXT NOT NULL,
+    status TEXT NOT NULL,
+    batches_done INTEGER NOT NULL DEFAULT 0,
+    documents INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (run_id, blob)
+);
+CREATE TABLE IF NOT EXISTS dead_letters (
+    container TEXT NOT NULL,
+    blob TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    error_type TEXT NOT NULL,
+    error TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    failed_at REAL NOT NULL,
+    resolved_at REAL,
+    PRIMARY KEY (container, blob)
+);
+"""
+
+
+@dataclass(frozen=True)
+class IngestionRun:
+    run_id: str
+    container: str
+    suffix: str
+    started_at: float
+    resumed: bool = False
+    # label of the shard the run covers (ShardedIngestion.Shard), empty for the whole container
+    shard: str = ""
+
+
+@dataclass(frozen=True)
+class DeadLetter:
+    container: str
+    blob: str
+    run_id: str
+    stage: str
+    error_type: str
+    error: str
+    attempts: int
+    failed_at: float
+    resolved_at: Optional[float] = None
+
+
+class IngestionState:
+    """
+    Durable checkpoints and dead letters of the ingestion runs.
+
+    Args:
+        path: the SQLite file, the ingestion settings' state_path by default
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        if path is None:
+            from config import get_settings
+
+            path = get_settings().ingestion.state_path
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        # WAL lets a status query read while a run is writing
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        # files written before runs were sharded
+        if "shard" not in {row[1] for row in self._db.execute("PRAGMA table_info(runs)")}:
+            self._db.execute("ALTER TABLE runs ADD COLUMN shard TEXT NOT NULL DEFAULT ''")
+        self._db.commit()
+
+    def _write(self, statement: str, parameters=()):
+        with self._lock:
+            self._db.execute(statement, parameters)
+            self._db.commit()
+
+    def _read(self, statement: str, parameters=()) -> List[tuple]:
+        with self._lock:
+            return self._db.execute(statement, parameters).fetchall()
+
+    ########################################################
+    # Runs
+    ########################################################
+
+    def start_run(self, container: str, suffix: str, resume: bool = True, shard: str = "") -> IngestionRun:
+        """
+        The unfinished run of container, suffix and shard when resume is set and
+        there is one, otherwise a new run
+        """
+        if resume:
+            rows = self._read(
+                "SELECT run_id, started_at FROM runs WHERE container = ? AND suffix = ? AND shard = ? "
+                "AND finished_at IS NULL ORDER BY started_at DESC LIMIT 1",
+                (container, suffix, shard),
+            )
+            if rows:
+                return IngestionRun(rows[0][0], container, suffix, rows[0][1], resumed=True, shard=shard)
+        run = IngestionRun(uuid.uuid4().hex, container, suffix, time.time(), shard=shard)
+        self._write(
+            "INSERT INTO runs (run_id, container, suffix, shard, started_at) VALUES (?, ?, ?, ?, ?)",
+            (run.run_id, container, suffix, shard, run.started_at),
+        )
+        return run
+
+    def finish_run(self, run_id: str):
+        self._write("UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), run_id))
+
+    def checkpoint(self, run_id: str) -> Dict[str, object]:
+        """The last completed blob and batch of the run"""
+        rows = self._read("SELECT last_blob, last_batch, started_at, finished_at FROM runs WHERE run_id = ?", (run_id,))
+        if not rows:
+            return {}
+        last_blob, last_batch, started_at, finished_at = rows[0]
+        return {"last_blob": last_blob, "last_batch": last_batch, "started_at": started_at, "finished_at": finished_at}
+
+    def summary(self, run_id: str) -> Dict[str, int]:
+        """Number of blobs per status and documents uploaded in the run"""
+        counts = {IN_PROGRESS: 0, DONE: 0, FAILED: 0, "documents": 0}
+        for status, blobs, documents in self._read(
+            "SELECT status, COUNT(*), SUM(documents) FROM blobs WHERE run_id = ? GROUP BY status", (run_id,)
+        ):
+            counts[status] = blobs
+            counts["documents"] += documents or 0
+        return counts
+
+    ########################################################
+    # Blobs
+    ########################################################
+
+    def settled_blobs(self, run_id: str) -> Dict[str, str]:
+        """
+        Blobs of the run that a resume skips, with their status: done, or failed
+        and waiting in the dead letters for a retry
+        """
+        return dict(self._read("SELECT blob, status FROM blobs WHERE run_id = ? AND status != ?", (run_id, IN_PROGRESS)))
+
+    def is_done(self, run_id: str, blob: str) -> bool:
+        return bool(self._read("SELECT 1 FROM blobs WHERE run_id = ? AND blob = ? AND status = ?", (run_id, blob, DONE)))
+
+    def batches_done(self, run_id: str, blob: str) -> int:
+        """Upload batches of the blob already written by an earlier attempt of the run"""
+        rows = self._read("SELECT batches_done FROM blobs WHERE run_id = ? AND blob = ?", (run_id, blob))
+        return rows[0][0] if rows else 0
+
+    def start_blob(self, run_id: str, blob: str):
+        self._write(
+            "INSERT INTO blobs (run_id, blob, status, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (run_id, blob) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at",
+            (run_id, blob, IN_PROGRESS, time.time()),
+        )
+
+    def complete_batch(self, run_id: str, blob: str, batch: int, documents: int):
+        """Checkpoint upload batch number batch (0 based) of the blob"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE blobs SET batches_done = ?, documents = documents + ?, updated_at = ? WHERE run_id = ? AND blob = ?",
+                (batch + 1, documents, time.time(), run_id, blob),
+            )
+            self._db.execute("UPDATE runs SET last_blob = ?, last_batch = ? WHERE run_id = ?", (blob, batch, run_id))
+            self._db.commit()
+
+    def complete_blob(self, run_id: str, blob: str, container: str = None):
+        """Mark the blob done, and resolve its dead letter if it had one"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE blobs SET status = ?, updated_at = ? WHERE run_id = ? AND blob = ?", (DONE, now, run_id, blob)
+            )
+            self._db.execute("UPDATE runs SET last_blob = ? WHERE run_id = ?", (blob, run_id))
+            if container is not None:
+                self._db.execute(
+                    "UPDATE dead_letters SET resolved_at = ? WHERE container = ? AND blob = ? AND resolved_at IS NULL",
+                    (now, container, blob),
+                )
+            self._db.commit()
+
+    def fail_blob(self, run_id: str, container: str, blob: str, stage: str, error: BaseException):
+        """Mark the blob failed and record it as a dead letter, counting the attempts"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE blobs SET status = ?, updated_at = ? WHERE run_id = ? AND blob = ?", (FAILED, now, run_id, blob)
+            )
+            self._db.execute(
+                "INSERT INTO dead_letters (container, blob, run_id, stage, error_type, error, attempts, failed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, 1, ?) "
+                "ON CONFLICT (container, blob) DO UPDATE SET run_id = excluded.run_id, stage = excluded.stage, "
+                "error_type = excluded.error_type, error = excluded.error, failed_at = excluded.failed_at, "
+                "attempts = CASE WHEN dead_letters.resolved_at IS NULL THEN dead_letters.attempts + 1 ELSE 1 END, "
+                "resolved_at = NULL",
+                (container, blob, run_id, stage, type(error).__name__, str(error), now),
+            )
+            self._db.commit()
+
+    ########################################################
+    # Dead letters
+    ########################################################
+
+    def dead_letters(self, container: Optional[str] = None, include_resolved: bool = False) -> List[DeadLetter]:
+        statement = "SELECT container, blob, run_id, stage, error_type, error, attempts, failed_at, resolved_at FROM dead_letters"
+        conditions, parameters = [], []
+        if container is not None:
+            conditions.append("container = ?")
+            parameters.append(container)
+        if not include_resolved:
+            conditions.append("resolved_at IS NULL")
+        if conditions:
+            statement += " WHERE " + " AND ".join(conditions)
+        return [DeadLetter(*row) for row in self._read(statement + " ORDER BY failed_at", parameters)]
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,38 +1,217 @@
 from azure.keyvault.secrets import SecretClient
-from dotenv import load_dotenv 
-from azure.identity import DefaultAzureCredential, CredentialUnavailableError
-import os 
+from azure.identity import CredentialUnavailableError
+from azure.core.exceptions import ResourceNotFoundError
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import functools
 import logging 
+import threading
+import time
+from config import IdentitySettings, get_credential, get_settings
+from Telemetry import KEY_VAULT, telemetry
 logging.basicConfig(level=logging.INFO)
 
-load_dotenv()
 
-def get_secret(secret_name):
-    try:
-        # Step 1: Get the Key Vault URL from environment variables
-        vault_url = os.getenv("AZURE_VAULT_URL")
+#############################################
+# Secret provider
+#############################################
+
+@dataclass
+class CachedSecret:
+    value: str
+    version: Optional[str]
+    fetched_at: float
+
+
+class SecretProvider:
+    """
+    Resolves Key Vault secrets through one credential and one SecretClient,
+    caching the values in memory.
+
+    - get_many() fetches several secrets concurrently
+    - a cached value is served until its TTL expires; once it is older than
+      refresh_ahead * ttl it is refreshed in the background on the next access,
+      so callers on the hot path never wait for Key Vault
+    - start_background_refresh() refreshes the cache periodically, even without access
+    - secrets requested at a pinned version never expire, versions are immutable
+    - invalidate() drops a secret, or only a stale version of it, e.g. when a
+      "new secret version" event arrives
+
+    Args:
+        vault_url: the Key Vault URL, the configured key_vault.vault_url by default
+        ttl: seconds a cached value is served
+        refresh_ahead: fraction of the TTL after which a value is refreshed in the background
+        max_workers: concurrent Key Vault requests
+        client: an existing SecretClient (or a stand-in exposing get_secret(name, version))
+        identity: identity settings of the credential, the configured ones by default
+    """
+
+    def __init__(self, vault_url: str = None, ttl: float = 3600.0, refresh_ahead: float = 0.8, max_workers: int = 8, client=None,
+                 identity: Optional[IdentitySettings] = None):
+        self.vault_url = vault_url or get_settings().key_vault.vault_url
+        self.identity = identity
         # Example: "https://namkeyvault.vault.azure.net/"
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self._client = client
+        self._client_lock = threading.Lock()
+        self._cache: Dict[Tuple[str, Optional[str]], CachedSecret] = {}
+        self._cache_lock = threading.Lock()
+        self._refreshing = set()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="keyvault")
+        self._listeners: List[Callable[[str, str], None]] = []
+        self._stop = threading.Event()
+        self._refresher = None
+
+    @property
+    def client(self):
+        # The credential (the configured service principal, or the DefaultAzureCredential
+        # chain) is created once and the client, with its connection pool and token cache, is reused
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = SecretClient(vault_url=self.vault_url, credential=get_credential(self.identity))
+        return self._client
+
+    def on_change(self, listener: Callable[[str, str], None]):
+        """Register listener(name, new_value), called when a refresh finds a new version"""
+        self._listeners.append(listener)
+
+    def _fetch(self, name: str, version: Optional[str] = None) -> CachedSecret:
+        start_time = time.perf_counter()
+        with telemetry.span(KEY_VAULT, "get_secret", secret=name) as span:
+            secret = self.client.get_secret(name, version) if version else self.client.get_secret(name)
+            span.add(bytes_received=len(secret.value or ""))
+        properties = getattr(secret, "properties", None)
+        cached = CachedSecret(secret.value, getattr(properties, "version", version), time.monotonic())
+        logging.debug(f"Fetched secret '{name}' in {round(time.perf_counter() - start_time, 3)} seconds")
+
+        with self._cache_lock:
+            previous = self._cache.get((name, version))
+            self._cache[(name, version)] = cached
+        if version is None and previous is not None and previous.version != cached.version:
+            logging.info(f"Secret '{name}' changed to version {cached.version}")
+            for listener in self._listeners:
+                listener(name, cached.value)
+        return cached
+
+    def _refresh(self, name: str):
+        try:
+            self._fetch(name)
+        except Exception as e:
+            # keep serving the cached value until it expires
+            logging.warning(f"Background refresh of secret '{name}' failed: {e}")
+        finally:
+            with self._cache_lock:
+                self._refreshing.discard(name)
+
+    def _schedule_refresh(self, name: str):
+        with self._cache_lock:
+            if name in self._refreshing:
+                return
+            self._refreshing.add(name)
+        self._executor.submit(self._refresh, name)
+
+    def _cached(self, name: str, version: Optional[str]) -> Optional[str]:
+        with self._cache_lock:
+            cached = self._cache.get((name, version))
+        if cached is None:
+            return None
+        if version is not None:
+            return cached.value
+        age = time.monotonic() - cached.fetched_at
+        if age >= self.ttl:
+            return None
+        if age >= self.ttl * self.refresh_ahead:
+            self._schedule_refresh(name)
+        return cached.value
+
+    def get(self, name: str, version: str = None) -> str:
+        """Return the secret value, from the cache when it is fresh"""
+        value = self._cached(name, version)
+        if value is None:
+            value = self._fetch(name, version).value
+        return value
+
+    def get_many(self, names: Iterable[str], ignore_missing: bool = False) -> Dict[str, str]:
+        """
+        Return several secrets, fetching the ones not cached concurrently.
+        With ignore_missing, secrets that don't exist in the vault are left out.
+        """
+        names = list(dict.fromkeys(names))
+        values = {name: self._cached(name, None) for name in names}
+        missing = [name for name, value in values.items() if value is None]
 
-        # Step 2: Create an Azure credential object
-        credentials = DefaultAzureCredential()
-        # DefaultAzureCredential tries multiple authentication methods in this order:
+        def fetch(name: str) -> Optional[CachedSecret]:
+            try:
+                return self._fetch(name)
+            except ResourceNotFoundError:
+                if not ignore_missing:
+                    raise
+                return None
+
+        if missing:
+            start_time = time.perf_counter()
+            for name, cached in zip(missing, self._executor.map(fetch, missing)):
+                if cached is None:
+                    del values[name]
+                else:
+                    values[name] = cached.value
+            logging.info(f"Fetched {len(missing)} secrets in {round(time.perf_counter() - start_time, 3)} seconds")
+        return values
+
+    def invalidate(self, name: str, version: str = None):
+        """
+        Drop a cached secret. With a version, only drop it when the cached value
+        is another version, so a notification for the version we already hold is a no-op.
+        """
+        with self._cache_lock:
+            cached = self._cache.get((name, None))
+            if cached is not None and (version is None or cached.version != version):
+                del self._cache[(name, None)]
+                logging.info(f"Invalidated cached secret '{name}'")
+
+    def start_background_refresh(self, interval: float = None):
+        """Refresh every cached (unpinned) secret every interval seconds, half the TTL by default"""
+        interval = interval or self.ttl / 2
+
+        def run():
+            while not self._stop.wait(interval):
+                with self._cache_lock:
+                    names = [name for name, version in self._cache if version is None]
+                for name in names:
+                    self._schedule_refresh(name)
+
+        self._refresher = threading.Thread(target=run, daemon=True, name="keyvault-refresh")
+        self._refresher.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False)
+
+
+@functools.lru_cache(maxsize=None)
+def get_provider(vault_url: str = None, identity: Optional[IdentitySettings] = None) -> SecretProvider:
+    """
+    Shared provider per vault (and identity), so every caller reuses the same client and cache
+    """
+    return SecretProvider(vault_url, identity=identity)
+
+
+def get_secret(secret_name):
+    try:
+        # Cached and served from memory after the first call; the provider uses the
+        # configured service principal (config.get_credential) when AZURE_CLIENT_ID,
+        # AZURE_CLIENT_SECRET and AZURE_TENANT_ID are set in the environment, .env or
+        # config.json, and otherwise DefaultAzureCredential, which tries in this order:
         # 1. Environment variables (AZURE_CLIENT_ID, AZURE_CLIENT_SECRET, AZURE_TENANT_ID)
         # 2. Managed Identity
         # 3. Visual Studio Code credentials
         # 4. Azure CLI credentials
         # 5. Azure PowerShell credentials
-
-        # Step 3: Create a Key Vault client
-        client = SecretClient(vault_url=vault_url, credential=credentials)
-        # This creates a client that can interact with Key Vault using our credentials
-
-        # Step 4: Retrieve the secret
-        secret = client.get_secret(secret_name)
-        # Fetches the secret with the given name from Key Vault
-        
-        # Step 5: Return just the value of the secret
-        return secret.value
-        # The secret object contains metadata, but we only want the actual value
+        return get_provider(get_settings().key_vault.vault_url).get(secret_name)
 
     except CredentialUnavailableError:
         # This error occurs if no valid authentication method is found
@@ -40,45 +219,18 @@ def get_secret(secret_name):
         return None
     
 if __name__ == "__main__":
-    import requests
-    from urllib.parse import unquote
+    from FunctionClient import FunctionClient
 
-    # Retrieve the secret from Key Vault
+    # The function key is read once from Key Vault (URL-decoded and cached by the
+    # client), and the PDF is streamed to disk through a pooled session with retries
     secret_name = "AZURE-FUNCTION-HTML-TO-PDF"
-    secret_value = get_secret(secret_name)
+    function_url = get_settings().functions.html_to_pdf_url
 
-    if not secret_value:
-        logging.error(f"Failed to retrieve secret '{secret_name}'.")
+    with FunctionClient(function_url, key_secret_name=secret_name) as client:
+        report = client.convert_many([("<h1>Hello, World!</h1>", "hello.pdf")])
+
+    if report.failed:
+        for path, error in report.errors:
+            logging.error(f"Conversion to {path} failed: {error}")
     else:
-        logging.info(f"Secret '{secret_name}' retrieved successfully.")
-        print(f'Secret value: {secret_value}')
-
-        # URL decode the secret value since it contains URL-encoded characters
-        function_key = unquote(secret_value)
-
-        # Prepare headers and data for the request
-        headers = {
-            "Content-Type": "application/json",
-            "x-functions-key": function_key
-        }
-        data = {"html": "<h1>Hello, World!</h1>"}
-
-        # Trigger the Azure function
-        function_url = os.getenv("AZURE_FUNCTION_URL")
-        print(function_url)
-        response = requests.post(function_url, headers=headers, json=data)
-
-        # Log and print the response
-        print(f"Status Code: {response.status_code}")
-        print(f"Response Headers: {response.headers}")
-        print(f"Raw Response: {response.text}")
-
-        if response.ok:
-            try:
-                print("JSON Response:", response.json())
-            except requests.exceptions.JSONDecodeError:
-                print("Could not parse response as JSON")
-                print("Raw response content:", response.content)
-        else:
-            print(f"Request failed with status code: {response.status_code}")
-            print("Response content:", response.text)
+        print(report.summary())
@@ -1,78 +1,74 @@
-import os  
-import base64
-from openai import AzureOpenAI  
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider 
-from dotenv import load_dotenv
-from azure.ai.inference import ChatCompletionsClient
-from azure.ai.inference.models import SystemMessage, UserMessage
+from InferenceClient import InferenceClient, AZURE_AI_INFERENCE, AZURE_OPENAI
+from config import get_settings
+
+# Nothing runs on import: call ask_o1 / ask_r1, or run the module (python cli.py keyless)
 
-load_dotenv()
 
 # Service Principal
-        
-endpoint = os.getenv("ENDPOINT_URL", "https://o1-deployment.openai.azure.com/")  
-deployment = os.getenv("DEPLOYMENT_NAME", "o1")  
-      
-# Initialize Azure OpenAI Service client with Entra ID authentication
-token_provider = get_bearer_token_provider(  
-    DefaultAzureCredential(),  
-    "https://cognitiveservices.azure.com/.default"  
-)  
-  
-client = AzureOpenAI(  
-    azure_endpoint=endpoint,  
-    azure_ad_token_provider=token_provider,  
-    api_version="2024-12-01-preview",  
-)  
-  
 
-# IMAGE_PATH = "YOUR_IMAGE_PATH"
-# encoded_image = base64.b64encode(open(IMAGE_PATH, 'rb').read()).decode('ascii')
-chat_prompt = [
-    {
-        "role": "user",
-        "content": [
-            {
-                "type": "text",
-                "text": "Should I marry the one who loves me or the one I love?"
-            }
-        ]
-    }
-] 
-    
-# Include speech result if speech is enabled  
-messages = chat_prompt 
+def ask_o1(question: str, endpoint: str = None, deployment: str = None, max_completion_tokens: int = 40000) -> str:
+    """
+    Ask the o1 deployment with Entra ID authentication (no api_key)
+    """
+    settings = get_settings().inference
+
+    # Initialize Azure OpenAI Service client with Entra ID authentication (no api_key)
+    client = InferenceClient(
+        AZURE_OPENAI,
+        endpoint=endpoint or settings.o1_endpoint,
+        model=deployment or settings.deployment_name or "o1",
+        api_version="2024-12-01-preview",
+    )
+
+    # IMAGE_PATH = "YOUR_IMAGE_PATH"
+    # encoded_image = base64.b64encode(open(IMAGE_PATH, 'rb').read()).decode('ascii')
+    chat_prompt = [
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": question
+                }
+            ]
+        }
+    ]
+
+    completion = client.complete(
+        messages=chat_prompt,
+        max_completion_tokens=max_completion_tokens,
+        stop=None,
+    )
+    return completion.content
+
+
+# R1
+# Azure AI Inference goes through the shared requests session (azure-core), not the
+# httpx pool of the o1 client above, but every R1 client reuses its connections
 
-completion = client.chat.completions.create(  
-    model=deployment,  
-    messages=messages,
-    max_completion_tokens=40000,
-    stop=None,  
-    stream=False  
-)  
-  
-print(completion.choices[0].message.content)  
+def ask_r1(question: str, endpoint: str = None, model_name: str = None, key: str = None, max_tokens: int = 1000) -> str:
+    settings = get_settings().inference
+    client = InferenceClient(
+        AZURE_AI_INFERENCE,
+        endpoint=endpoint or settings.endpoint or "https://R1-deployment.services.ai.azure.com/models",
+        model=model_name or settings.deployment_name or "DeepSeek-R1",
+        api_key=key or settings.api_key,
+    )
 
+    response = client.complete(
+      messages=[
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": question}
+      ],
+      max_tokens=max_tokens
+    )
+    return response.content
 
-# R1 
-# Install the following dependencies: azure.identity and azure-ai-inference
-import os
-from azure.ai.inference import ChatCompletionsClient
-from azure.ai.inference.models import SystemMessage, UserMessage
-from azure.core.credentials import AzureKeyCredential
 
-endpoint = os.getenv("AZURE_INFERENCE_SDK_ENDPOINT", "https://R1-deployment.services.ai.azure.com/models")
-model_name = os.getenv("DEPLOYMENT_NAME", "DeepSeek-R1")
-key = os.getenv("AZURE_INFERENCE_SDK_KEY")
-client = ChatCompletionsClient(endpoint=endpoint, credential=AzureKeyCredential(key))
+def main():
+    print(ask_o1("Should I marry the one who loves me or the one I love?"))
+    print(ask_r1("What are 3 things to visit in Seattle?"))
 
-response = client.complete(
-  messages=[
-    SystemMessage(content="You are a helpful assistant."),
-    UserMessage(content="What are 3 things to visit in Seattle?")
-  ],
-  model = model_name,
-  max_tokens=1000
-)
 
-print(response.choices[0].message.content)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
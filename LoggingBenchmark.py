@@ -0,0 +1,117 @@
+"""
+In this module, we will be measuring what logging costs the ingestion per blob.
+
+The ingestion used to print every chunking payload and every chunk list with
+json.dumps(indent=2), embedding vectors included. This benchmark replays the
+logging of one blob (request, response, received chunks, upload) on a synthetic
+payload, once the old way and once through StructuredLog at INFO and at DEBUG
+with sampling, writing to os.devnull so only the formatting is measured.
+
+    python LoggingBenchmark.py
+    python LoggingBenchmark.py --chunks 100 --dimensions 3072 --repeat 50
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import random
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+from StructuredLog import StructuredLogger, KeyValueFormatter, describe_payload
+
+
+def build_payload(chunks: int = 50, dimensions: int = 1536) -> Dict:
+    """A chunking function response for one blob: chunks of ~1000 characters with a vector each"""
+    return {
+        "values": [
+            {
+                "recordId": "reports/annual report.txt",
+                "data": {
+                    "chunks": [
+                        {
+                            "content": "revenue " * 125,
+                            "filepath": "reports/annual report.txt",
+                            "url": "https://account.blob.core.windows.net/container/reports/annual%20report.txt",
+                            "page": i,
+                            "contentVector": [random.uniform(-1, 1) for _ in range(dimensions)],
+                        }
+                        for i in range(chunks)
+                    ]
+                },
+            }
+        ]
+    }
+
+
+def _old_logging(payload: Dict, out) -> None:
+    request = {"values": [{"recordId": "reports/annual report.txt", "data": {"documentSasToken": "?sv=..."}}]}
+    print(f"Sending payload: {json.dumps(request, indent=2)}", file=out)
+    print("Response status code: 200", file=out)
+    print(f"Response content: {json.dumps(payload)}", file=out)
+    print("Received chunks structure:", json.dumps(payload, indent=2), file=out)
+    print(f"Uploading {len(payload['values'][0]['data']['chunks'])} documents to search", file=out)
+
+
+def _new_logging(log: StructuredLogger) -> Callable[[Dict, object], None]:
+    def run(payload: Dict, out) -> None:
+        log.debug("chunking.request", sample=True, blob="reports/annual report.txt", content_type="text/plain")
+        log.debug("chunking.response", sample=True, blob="reports/annual report.txt", status=200, bytes=0)
+        log.debug("chunks.received", sample=True, **describe_payload(payload))
+        log.info("upload.start", documents=len(payload["values"][0]["data"]["chunks"]))
+    return run
+
+
+def _structured_logger(out, level: int, sample_rate: float) -> StructuredLogger:
+    logger = logging.getLogger(f"logging-benchmark-{level}-{sample_rate}")
+    handler = logging.StreamHandler(out)
+    handler.setFormatter(KeyValueFormatter())
+    logger.handlers = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+    return StructuredLogger(logger, sample_rate)
+
+
+def measure(run: Callable[[Dict, object], None], payload: Dict, out, repeat: int) -> float:
+    """Median microseconds per blob"""
+    timings: List[float] = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        run(payload, out)
+        timings.append(time.perf_counter() - start_time)
+    timings.sort()
+    return timings[len(timings) // 2] * 1e6
+
+
+def run_benchmark(chunks: int = 50, dimensions: int = 1536, repeat: int = 20) -> Dict[str, float]:
+    payload = build_payload(chunks, dimensions)
+    with open(os.devnull, "w") as out, contextlib.redirect_stdout(out):
+        return {
+            "print + json.dumps (before)": measure(_old_logging, payload, out, repeat),
+            "structured, INFO": measure(_new_logging(_structured_logger(out, logging.INFO, 0.01)), payload, out, repeat),
+            "structured, DEBUG 1% sampled": measure(_new_logging(_structured_logger(out, logging.DEBUG, 0.01)), payload, out, repeat),
+            "structured, DEBUG every event": measure(_new_logging(_structured_logger(out, logging.DEBUG, 1.0)), payload, out, repeat),
+        }
+
+
+def report(results: Dict[str, float]) -> str:
+    baseline = next(iter(results.values()))
+    lines = [f"{'logging':<32}{'us per blob':>14}{'speedup':>10}"]
+    for name, micros in results.items():
+        lines.append(f"{name:<32}{round(micros, 1):>14}{round(baseline / micros, 1) if micros else '-':>10}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Measure the logging cost of ingesting one blob")
+    parser.add_argument("--chunks", type=int, default=50, help="chunks per blob")
+    parser.add_argument("--dimensions", type=int, default=1536, help="embedding dimensions")
+    parser.add_argument("--repeat", type=int, default=20, help="blobs replayed per variant")
+    args = parser.parse_args(argv)
+    print(report(run_benchmark(args.chunks, args.dimensions, args.repeat)))
+
+
+if __name__ == "__main__":
+    main()
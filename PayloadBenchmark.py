@@ -0,0 +1,131 @@
+"""
+In this module, we will be measuring what embedding vectors cost the ingestion in memory and serialization.
+
+The chunking response used to be parsed with response.json(), leaving every
+vector as a list of Python floats, and the upload body was written by the
+search SDK with json.dumps. This benchmark builds the documents of a number of
+chunks both ways and reports, per variant:
+
+    memory      bytes held by the parsed chunking response (tracemalloc), per 10k chunks
+    parse       time to parse the chunking response, per blob
+    encode      time to write the upload body, per batch
+    bytes       size of one vector in the upload body
+
+    python PayloadBenchmark.py
+    python PayloadBenchmark.py --chunks 1000 --dimensions 3072 --repeat 5
+"""
+
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence
+
+import VectorPayload
+
+
+def build_response(chunks: int = 100, dimensions: int = 1536) -> bytes:
+    """A chunking function response for one blob, as the function writes it (json.dumps of floats)"""
+    return json.dumps({
+        "values": [
+            {
+                "recordId": "reports/annual report.txt",
+                "data": {
+                    "chunks": [
+                        {
+                            "content": "revenue " * 125,
+                            "filepath": "reports/annual report.txt",
+                            "url": "https://account.blob.core.windows.net/container/reports/annual%20report.txt",
+                            "page": i,
+                            "contentVector": [random.uniform(-1, 1) for _ in range(dimensions)],
+                        }
+                        for i in range(chunks)
+                    ]
+                },
+            }
+        ]
+    }).encode()
+
+
+def _documents(payload: Dict) -> List[Dict]:
+    return [
+        {"@search.action": "upload", "doc_id": str(i), "content": chunk["content"], "vector": chunk["contentVector"]}
+        for i, chunk in enumerate(payload["values"][0]["data"]["chunks"])
+    ]
+
+
+def _timed(run: Callable[[], object], repeat: int) -> float:
+    """Median milliseconds of run"""
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start_time)
+    timings.sort()
+    return timings[len(timings) // 2] * 1e3
+
+
+def _retained(parse: Callable[[bytes], Dict], response: bytes) -> int:
+    """Bytes still held by the parsed payload once parsing is done"""
+    tracemalloc.start()
+    payload = parse(response)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del payload
+    return retained
+
+
+def _json_fallback_dumps(value) -> bytes:
+    # VectorPayload.dumps as it runs without orjson installed
+    orjson, VectorPayload.orjson = VectorPayload.orjson, None
+    try:
+        return VectorPayload.dumps(value)
+    finally:
+        VectorPayload.orjson = orjson
+
+
+def run_benchmark(chunks: int = 100, dimensions: int = 1536, repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    response = build_response(chunks, dimensions)
+    lists = json.loads(response)
+    arrays = VectorPayload.loads(response)
+    list_documents, array_documents = _documents(lists), _documents(arrays)
+
+    def row(parse, documents, dumps) -> Dict[str, float]:
+        return {
+            "memory": _retained(parse, response) / chunks * 10_000 / 2**20,
+            "parse": _timed(lambda: parse(response), repeat),
+            "encode": _timed(lambda: dumps({"value": documents}), repeat),
+            "bytes": len(dumps(documents[0]["vector"])),
+        }
+
+    results = {"lists + json (before)": row(json.loads, list_documents, lambda value: json.dumps(value).encode())}
+    if VectorPayload.orjson is not None:
+        results["float32 + orjson"] = row(VectorPayload.loads, array_documents, VectorPayload.dumps)
+    results["float32 + json fallback"] = row(
+        lambda data: VectorPayload.compact_chunks(json.loads(data)), array_documents, _json_fallback_dumps
+    )
+    return results
+
+
+def report(results: Dict[str, Dict[str, float]], chunks: int) -> str:
+    lines = [f"{'vectors':<26}{'MiB / 10k chunks':>18}{'parse (ms)':>12}{f'encode {chunks} (ms)':>18}{'bytes / vector':>16}"]
+    for name, row in results.items():
+        lines.append(
+            f"{name:<26}{round(row['memory'], 1):>18}{round(row['parse'], 1):>12}"
+            f"{round(row['encode'], 1):>18}{round(row['bytes']):>16}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Measure the memory and serialization cost of embedding vectors")
+    parser.add_argument("--chunks", type=int, default=100, help="chunks per blob and per upload batch")
+    parser.add_argument("--dimensions", type=int, default=1536, help="embedding dimensions")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement")
+    args = parser.parse_args(argv)
+    print(report(run_benchmark(args.chunks, args.dimensions, args.repeat), args.chunks))
+
+
+if __name__ == "__main__":
+    main()
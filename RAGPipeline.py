@@ -0,0 +1,262 @@
+"""
+In this module, we will be answering questions over the search index (RAG) with
+the retrieval and generation stages overlapped as much as possible.
+
+For every question the pipeline:
+    - starts the keyword query immediately, while the question is being embedded
+    - runs the vector query as soon as the embedding is ready
+    - fuses (reciprocal rank fusion) and optionally reranks both result lists
+    - packs the best chunks into the context until the token budget is reached
+    - streams the answer from LLMManager token by token
+
+Every request records a per-stage latency breakdown (embed, search, rerank,
+first token, total) that is logged and returned to the caller.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional
+
+from AI_Search.Retrieval import KEYWORD, VECTOR, Retriever, SearchResult
+from ConversationManager import _default_token_counter
+
+if TYPE_CHECKING:
+    # langchain and the openai SDK are only loaded by the caller creating the LLMManager
+    from AzureOpenAI import LLMManager
+
+logger = logging.getLogger(__name__)
+
+RAG_SYSTEM_PROMPT = (
+    "You answer questions using only the numbered sources provided. "
+    "Cite the sources you use as [n]. If the sources don't contain the answer, say so."
+)
+
+# rank constant of reciprocal rank fusion, the value the search service uses
+RRF_K = 60
+
+
+########################################################
+# Per-request trace
+########################################################
+
+
+@dataclass
+class RAGTrace:
+    """Sources and stage latencies (seconds) of one request"""
+
+    question: str = ""
+    sources: List[SearchResult] = field(default_factory=list)
+    context_tokens: int = 0
+    embed: float = 0.0
+    keyword_search: float = 0.0
+    vector_search: float = 0.0
+    search: float = 0.0  # wall time of the whole retrieval stage, embedding included
+    rerank: float = 0.0
+    pack: float = 0.0
+    first_token: Optional[float] = None  # since the start of the request
+    total: float = 0.0
+
+    def to_dict(self) -> Dict[str, Optional[float]]:
+        return {
+            stage: None if getattr(self, stage) is None else round(getattr(self, stage), 4)
+            for stage in ("embed", "keyword_search", "vector_search", "search", "rerank", "pack", "first_token", "total")
+        }
+
+    def report(self) -> str:
+        stages = ", ".join(f"{stage} {value}s" for stage, value in self.to_dict().items() if value is not None)
+        return f"RAG request: {stages} ({len(self.sources)} sources, {self.context_tokens} context tokens)"
+
+
+def reciprocal_rank_fusion(result_lists: List[List[SearchResult]], k: int = RRF_K) -> List[SearchResult]:
+    """
+    Merge ranked lists: a document scores sum(1 / (k + rank)) over the lists it appears in
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, SearchResult] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            scores[result.id] = scores.get(result.id, 0.0) + 1.0 / (k + rank)
+            documents.setdefault(result.id, result)
+    return [documents[id] for id in sorted(scores, key=scores.get, reverse=True)]
+
+
+########################################################
+# Pipeline
+########################################################
+
+
+class RAGPipeline:
+    """
+    Args:
+        retriever: Retriever of the index, its embed function is used for the question
+        llm: LLMManager of the chat deployment
+        client_type: LLMManager client name used for generation
+        top: number of chunks kept after reranking
+        candidates: results requested from each retrieval leg
+        context_tokens: token budget of the packed sources
+        reranker: optional callable (question, results) -> results, applied after fusion
+        system_prompt: instructions sent with the sources
+        max_tokens: maximum tokens of the answer
+    """
+
+    def __init__(
+        self,
+        retriever: Retriever,
+        llm: "LLMManager",
+        client_type: str = "rag",
+        top: int = 5,
+        candidates: int = 20,
+        context_tokens: int = 3000,
+        reranker: Optional[Callable[[str, List[SearchResult]], List[SearchResult]]] = None,
+        system_prompt: str = RAG_SYSTEM_PROMPT,
+        max_tokens: int = 600,
+    ):
+        self.retriever = retriever
+        self.llm = llm
+        self.client_type = client_type
+        self.top = top
+        self.candidates = candidates
+        self.context_tokens = context_tokens
+        self.reranker = reranker
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.count_tokens = _default_token_counter()
+        # one pool for every request, the retrieval legs are I/O bound
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag")
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    ########################################################
+    # Stages
+    ########################################################
+
+    def _timed(self, trace: RAGTrace, stage: str, func, *args, **kwargs):
+        start_time = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            setattr(trace, stage, time.perf_counter() - start_time)
+
+    def _vector_leg(self, question: str, filter: Optional[str], trace: RAGTrace) -> List[SearchResult]:
+        if self.retriever.embed is None:
+            # the index vectorizer embeds the question on the service side
+            return self._timed(trace, "vector_search", self.retriever.search, question, mode=VECTOR, top=self.candidates, filter=filter)
+        vector = self._timed(trace, "embed", self.retriever.embed_query, question)
+        return self._timed(
+            trace, "vector_search", self.retriever.search, question, mode=VECTOR, top=self.candidates, filter=filter, vector=vector
+        )
+
+    def retrieve(self, question: str, filter: Optional[str] = None, trace: Optional[RAGTrace] = None) -> List[SearchResult]:
+        """
+        Run the keyword and vector legs concurrently, then fuse and rerank them
+        """
+        trace = trace if trace is not None else RAGTrace(question=question)
+        start_time = time.perf_counter()
+        keyword = self._executor.submit(
+            self._timed, trace, "keyword_search", self.retriever.search,
+            question, mode=KEYWORD, top=self.candidates, filter=filter, semantic=False,
+        )
+        vector = self._executor.submit(self._vector_leg, question, filter, trace)
+        result_lists = [keyword.result(), vector.result()]
+        trace.search = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        results = reciprocal_rank_fusion(result_lists)
+        if self.reranker is not None:
+            results = self.reranker(question, results)
+        trace.rerank = time.perf_counter() - start_time
+        return results[: self.top]
+
+    def pack(self, results: List[SearchResult], trace: Optional[RAGTrace] = None) -> str:
+        """
+        Number the chunks in rank order and keep those fitting the token budget
+        """
+        start_time = time.perf_counter()
+        blocks, sources, used = [], [], 0
+        for result in results:
+            location = result.fields.get("url") or result.fields.get("file_name") or result.id
+            page = result.fields.get("page_number")
+            header = f"[{len(blocks) + 1}] {location}" + (f", page {page}" if page not in (None, "") else "")
+            block = f"{header}\n{result.content.strip()}"
+            tokens = self.count_tokens(block)
+            if used + tokens > self.context_tokens:
+                continue  # a shorter chunk further down may still fit
+            blocks.append(block)
+            sources.append(result)
+            used += tokens
+        if trace is not None:
+            trace.pack = time.perf_counter() - start_time
+            trace.sources = sources
+            trace.context_tokens = used
+        return "\n\n".join(blocks)
+
+    ########################################################
+    # Requests
+    ########################################################
+
+    def stream(self, question: str, filter: Optional[str] = None, trace: Optional[RAGTrace] = None) -> Iterator[str]:
+        """
+        Yield answer tokens as they are generated. Pass a RAGTrace to get the
+        sources and the stage latencies once the generator is exhausted.
+
+        Args:
+            question: the user question
+            filter: OData filter applied to both retrieval legs
+            trace: filled with sources and timings
+        """
+        trace = trace if trace is not None else RAGTrace()
+        trace.question = question
+        start_time = time.perf_counter()
+
+        context = self.pack(self.retrieve(question, filter, trace), trace)
+        user_message = f"Sources:\n{context}\n\nQuestion: {question}"
+        tokens = self.llm.stream_response(
+            client_type=self.client_type,
+            custom_prompt=self.system_prompt,
+            user_message=user_message,
+            max_tokens=self.max_tokens,
+        )
+        try:
+            for token in tokens:
+                if trace.first_token is None:
+                    trace.first_token = time.perf_counter() - start_time
+                yield token
+        finally:
+            trace.total = time.perf_counter() - start_time
+            logger.info(trace.report())
+
+    def ask(self, question: str, filter: Optional[str] = None):
+        """
+        Answer a question without streaming. Returns (answer, trace).
+        """
+        trace = RAGTrace()
+        answer = "".join(self.stream(question, filter, trace))
+        return answer, trace
+
+
+if __name__ == "__main__":
+    import AzureOpenAI
+    from AI_Search.RestClient import get_client
+    from config import get_settings
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    settings = get_settings()
+    embeddings = AzureOpenAI.LLMManager(deployment_name=settings.openai.embedding_model)
+    retriever = Retriever(get_client(), settings.search.index_name, embed=embeddings.get_embedding)
+    with RAGPipeline(retriever, AzureOpenAI.LLMManager(deployment_name="Agent")) as pipeline:
+        trace = RAGTrace()
+        for token in pipeline.stream("What was the revenue growth last year?", trace=trace):
+            print(token, end="", flush=True)
+        print()
+        for i, source in enumerate(trace.sources, start=1):
+            print(f"[{i}] {source.fields.get('url')}")
+        print(trace.to_dict())
@@ -0,0 +1,173 @@
+"""
+In this module, we will be separating the reasoning of reasoning models (DeepSeek-R1 and
+similar) from their answer while the response is still streaming.
+
+Reasoning models emit a long <think>...</think> section before the answer. Instead of
+waiting for the whole response and post-processing it, ThinkTagParser splits every
+streamed chunk into reasoning and answer text as it arrives, so answer tokens can be
+handed to the caller immediately and reasoning can be dropped or logged.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+REASONING = "reasoning"
+ANSWER = "answer"
+
+OPEN_TAG = "<think>"
+CLOSE_TAG = "</think>"
+
+
+def _partial_tag_length(text: str, tag: str) -> int:
+    """Length of the longest suffix of text that is a prefix of tag"""
+    for length in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
+
+
+class ThinkTagParser:
+    """
+    Incremental parser splitting streamed text into reasoning and answer segments.
+
+    Tags split across chunks are handled by holding back the few characters that
+    could be the start of a tag until the next chunk arrives.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._in_think = False
+        self._strip_answer = False
+
+    @property
+    def in_think(self) -> bool:
+        return self._in_think
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """
+        Parse a chunk and return the (kind, text) segments that are complete
+        """
+        self._buffer += chunk
+        segments: List[Tuple[str, str]] = []
+
+        while self._buffer:
+            tag = CLOSE_TAG if self._in_think else OPEN_TAG
+            kind = REASONING if self._in_think else ANSWER
+            index = self._buffer.find(tag)
+
+            if index >= 0:
+                self._emit(segments, kind, self._buffer[:index])
+                self._buffer = self._buffer[index + len(tag):]
+                self._in_think = not self._in_think
+                # the answer usually starts with blank lines after </think>
+                self._strip_answer = not self._in_think
+                continue
+
+            hold = _partial_tag_length(self._buffer, tag)
+            self._emit(segments, kind, self._buffer[: len(self._buffer) - hold])
+            self._buffer = self._buffer[len(self._buffer) - hold:]
+            break
+
+        return segments
+
+    def close(self) -> List[Tuple[str, str]]:
+        """Flush what is left once the stream has ended"""
+        segments: List[Tuple[str, str]] = []
+        self._emit(segments, REASONING if self._in_think else ANSWER, self._buffer)
+        self._buffer = ""
+        return segments
+
+    def _emit(self, segments: List[Tuple[str, str]], kind: str, text: str):
+        if kind == ANSWER and self._strip_answer:
+            text = text.lstrip()
+            if text:
+                self._strip_answer = False
+        if text:
+            segments.append((kind, text))
+
+
+@dataclass
+class ReasoningStats:
+    """Timing and size of a streamed reasoning-model response"""
+
+    reasoning_chunks: int = 0
+    answer_chunks: int = 0
+    reasoning_chars: int = 0
+    answer_chars: int = 0
+    time_to_first_token: Optional[float] = None
+    time_to_first_answer_token: Optional[float] = None
+    total_time: Optional[float] = None
+    reasoning: List[str] = field(default_factory=list, repr=False)
+
+    def report(self) -> str:
+        return (
+            f"First token: {self.time_to_first_token and round(self.time_to_first_token, 3)}s, "
+            f"first answer token: {self.time_to_first_answer_token and round(self.time_to_first_answer_token, 3)}s, "
+            f"total: {self.total_time and round(self.total_time, 3)}s, "
+            f"reasoning tokens: {self.reasoning_chunks}, answer tokens: {self.answer_chunks}"
+        )
+
+
+def stream_answer(
+    tokens: Iterable[str],
+    reasoning: str = "drop",
+    on_reasoning: Optional[Callable[[str], None]] = None,
+    stats: Optional[ReasoningStats] = None,
+) -> Iterator[str]:
+    """
+    Yield only the answer text of a streamed reasoning-model response.
+
+    Args:
+        tokens: the streamed content deltas, e.g. InferenceClient.stream(...)
+        reasoning: "drop" to discard reasoning, "log" to log it at DEBUG level,
+            "keep" to keep it in stats.reasoning
+        on_reasoning: optional callback receiving reasoning text as it arrives
+        stats: optional ReasoningStats filled in while streaming; token counts
+            are counted as streamed deltas, which is one token per delta for
+            the Azure AI Inference and OpenAI endpoints
+    """
+    if reasoning not in ("drop", "log", "keep"):
+        raise ValueError(f"Unknown reasoning mode '{reasoning}', expected 'drop', 'log' or 'keep'")
+
+    stats = stats if stats is not None else ReasoningStats()
+    parser = ThinkTagParser()
+    start_time = time.perf_counter()
+
+    def handle(segments):
+        for kind, text in segments:
+            if kind == ANSWER:
+                stats.answer_chars += len(text)
+                if stats.time_to_first_answer_token is None:
+                    stats.time_to_first_answer_token = time.perf_counter() - start_time
+                    logger.info(f"First answer token after {round(stats.time_to_first_answer_token, 3)} seconds")
+                yield text
+                continue
+
+            stats.reasoning_chars += len(text)
+            if reasoning == "log":
+                logger.debug(f"Reasoning: {text}")
+            elif reasoning == "keep":
+                stats.reasoning.append(text)
+            if on_reasoning is not None:
+                on_reasoning(text)
+
+    for token in tokens:
+        if stats.time_to_first_token is None:
+            stats.time_to_first_token = time.perf_counter() - start_time
+        was_in_think = parser.in_think
+        segments = parser.feed(token)
+        kinds = {kind for kind, _ in segments}
+        # deltas made only of a tag count towards the reasoning section
+        if ANSWER not in kinds and (REASONING in kinds or was_in_think or parser.in_think):
+            stats.reasoning_chunks += 1
+        else:
+            stats.answer_chunks += 1
+        yield from handle(segments)
+
+    yield from handle(parser.close())
+    stats.total_time = time.perf_counter() - start_time
+    logger.info(stats.report())
@@ -1,21 +1,37 @@
 # Install the following dependencies: azure.identity and azure-ai-inference
-import os
-from azure.ai.inference import ChatCompletionsClient
-from azure.ai.inference.models import SystemMessage, UserMessage
-from azure.core.credentials import AzureKeyCredential
+from InferenceClient import InferenceClient, AZURE_AI_INFERENCE
+from ReasoningStream import ReasoningStats, stream_answer
+from config import get_settings
 
-endpoint = os.getenv("AZURE_INFERENCE_SDK_ENDPOINT", "https://namt-m82ig7ni-francecentral.services.ai.azure.com/models")
-model_name = os.getenv("DEPLOYMENT_NAME", "DeepSeek-V3")
-key = os.getenv("AZURE_DEEPSEEK_API_KEY")
-client = ChatCompletionsClient(endpoint=endpoint, credential=AzureKeyCredential(key))
 
-response = client.complete(
-  messages=[
-    SystemMessage(content="You are a helpful assistant."),
-    UserMessage(content="What are 3 things to visit in Seattle?")
-  ],
-  model = model_name,
-  max_tokens=1000
-)
+def stream_deepseek(question: str, endpoint: str = None, model_name: str = None, key: str = None,
+                    reasoning: str = "drop", max_tokens: int = 1000) -> ReasoningStats:
+  """
+  Print the answer of the DeepSeek deployment as it arrives; the <think> section of
+  reasoning models is dropped by default. Returns the stream statistics.
+  """
+  settings = get_settings().inference
+  client = InferenceClient(
+    AZURE_AI_INFERENCE,
+    endpoint=endpoint or settings.endpoint or "https://namt-m82ig7ni-francecentral.services.ai.azure.com/models",
+    model=model_name or settings.deployment_name or "DeepSeek-V3",
+    api_key=key or settings.deepseek_api_key,
+  )
 
-print(response)
\ No newline at end of file
+  tokens = client.stream(
+    messages=[
+      {"role": "system", "content": "You are a helpful assistant."},
+      {"role": "user", "content": question}
+    ],
+    max_tokens=max_tokens
+  )
+
+  stats = ReasoningStats()
+  for text in stream_answer(tokens, reasoning=reasoning, stats=stats):
+    print(text, end="", flush=True)
+  print()
+  return stats
+
+
+if __name__ == "__main__":
+  print(stream_deepseek("What are 3 things to visit in Seattle?").report())
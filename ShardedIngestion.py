@@ -0,0 +1,189 @@
+"""
+In this module, we will be splitting the ingestion of a container across processes and machines.
+
+Parsing chunking responses, building documents and writing upload bodies is
+CPU work, and one process runs it on one core. Here the blobs of the container
+are partitioned into shards, and every shard is ingested by its own process
+with ingest_container(shard=...):
+
+    hash      a stable hash (BLAKE2) of the blob name, which spreads the blobs evenly
+    prefix    a stable hash of the first folder of the blob name, so a folder stays
+              on one shard (a blob at the root of the container is its own folder)
+
+The assignment only depends on the blob name and the number of shards, so every
+process and every machine agrees on it without talking to the others. The only
+thing they share is the manifest, the IngestionState file: the workers of one
+machine record their runs, checkpoints and dead letters in it, each shard being
+its own run, so a shard that dies resumes on its own. Each shard returns its
+stats (blobs done and failed, documents, seconds) and merge_stats() adds them up.
+
+On one machine, N worker processes:
+
+    summary = ingest_sharded(".txt", workers=4)
+    python cli.py ingest --workers 4
+
+On N machines, shard i on machine i, each with its own state file (SQLite must
+not be shared over a network file system), then the stats are merged:
+
+    python cli.py ingest --shard-index 0 --shard-count 8 --stats-dir stats
+    python cli.py ingest-stats stats
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+SHARD_BY = ("hash", "prefix")
+
+# summary counters of ingest_container that are added up across shards
+_COUNTS = ("done", "failed", "in_progress", "documents", "resumed")
+
+
+@dataclass(frozen=True)
+class Shard:
+    """
+    Shard number index of count shards, blobs being assigned by hash or prefix
+    """
+    index: int
+    count: int
+    by: str = "hash"
+
+    def __post_init__(self):
+        if self.count < 1 or not 0 <= self.index < self.count:
+            raise ValueError(f"Shard index must be in [0, {self.count}), got {self.index}")
+        if self.by not in SHARD_BY:
+            raise ValueError(f"Shards are assigned by one of {SHARD_BY}, got {self.by!r}")
+
+    @property
+    def label(self) -> str:
+        """Identifies the shard's runs in the state file, e.g. hash:2/8"""
+        return f"{self.by}:{self.index}/{self.count}"
+
+    def owns(self, blob: str) -> bool:
+        return shard_of(blob, self.count, self.by) == self.index
+
+
+def shard_of(blob: str, count: int, by: str = "hash") -> int:
+    """The shard of the blob. Stable across processes and machines, unlike hash()"""
+    key = blob.split("/", 1)[0] if by == "prefix" else blob
+    # not CRC-32: names that differ in a digit or two share its low bits, and pile up on few shards
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count
+
+
+########################################################
+# Stats
+########################################################
+
+
+def merge_stats(stats: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Add up the summaries of the shards. seconds is the slowest shard, as the
+    shards run side by side, and missing_shards lists the shards without stats.
+    """
+    stats = list(stats)
+    merged: Dict[str, Any] = {name: sum(s.get(name, 0) for s in stats) for name in _COUNTS}
+    merged["shards"] = len(stats)
+    merged["seconds"] = max((s.get("seconds", 0.0) for s in stats), default=0.0)
+    merged["blobs_per_second"] = round(merged["done"] / merged["seconds"], 2) if merged["seconds"] else 0.0
+    counts = {s["shard_count"] for s in stats if "shard_count" in s}
+    if len(counts) == 1:
+        seen = {s["shard_index"] for s in stats}
+        merged["missing_shards"] = sorted(set(range(counts.pop())) - seen)
+    return merged
+
+
+def stats_path(directory: str, shard: Shard) -> str:
+    return os.path.join(directory, f"shard-{shard.by}-{shard.index}-of-{shard.count}.json")
+
+
+def write_stats(directory: str, shard: Shard, summary: Dict[str, Any]) -> str:
+    """Write the summary of a shard where ingest-stats (load_stats) finds it"""
+    os.makedirs(directory, exist_ok=True)
+    path = stats_path(directory, shard)
+    with open(path, "w") as f:
+        json.dump(summary, f, indent=2)
+    return path
+
+
+def load_stats(directory: str) -> List[Dict[str, Any]]:
+    stats = []
+    for name in sorted(os.listdir(directory)):
+        if name.startswith("shard-") and name.endswith(".json"):
+            with open(os.path.join(directory, name)) as f:
+                stats.append(json.load(f))
+    return stats
+
+
+########################################################
+# Ingestion
+########################################################
+
+
+def ingest_shard(suffix: str, shard: Shard, state_path: str = None, restart: bool = False,
+                 report: bool = True) -> Dict[str, Any]:
+    """Ingest one shard of the container; its summary carries the shard, for merge_stats()"""
+    from AddData2AISearch import ingest_container
+
+    summary = ingest_container(suffix, state_path=state_path, restart=restart, shard=shard, report=report)
+    return {"shard": shard.label, "shard_index": shard.index, "shard_count": shard.count, **summary}
+
+
+def _worker(suffix: str, shard: Shard, state_path: Optional[str], restart: bool) -> Dict[str, Any]:
+    # the parent prints the merged summary, not one telemetry table per worker
+    return ingest_shard(suffix, shard, state_path, restart, report=False)
+
+
+def ingest_sharded(
+    suffix: str = ".txt",
+    workers: int = None,
+    by: str = None,
+    state_path: str = None,
+    restart: bool = False,
+    initializer: Callable[..., None] = None,
+    initargs: tuple = (),
+) -> Dict[str, Any]:
+    """
+    Ingest the container with one process per shard (the ingestion settings'
+    workers and shard_by by default) and return the merged stats, with the
+    stats of every shard under "per_shard".
+
+    Args:
+        initializer, initargs: run in every worker process before it ingests,
+            e.g. to set up credentials or clients the settings don't describe
+    """
+    from config import get_settings
+    from IngestionState import IngestionState
+    from StructuredLog import INGESTION_LOGGER, configure_logging, get_logger
+
+    settings = get_settings().ingestion
+    workers = workers or settings.workers
+    shards = [Shard(index, workers, by or settings.shard_by) for index in range(workers)]
+
+    configure_logging()
+    log = get_logger(INGESTION_LOGGER)
+    # create (or upgrade) the state file once, before the workers open it side by side
+    IngestionState(state_path).close()
+
+    start_time = time.perf_counter()
+    log.info("ingestion.sharded", workers=workers, shard_by=shards[0].by)
+    # spawned, not forked: the parent's cached clients and their connections stay in the parent
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=initializer,
+        initargs=initargs,
+    ) as pool:
+        stats = list(pool.map(_worker, [suffix] * workers, shards, [state_path] * workers, [restart] * workers))
+
+    merged = merge_stats(stats)
+    # wall time, including starting the workers
+    merged["seconds"] = round(time.perf_counter() - start_time, 3)
+    merged["blobs_per_second"] = round(merged["done"] / merged["seconds"], 2) if merged["seconds"] else 0.0
+    log.info("ingestion.merged", **{k: v for k, v in merged.items() if k != "missing_shards"})
+    return {**merged, "per_shard": stats}
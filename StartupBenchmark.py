@@ -0,0 +1,154 @@
+"""
+In this module, we will be measuring how long the modules of the project take to import.
+
+Every measurement runs in a fresh interpreter, so nothing is already cached in
+sys.modules, and is repeated to report the median. Besides the time, the report
+lists the heavy packages (langchain, langgraph, azure SDKs, openai, numpy) each
+import pulled in: a library module should not load what its callers may never use,
+and `python cli.py --help` should load none of them.
+
+    python cli.py startup
+    python StartupBenchmark.py --repeat 5 CreateAISearchIndex AzureOpenAI
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence
+
+HEAVY_PACKAGES = (
+    "langchain_core",
+    "langchain_openai",
+    "langgraph",
+    "openai",
+    "azure.identity",
+    "azure.search.documents",
+    "azure.storage.blob",
+    "azure.keyvault.secrets",
+    "azure.ai.inference",
+    "numpy",
+    "tiktoken",
+)
+
+# the script modules and the CLI, followed by the library modules they used to pull in eagerly
+DEFAULT_MODULES = (
+    "config",
+    "cli",
+    "AddData2AISearch",
+    "CreateAISearchIndex",
+    "Keyless_Auth",
+    "RunDeepSeekR1",
+    "github_model_inference",
+    "AzureOpenAI",
+    "RAGPipeline",
+)
+
+_PROBE = """
+import json, sys, time
+start_time = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start_time
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": seconds, "heavy": heavy}}))
+"""
+
+_CLI_PROBE = """
+import json, sys, time, runpy
+start_time = time.perf_counter()
+sys.argv = ["cli.py", "--help"]
+try:
+    runpy.run_module("cli", run_name="__main__")
+except SystemExit:
+    pass
+seconds = time.perf_counter() - start_time
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": seconds, "heavy": heavy}}))
+"""
+
+
+@dataclass
+class ImportTiming:
+    module: str
+    seconds: List[float] = field(default_factory=list)
+    heavy: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def median_ms(self) -> float:
+        return statistics.median(self.seconds) * 1000 if self.seconds else 0.0
+
+
+def _run_probe(code: str, cwd: str) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "import failed")
+    # the probe prints its result last; the --help text comes before it
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def measure_import(module: str, repeat: int = 3, cwd: Optional[str] = None) -> ImportTiming:
+    """
+    Time `import module` in `repeat` fresh interpreters.
+    The module "cli --help" times the CLI parsing --help instead.
+    """
+    cwd = cwd or os.path.dirname(os.path.abspath(__file__))
+    if module == "cli --help":
+        code = _CLI_PROBE.format(heavy=HEAVY_PACKAGES)
+    else:
+        code = _PROBE.format(module=module, heavy=HEAVY_PACKAGES)
+
+    timing = ImportTiming(module)
+    for _ in range(repeat):
+        try:
+            result = _run_probe(code, cwd)
+        except RuntimeError as e:
+            timing.error = str(e)
+            break
+        timing.seconds.append(result["seconds"])
+        timing.heavy = result["heavy"]
+    return timing
+
+
+def run_benchmark(modules: Sequence[str] = DEFAULT_MODULES, repeat: int = 3) -> List[ImportTiming]:
+    return [measure_import(module, repeat) for module in [*modules, "cli --help"]]
+
+
+def report(timings: List[ImportTiming]) -> str:
+    lines = [f"{'module':<26}{'median (ms)':>12}  heavy packages loaded"]
+    for timing in timings:
+        if timing.error:
+            lines.append(f"{timing.module:<26}{'error':>12}  {timing.error}")
+            continue
+        lines.append(f"{timing.module:<26}{round(timing.median_ms, 1):>12}  {', '.join(timing.heavy) or '-'}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Measure the import time of the project modules")
+    parser.add_argument("modules", nargs="*", help="modules to import, the scripts and the CLI by default")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per module")
+    parser.add_argument("--json", action="store_true", help="print the timings as JSON")
+    args = parser.parse_args(argv)
+
+    timings = run_benchmark(args.modules or DEFAULT_MODULES, args.repeat)
+    if args.json:
+        print(json.dumps([
+            {"module": t.module, "median_ms": round(t.median_ms, 2), "heavy": t.heavy, "error": t.error}
+            for t in timings
+        ], indent=2))
+    else:
+        print(report(timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+In this module, we will be logging the ingestion hot path without paying for it.
+
+Every event is a name plus fields (structured), logged at a level (leveled) and,
+for the per-chunk and per-request debug events, only for a fraction of the
+calls (sampled). The checks happen before anything is formatted: when the level
+is disabled or the event is not sampled, the call returns after one comparison,
+and the fields are never converted to text. Payloads are never dumped as they
+are: describe_payload() reduces a chunking payload to counts, and vectors are
+always rendered as their length, never as floats.
+
+    log = get_logger(INGESTION_LOGGER)
+    log.debug("chunks.received", sample=True, **describe_payload(chunks))
+    log.info("upload.done", blob=blob, documents=len(documents))
+
+configure_logging() sets the level, the sample rate and the output format
+(key=value or JSON lines) from the logging settings (config.py).
+"""
+
+import json
+import logging
+import random
+import threading
+from typing import Any, Dict, Optional
+
+INGESTION_LOGGER = "ingestion"
+DEFAULT_SAMPLE_RATE = 0.01
+# lists of numbers longer than this are rendered as "<vector N>"
+MAX_LIST_ITEMS = 16
+MAX_STRING_LENGTH = 200
+
+
+def _render(value: Any) -> Any:
+    """Keep logged values small: vectors become their length, long strings are cut"""
+    if isinstance(value, (list, tuple)):
+        if len(value) > MAX_LIST_ITEMS and all(isinstance(v, (int, float)) for v in value[:MAX_LIST_ITEMS]):
+            return f"<vector {len(value)}>"
+        return [_render(v) for v in value[:MAX_LIST_ITEMS]] + ([f"<{len(value) - MAX_LIST_ITEMS} more>"] if len(value) > MAX_LIST_ITEMS else [])
+    if isinstance(value, dict):
+        return {k: _render(v) for k, v in value.items()}
+    if isinstance(value, str) and len(value) > MAX_STRING_LENGTH:
+        return f"{value[:MAX_STRING_LENGTH]}...<{len(value)} chars>"
+    if hasattr(value, "tolist") and hasattr(value, "shape"):  # numpy arrays
+        return f"<vector {len(value)}>"
+    return value
+
+
+########################################################
+# Formatters
+########################################################
+
+
+class KeyValueFormatter(logging.Formatter):
+    """time level logger event key=value ..."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s - %(levelname)s - %(name)s - %(message)s", "%Y-%m-%d %H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", None)
+        if fields:
+            rendered = " ".join(f"{key}={_render(value)}" for key, value in fields.items())
+            record = logging.makeLogRecord({**record.__dict__, "msg": f"{record.getMessage()} {rendered}", "args": None})
+        return super().format(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, event and the fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        for key, value in (getattr(record, "fields", None) or {}).items():
+            entry[key] = _render(value)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+########################################################
+# Logger
+########################################################
+
+
+class StructuredLogger:
+    """
+    Args:
+        logger: the underlying logging.Logger
+        sample_rate: fraction of the sampled events that are logged (0 to 1)
+    """
+
+    def __init__(self, logger: logging.Logger, sample_rate: float = DEFAULT_SAMPLE_RATE):
+        self.logger = logger
+        self.sample_rate = sample_rate
+        self.dropped = 0  # sampled events not logged, as a sanity check in reports
+        self._lock = threading.Lock()
+
+    def log(self, level: int, event: str, sample: bool = False, exc_info=None, **fields: Any):
+        """
+        Log event with fields. With sample=True only sample_rate of the calls are kept.
+        Nothing is formatted when the level is disabled or the call is not sampled.
+        """
+        if not self.logger.isEnabledFor(level):
+            return
+        if sample and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            with self._lock:
+                self.dropped += 1
+            return
+        if sample and self.sample_rate < 1.0:
+            fields["sample_rate"] = self.sample_rate
+        self.logger.log(level, event, exc_info=exc_info, extra={"fields": fields})
+
+    def enabled(self, level: int) -> bool:
+        """Guard for fields that are expensive to compute"""
+        return self.logger.isEnabledFor(level)
+
+    def debug(self, event: str, sample: bool = False, **fields: Any):
+        self.log(logging.DEBUG, event, sample, **fields)
+
+    def info(self, event: str, sample: bool = False, **fields: Any):
+        self.log(logging.INFO, event, sample, **fields)
+
+    def warning(self, event: str, sample: bool = False, **fields: Any):
+        self.log(logging.WARNING, event, sample, **fields)
+
+    def error(self, event: str, exc_info=None, **fields: Any):
+        self.log(logging.ERROR, event, exc_info=exc_info, **fields)
+
+
+_loggers: Dict[str, StructuredLogger] = {}
+_sample_rate = DEFAULT_SAMPLE_RATE
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """Shared StructuredLogger per name, using the sample rate set by configure_logging"""
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = _loggers.setdefault(name, StructuredLogger(logging.getLogger(name), _sample_rate))
+    return logger
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    sample_rate: Optional[float] = None,
+    json_lines: Optional[bool] = None,
+    azure_level: Optional[str] = None,
+    handler: Optional[logging.Handler] = None,
+):
+    """
+    Configure the structured loggers; arguments left out come from the logging settings.
+
+    Args:
+        level: level of the ingestion logger, e.g. "INFO" or "DEBUG"
+        sample_rate: fraction of the sampled debug events that are logged
+        json_lines: JSON lines instead of key=value text
+        azure_level: level of the azure SDK loggers, WARNING by default (DEBUG logs every HTTP request)
+        handler: where to write, stderr by default
+    """
+    global _sample_rate
+    from config import get_settings
+
+    settings = get_settings().logging
+    level = level or settings.level
+    _sample_rate = settings.sample_rate if sample_rate is None else sample_rate
+    json_lines = settings.json_lines if json_lines is None else json_lines
+
+    handler = handler or logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if json_lines else KeyValueFormatter())
+    logger = logging.getLogger(INGESTION_LOGGER)
+    logger.handlers = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+    logging.getLogger("azure").setLevel(azure_level or settings.azure_level)
+    for logger in _loggers.values():
+        logger.sample_rate = _sample_rate
+
+
+########################################################
+# Payload descriptions
+########################################################
+
+
+def describe_payload(payload: Any) -> Dict[str, Any]:
+    """
+    Counts describing a chunking payload ({"values": [{"data": {"chunks": [...]}}]})
+    without copying or serializing it: records, chunks, characters and vectors.
+    """
+    values = payload.get("values", []) if isinstance(payload, dict) else payload or []
+    chunks = characters = vectors = 0
+    for value in values:
+        for chunk in ((value or {}).get("data") or {}).get("chunks") or []:
+            chunks += 1
+            characters += len(chunk.get("content") or "")
+            vectors += chunk.get("contentVector") is not None
+    return {"records": len(values), "chunks": chunks, "characters": characters, "vectors": vectors}
@@ -0,0 +1,480 @@
+"""
+In this module, we will be measuring every call the project makes to Azure services.
+
+Blob, search, embedding, chat, Key Vault and function calls are wrapped in spans.
+A span records the latency of one call and its counters: bytes sent and received,
+input and output tokens, retries and throttled responses. When a span ends, its
+values are added to histograms per (service, operation), so the time and volume
+spent in each kind of call can be read without any dependency:
+
+    from Telemetry import CHAT, telemetry
+
+    with telemetry.span(CHAT, "chat.completions", model="gpt-4o") as span:
+        response = client.chat.completions.create(...)
+        span.add(input_tokens=response.usage.prompt_tokens, output_tokens=response.usage.completion_tokens)
+
+    print(telemetry.summary())
+
+Finished spans are kept in a bounded buffer and can be exported as OTLP/JSON
+(write_otlp), the OpenTelemetry wire format, or forwarded to an OpenTelemetry
+SDK with enable_opentelemetry() when the opentelemetry-api package is installed.
+"""
+
+import bisect
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# services
+BLOB = "blob"
+SEARCH = "search"
+EMBEDDING = "embedding"
+CHAT = "chat"
+KEY_VAULT = "keyvault"
+FUNCTION = "function"
+
+# metrics, named after the OpenTelemetry semantic conventions where one exists
+DURATION = "azure.client.duration"  # seconds
+BYTES_SENT = "azure.client.bytes_sent"
+BYTES_RECEIVED = "azure.client.bytes_received"
+INPUT_TOKENS = "gen_ai.client.input_tokens"
+OUTPUT_TOKENS = "gen_ai.client.output_tokens"
+RETRIES = "azure.client.retries"
+THROTTLES = "azure.client.throttles"
+
+COUNTERS = {
+    "bytes_sent": BYTES_SENT,
+    "bytes_received": BYTES_RECEIVED,
+    "input_tokens": INPUT_TOKENS,
+    "output_tokens": OUTPUT_TOKENS,
+    "retries": RETRIES,
+    "throttles": THROTTLES,
+}
+
+# log-spaced bucket boundaries, so percentiles estimated from a bucket are within ~20%
+LATENCY_BUCKETS = tuple(round(0.001 * 1.5 ** i, 6) for i in range(32))  # 1 ms to ~5.5 minutes
+SIZE_BUCKETS = tuple(2 ** i for i in range(6, 31))  # 64 bytes to 1 GB
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+_BUCKETS = {
+    DURATION: LATENCY_BUCKETS,
+    BYTES_SENT: SIZE_BUCKETS,
+    BYTES_RECEIVED: SIZE_BUCKETS,
+    INPUT_TOKENS: COUNT_BUCKETS,
+    OUTPUT_TOKENS: COUNT_BUCKETS,
+    RETRIES: COUNT_BUCKETS,
+    THROTTLES: COUNT_BUCKETS,
+}
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+########################################################
+# Histogram
+########################################################
+
+
+class Histogram:
+    """
+    Explicit-bucket histogram, the aggregation OpenTelemetry exports.
+    counts[i] holds the values <= boundaries[i]; the last count is the overflow.
+    """
+
+    def __init__(self, boundaries: Sequence[float]):
+        self.boundaries = tuple(boundaries)
+        self.counts = [0] * (len(self.boundaries) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def record(self, value: float):
+        self.counts[bisect.bisect_left(self.boundaries, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def percentile(self, percentile: float) -> float:
+        """Estimate, interpolated linearly inside the bucket holding the percentile"""
+        if not self.count:
+            return 0.0
+        rank = percentile / 100 * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                low = self.boundaries[i - 1] if i > 0 else self.min
+                high = self.boundaries[i] if i < len(self.boundaries) else self.max
+                low, high = max(low, self.min), min(high, self.max)
+                return low + (high - low) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "bucketCounts": list(self.counts),
+            "explicitBounds": list(self.boundaries),
+        }
+
+
+########################################################
+# Span
+########################################################
+
+
+@dataclass
+class Span:
+    service: str
+    operation: str
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    trace_id: str = ""
+    span_id: str = ""
+    parent_id: Optional[str] = None
+    start_time_ns: int = 0
+    end_time_ns: int = 0
+    duration: float = 0.0
+    error: Optional[str] = None
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    retries: int = 0
+    throttles: int = 0
+    _start: float = field(default=0.0, repr=False)
+
+    @property
+    def name(self) -> str:
+        return f"{self.service} {self.operation}"
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the span started, e.g. the time to the first streamed token"""
+        return time.perf_counter() - self._start
+
+    def add(self, **counters: int):
+        """Increase counters, e.g. span.add(bytes_received=len(body), output_tokens=12)"""
+        for counter, value in counters.items():
+            if counter not in COUNTERS:
+                raise ValueError(f"Unknown counter '{counter}', expected one of {list(COUNTERS)}")
+            if value:
+                setattr(self, counter, getattr(self, counter) + int(value))
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def retry(self, throttled: bool = False):
+        """Count a retried attempt; throttled when the service answered 429"""
+        self.retries += 1
+        self.throttles += int(throttled)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        attributes = {
+            "azure.service": self.service,
+            "azure.operation": self.operation,
+            **self.attributes,
+            **{metric: getattr(self, counter) for counter, metric in COUNTERS.items() if getattr(self, counter)},
+        }
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 3,  # SPAN_KIND_CLIENT
+            "startTimeUnixNano": str(self.start_time_ns),
+            "endTimeUnixNano": str(self.end_time_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in attributes.items() if value is not None],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+########################################################
+# Telemetry
+########################################################
+
+
+class Telemetry:
+    """
+    Args:
+        max_spans: finished spans kept for export, the oldest are dropped first
+        enabled: when False, span() yields a span that is never recorded
+    """
+
+    def __init__(self, max_spans: int = 10000, enabled: bool = True):
+        self.enabled = enabled
+        self.spans: deque = deque(maxlen=max_spans)
+        self._histograms: Dict[Tuple[str, str, str], Histogram] = {}
+        self._calls: Dict[Tuple[str, str], List[int]] = {}  # (service, operation) -> [calls, errors]
+        self._exporters: List[Callable[[Span], None]] = []
+        self._lock = threading.Lock()
+
+    def add_exporter(self, exporter: Callable[[Span], None]):
+        """Call exporter(span) for every finished span"""
+        self._exporters.append(exporter)
+
+    def start_span(self, service: str, operation: str, **attributes: Any) -> Span:
+        """Start a span, to be passed to end_span; span() is the usual entry point"""
+        parent = _current_span.get()
+        span = Span(
+            service,
+            operation,
+            attributes,
+            trace_id=parent.trace_id if parent else os.urandom(16).hex(),
+            span_id=os.urandom(8).hex(),
+            parent_id=parent.span_id if parent else None,
+            start_time_ns=time.time_ns(),
+            _start=time.perf_counter(),
+        )
+        return span
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None):
+        span.duration = time.perf_counter() - span._start
+        span.end_time_ns = span.start_time_ns + int(span.duration * 1e9)
+        if error is not None and span.error is None:
+            span.error = type(error).__name__
+        if self.enabled:
+            self._record(span)
+
+    @contextmanager
+    def span(self, service: str, operation: str, **attributes: Any) -> Iterator[Span]:
+        """
+        Measure the enclosed call. Spans opened inside it become its children.
+        An exception marks the span as failed and is re-raised.
+        """
+        span = self.start_span(service, operation, **attributes)
+        parent = _current_span.get()
+        _current_span.set(span)
+        try:
+            yield span
+        except GeneratorExit:
+            # a streaming consumer stopped early, not a failure of the call
+            self.end_span(span)
+            raise
+        except BaseException as e:
+            self.end_span(span, e)
+            raise
+        else:
+            self.end_span(span)
+        finally:
+            # restore by value: a span opened in a generator may close in another context
+            if _current_span.get() is span:
+                _current_span.set(parent)
+
+    def instrument(self, service: str, operation: str = None):
+        """Decorator measuring every call of the function"""
+
+        def decorator(func):
+            name = operation or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(service, name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def _record(self, span: Span):
+        key = (span.service, span.operation)
+        with self._lock:
+            calls = self._calls.setdefault(key, [0, 0])
+            calls[0] += 1
+            calls[1] += int(span.error is not None)
+            self._histogram(DURATION, key).record(span.duration)
+            for counter, metric in COUNTERS.items():
+                value = getattr(span, counter)
+                if value:
+                    self._histogram(metric, key).record(value)
+            self.spans.append(span)
+        for exporter in self._exporters:
+            try:
+                exporter(span)
+            except Exception as e:
+                logger.warning(f"Span exporter failed: {e}")
+
+    def _histogram(self, metric: str, key: Tuple[str, str]) -> Histogram:
+        histogram = self._histograms.get((metric, *key))
+        if histogram is None:
+            histogram = self._histograms[(metric, *key)] = Histogram(_BUCKETS[metric])
+        return histogram
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self._histograms.clear()
+            self._calls.clear()
+
+    ########################################################
+    # Reports
+    ########################################################
+
+    def histogram(self, metric: str, service: str, operation: str) -> Optional[Histogram]:
+        return self._histograms.get((metric, service, operation))
+
+    def totals(self) -> Dict[Tuple[str, str], Dict[str, float]]:
+        """Calls, errors, latency percentiles and counter sums per (service, operation)"""
+        totals = {}
+        with self._lock:
+            for key, (calls, errors) in sorted(self._calls.items()):
+                duration = self._histograms[(DURATION, *key)]
+                row = {
+                    "calls": calls,
+                    "errors": errors,
+                    "seconds": duration.sum,
+                    "p50": duration.percentile(50),
+                    "p95": duration.percentile(95),
+                    "p99": duration.percentile(99),
+                    "max": duration.max,
+                }
+                for counter, metric in COUNTERS.items():
+                    histogram = self._histograms.get((metric, *key))
+                    row[counter] = int(histogram.sum) if histogram else 0
+                totals[key] = row
+        return totals
+
+    def summary(self) -> str:
+        """Table of where the time went, slowest operations first"""
+        totals = self.totals()
+        wall = sum(row["seconds"] for row in totals.values()) or 1.0
+        lines = [
+            f"{'service':<10}{'operation':<28}{'calls':>7}{'errors':>7}{'total (s)':>10}{'share':>7}"
+            f"{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}{'MB out':>8}{'MB in':>8}"
+            f"{'tok in':>9}{'tok out':>9}{'retries':>8}{'429s':>6}"
+        ]
+        for (service, operation), row in sorted(totals.items(), key=lambda item: -item[1]["seconds"]):
+            share = f"{round(100 * row['seconds'] / wall)}%"
+            lines.append(
+                f"{service:<10}{operation[:27]:<28}{row['calls']:>7}{row['errors']:>7}{round(row['seconds'], 2):>10}"
+                f"{share:>7}"
+                f"{round(row['p50'] * 1000, 1):>10}{round(row['p95'] * 1000, 1):>10}{round(row['p99'] * 1000, 1):>10}"
+                f"{round(row['bytes_sent'] / 1024 ** 2, 2):>8}{round(row['bytes_received'] / 1024 ** 2, 2):>8}"
+                f"{row['input_tokens']:>9}{row['output_tokens']:>9}{row['retries']:>8}{row['throttles']:>6}"
+            )
+        return "\n".join(lines)
+
+    ########################################################
+    # OpenTelemetry export
+    ########################################################
+
+    def to_otlp(self, service_name: str = "azure-fundamentals") -> Dict[str, Any]:
+        """The buffered spans and the histograms as OTLP/JSON (traces and metrics payloads)"""
+        resource = {"attributes": [_otlp_attribute("service.name", service_name)]}
+        scope = {"name": __name__}
+        now = str(time.time_ns())
+        with self._lock:
+            spans = [span.to_otlp() for span in self.spans]
+            metrics: Dict[str, List[Dict[str, Any]]] = {}
+            for (metric, service, operation), histogram in self._histograms.items():
+                point = {
+                    "attributes": [_otlp_attribute("azure.service", service), _otlp_attribute("azure.operation", operation)],
+                    "timeUnixNano": now,
+                    **histogram.to_dict(),
+                    "count": str(histogram.count),
+                    "bucketCounts": [str(c) for c in histogram.counts],
+                }
+                metrics.setdefault(metric, []).append(point)
+        return {
+            "resourceSpans": [{"resource": resource, "scopeSpans": [{"scope": scope, "spans": spans}]}],
+            "resourceMetrics": [
+                {
+                    "resource": resource,
+                    "scopeMetrics": [
+                        {
+                            "scope": scope,
+                            "metrics": [
+                                {
+                                    "name": metric,
+                                    "unit": "s" if metric == DURATION else "By" if metric in (BYTES_SENT, BYTES_RECEIVED) else "1",
+                                    # 2 = AGGREGATION_TEMPORALITY_CUMULATIVE
+                                    "histogram": {"dataPoints": points, "aggregationTemporality": 2},
+                                }
+                                for metric, points in metrics.items()
+                            ],
+                        }
+                    ],
+                }
+            ],
+        }
+
+    def write_otlp(self, path: str, service_name: str = "azure-fundamentals"):
+        """Write the OTLP/JSON payload, e.g. for an OpenTelemetry Collector file receiver"""
+        with open(path, "w") as f:
+            json.dump(self.to_otlp(service_name), f)
+
+
+def enable_opentelemetry(target: Optional[Telemetry] = None, tracer_provider=None, meter_provider=None):
+    """
+    Forward every finished span, and its counters as histogram records, to the
+    OpenTelemetry SDK configured by the application (or the given providers).
+    Requires the opentelemetry-api package.
+    """
+    try:
+        from opentelemetry import metrics, trace
+        from opentelemetry.trace import SpanKind, Status, StatusCode
+    except ImportError as e:
+        raise ImportError("OpenTelemetry export requires the opentelemetry-api package: pip install opentelemetry-api") from e
+
+    target = target or telemetry
+    tracer = (tracer_provider or trace.get_tracer_provider()).get_tracer(__name__)
+    meter = (meter_provider or metrics.get_meter_provider()).get_meter(__name__)
+    instruments = {
+        metric: meter.create_histogram(metric, unit="s" if metric == DURATION else "1")
+        for metric in (DURATION, *COUNTERS.values())
+    }
+
+    def export(span: Span):
+        attributes = {"azure.service": span.service, "azure.operation": span.operation}
+        otel_span = tracer.start_span(
+            span.name,
+            kind=SpanKind.CLIENT,
+            start_time=span.start_time_ns,
+            attributes={**attributes, **{k: v for k, v in span.attributes.items() if v is not None}},
+        )
+        if span.error:
+            otel_span.set_status(Status(StatusCode.ERROR, span.error))
+        otel_span.end(end_time=span.end_time_ns)
+
+        instruments[DURATION].record(span.duration, attributes)
+        for counter, metric in COUNTERS.items():
+            value = getattr(span, counter)
+            if value:
+                instruments[metric].record(value, attributes)
+
+    target.add_exporter(export)
+    return target
+
+
+# shared by every module of the project
+telemetry = Telemetry()
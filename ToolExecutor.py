@@ -0,0 +1,313 @@
+"""
+In this module, we will be executing the function tools requested by a chat model.
+
+Arguments coming back from the model are parsed, validated against the JSON schema
+declared in the tool definition and normalized into a canonical key, so repeated
+calls with the same arguments are answered from a per-tool TTL cache instead of
+running the tool again. The cache can optionally be persisted to a local SQLite
+file so deterministic tools stay warm across sessions.
+"""
+
+import ast
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ToolArgumentError(ValueError):
+    """Raised when tool call arguments cannot be parsed or do not match the tool schema"""
+
+
+_JSON_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": (int, float),  # isinstance accepts nested tuples
+    "boolean": bool,
+    "object": dict,
+    "array": list,
+    "null": type(None),
+}
+
+
+########################################################
+# Argument parsing, validation and normalization
+########################################################
+
+
+def parse_arguments(raw_arguments) -> Dict[str, Any]:
+    """
+    Parse the arguments string returned by the model into a dict.
+
+    Models occasionally return Python-style dicts with single quotes. Instead of
+    blindly replacing quotes (which breaks values such as "O'Hare"), fall back to
+    a safe literal evaluation when the payload is not valid JSON.
+
+    Args:
+        raw_arguments: str or dict, the arguments of the tool call
+    """
+    if raw_arguments is None or raw_arguments == "":
+        return {}
+    if isinstance(raw_arguments, dict):
+        return raw_arguments
+
+    try:
+        arguments = json.loads(raw_arguments)
+    except json.JSONDecodeError:
+        try:
+            arguments = ast.literal_eval(raw_arguments)
+        except (ValueError, SyntaxError) as e:
+            raise ToolArgumentError(f"Could not parse tool arguments: {raw_arguments!r}") from e
+
+    if not isinstance(arguments, dict):
+        raise ToolArgumentError(f"Tool arguments must be an object, got {type(arguments).__name__}")
+    return arguments
+
+
+def validate_arguments(arguments: Dict[str, Any], schema: Dict[str, Any], path: str = "arguments") -> Dict[str, Any]:
+    """
+    Validate arguments against a JSON schema and return a normalized copy.
+
+    Only the subset of JSON schema used by function tool definitions is supported:
+    type, properties, required, enum, default, items and additionalProperties.
+    Normalization strips surrounding whitespace from strings, fills declared
+    defaults and converts integral floats to ints so 1.0 and 1 share a cache key.
+
+    Args:
+        arguments: the parsed arguments
+        schema: the "parameters" schema of the tool definition
+        path: location of the value, used in error messages
+    """
+    return _validate_value(arguments, schema or {"type": "object"}, path)
+
+
+def _validate_value(value, schema: Dict[str, Any], path: str):
+    expected = schema.get("type")
+
+    if isinstance(value, str):
+        value = value.strip()
+
+    if expected in ("integer", "number") and isinstance(value, float) and value.is_integer():
+        value = int(value)
+
+    if expected is not None:
+        types = expected if isinstance(expected, list) else [expected]
+        python_types = tuple(_JSON_TYPES[name] for name in types)
+        # bool is a subclass of int, reject it for numeric types
+        if not isinstance(value, python_types) or (isinstance(value, bool) and "boolean" not in types):
+            raise ToolArgumentError(f"{path} must be of type {expected}, got {type(value).__name__}")
+
+    if "enum" in schema and value not in schema["enum"]:
+        raise ToolArgumentError(f"{path} must be one of {schema['enum']}, got {value!r}")
+
+    if isinstance(value, dict):
+        properties = schema.get("properties", {})
+        missing = [name for name in schema.get("required", []) if name not in value]
+        if missing:
+            raise ToolArgumentError(f"{path} is missing required properties: {', '.join(missing)}")
+
+        if schema.get("additionalProperties") is False:
+            unknown = sorted(set(value) - set(properties))
+            if unknown:
+                raise ToolArgumentError(f"{path} has unexpected properties: {', '.join(unknown)}")
+
+        normalized = {}
+        for name, prop_schema in properties.items():
+            if name in value:
+                normalized[name] = _validate_value(value[name], prop_schema, f"{path}.{name}")
+            elif "default" in prop_schema:
+                normalized[name] = prop_schema["default"]
+        for name in value:
+            if name not in properties:
+                normalized[name] = value[name]
+        return normalized
+
+    if isinstance(value, list) and "items" in schema:
+        return [_validate_value(item, schema["items"], f"{path}[{i}]") for i, item in enumerate(value)]
+
+    return value
+
+
+def canonical_key(tool_name: str, arguments: Dict[str, Any]) -> str:
+    """
+    Build a canonical cache key for a tool call: key order and whitespace do not matter
+    """
+    return f"{tool_name}:{json.dumps(arguments, sort_keys=True, separators=(',', ':'), ensure_ascii=False)}"
+
+
+########################################################
+# Result cache
+########################################################
+
+
+class ToolResultCache:
+    """
+    In-memory TTL cache of tool results, optionally backed by a SQLite file.
+
+    Args:
+        path: optional path of the SQLite file used to persist results across sessions
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self._memory: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS tool_results (key TEXT PRIMARY KEY, expires_at REAL, value TEXT)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at >= now:
+                    return True, value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT expires_at, value FROM tool_results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    expires_at, value = row[0], json.loads(row[1])
+                    if expires_at >= now:
+                        self._memory[key] = (expires_at, value)
+                        return True, value
+                    self._db.execute("DELETE FROM tool_results WHERE key = ?", (key,))
+                    self._db.commit()
+        return False, None
+
+    def set(self, key: str, value: Any, ttl: float):
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            if self._db is not None:
+                try:
+                    serialized = json.dumps(value)
+                except TypeError:
+                    logger.warning(f"Result for '{key}' is not JSON serializable; keeping it in memory only")
+                    return
+                self._db.execute(
+                    "INSERT OR REPLACE INTO tool_results (key, expires_at, value) VALUES (?, ?, ?)",
+                    (key, expires_at, serialized),
+                )
+                self._db.commit()
+
+    def clear(self, prefix: str = ""):
+        """Remove cached results, optionally only those whose key starts with prefix"""
+        with self._lock:
+            for key in [k for k in self._memory if k.startswith(prefix)]:
+                del self._memory[key]
+            if self._db is not None:
+                self._db.execute("DELETE FROM tool_results WHERE key LIKE ?", (prefix + "%",))
+                self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+########################################################
+# Tool registry and execution
+########################################################
+
+
+@dataclass
+class RegisteredTool:
+    name: str
+    func: Callable[..., Any]
+    parameters: Dict[str, Any]
+    ttl: Optional[float] = None  # None disables caching for the tool
+    hits: int = field(default=0)
+    misses: int = field(default=0)
+
+
+class ToolExecutor:
+    """
+    Dispatches tool calls to registered functions with validated, cached execution.
+
+    Args:
+        cache: the ToolResultCache to use, a new in-memory cache by default
+        default_ttl: TTL in seconds for tools registered without an explicit one
+    """
+
+    def __init__(self, cache: Optional[ToolResultCache] = None, default_ttl: Optional[float] = 300.0):
+        self.cache = cache or ToolResultCache()
+        self.default_ttl = default_ttl
+        self._tools: Dict[str, RegisteredTool] = {}
+
+    def register(self, func: Callable[..., Any], parameters: Dict[str, Any], name: Optional[str] = None, ttl: Optional[float] = ...):
+        """
+        Register a tool function with its JSON schema.
+
+        Args:
+            func: the callable implementing the tool
+            parameters: the "parameters" JSON schema declared to the model
+            name: the tool name, defaults to the function name
+            ttl: cache TTL in seconds, None to disable caching, defaults to default_ttl
+        """
+        tool_name = name or func.__name__
+        self._tools[tool_name] = RegisteredTool(
+            name=tool_name,
+            func=func,
+            parameters=parameters,
+            ttl=self.default_ttl if ttl is ... else ttl,
+        )
+        logger.info(f"Registered tool '{tool_name}'")
+        return func
+
+    def register_definition(self, func: Callable[..., Any], definition, ttl: Optional[float] = ...):
+        """
+        Register a tool from a ChatCompletionsToolDefinition (or an equivalent dict)
+        """
+        function = definition["function"] if isinstance(definition, dict) else definition.function
+        name = function["name"] if isinstance(function, dict) else function.name
+        parameters = function["parameters"] if isinstance(function, dict) else function.parameters
+        return self.register(func, parameters, name=name, ttl=ttl)
+
+    def execute(self, tool_name: str, raw_arguments) -> Any:
+        """
+        Execute a tool call, answering from cache when the normalized arguments were seen before
+        """
+        tool = self._tools.get(tool_name)
+        if tool is None:
+            raise ToolArgumentError(f"Unknown tool '{tool_name}'")
+
+        arguments = validate_arguments(parse_arguments(raw_arguments), tool.parameters)
+
+        if tool.ttl is None:
+            return tool.func(**arguments)
+
+        key = canonical_key(tool_name, arguments)
+        found, value = self.cache.get(key)
+        if found:
+            tool.hits += 1
+            logger.info(f"Cache hit for tool '{tool_name}' with arguments {arguments}")
+            return value
+
+        tool.misses += 1
+        start_time = time.time()
+        value = tool.func(**arguments)
+        logger.info(f"Tool '{tool_name}' executed in {round(time.time() - start_time, 3)} seconds")
+        self.cache.set(key, value, tool.ttl)
+        return value
+
+    def execute_tool_call(self, tool_call) -> Any:
+        """
+        Execute a tool call object as returned by the Azure AI Inference or OpenAI SDKs
+        """
+        return self.execute(tool_call.function.name, tool_call.function.arguments)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: {"hits": tool.hits, "misses": tool.misses} for name, tool in self._tools.items()}
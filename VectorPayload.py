@@ -0,0 +1,128 @@
+"""
+In this module, we will be keeping embedding vectors compact in memory and on the wire.
+
+A vector parsed from JSON is a list of Python floats: 1536 boxed 64-bit floats,
+about 49 KB per chunk, and json.dumps writes each one back with up to 17
+significant digits, about 20 KB of text. The index stores vectors as Edm.Single
+(float32), so neither the memory nor the digits buy anything.
+
+Here vectors are NumPy float32 arrays (6 KB for 1536 dimensions) from the
+moment the chunking response is parsed until the upload body is written, and
+they are written with the fewest digits that still read back as the same float32:
+
+    chunks = loads(response.content)          # contentVector -> float32 arrays
+    body = dumps({"value": documents})        # bytes, vectors at float32 precision
+
+orjson, when installed, parses and writes everything (it writes float32 arrays
+natively, in their shortest form). Without it, the standard json module is used
+and each vector is formatted in one call with 9 significant digits, the
+precision that round-trips any float32.
+"""
+
+import json
+from array import array
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional, the standard json module is used instead
+    orjson = None
+
+VECTOR_DTYPE = np.float32
+# significant digits that round-trip every float32 (FLT_DECIMAL_DIG)
+FLOAT32_DIGITS = 9
+# chunk fields of the chunking function holding vectors
+VECTOR_FIELDS = ("contentVector",)
+
+
+def to_vector(values: Any) -> Optional[np.ndarray]:
+    """A float32 array of values (list, array('f'), ndarray), None when there is no vector"""
+    if values is None:
+        return None
+    if isinstance(values, np.ndarray) and values.dtype == VECTOR_DTYPE:
+        return values
+    if isinstance(values, array):
+        return np.frombuffer(values, dtype=VECTOR_DTYPE) if values.typecode == "f" else np.asarray(values, dtype=VECTOR_DTYPE)
+    if len(values) == 0:
+        return None
+    return np.asarray(values, dtype=VECTOR_DTYPE)
+
+
+def format_vector(vector: np.ndarray, digits: int = FLOAT32_DIGITS) -> str:
+    """The vector as a JSON array, every component with at most digits significant digits"""
+    if len(vector) == 0:
+        return "[]"
+    # one formatting call for the whole vector instead of one per component
+    return "[" + ((f"%.{digits}g," * len(vector)) % tuple(vector.tolist()))[:-1] + "]"
+
+
+########################################################
+# Parsing
+########################################################
+
+
+def compact_chunks(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace, in place, the vectors of a chunking payload with float32 arrays"""
+    for value in payload.get("values") or []:
+        for chunk in ((value or {}).get("data") or {}).get("chunks") or []:
+            for name in VECTOR_FIELDS:
+                if name in chunk:
+                    chunk[name] = to_vector(chunk[name])
+    return payload
+
+
+def loads(data: bytes) -> Dict[str, Any]:
+    """Parse a chunking function response, with its vectors as float32 arrays"""
+    payload = orjson.loads(data) if orjson is not None else json.loads(data)
+    return compact_chunks(payload) if isinstance(payload, dict) else payload
+
+
+########################################################
+# Serialization
+########################################################
+
+
+def _replace_vectors(value: Any, vectors: List[np.ndarray]) -> Any:
+    # vectors become numbered placeholders, formatted and spliced in after json.dumps
+    if isinstance(value, dict):
+        return {key: _replace_vectors(item, vectors) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_replace_vectors(item, vectors) for item in value]
+    if isinstance(value, (np.ndarray, array)):
+        vectors.append(to_vector(value))
+        return f"\x00vector:{len(vectors) - 1}\x00"
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def dumps(value: Any, digits: int = FLOAT32_DIGITS) -> bytes:
+    """
+    JSON bytes of value, with float32 arrays (and array('f')) written compactly.
+    digits only applies without orjson, which always writes the shortest form.
+    """
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY, default=_orjson_default)
+
+    vectors: List[np.ndarray] = []
+    text = json.dumps(_replace_vectors(value, vectors), ensure_ascii=False, separators=(",", ":"))
+    if not vectors:
+        return text.encode()
+    parts = text.split('"\\u0000vector:')
+    out = [parts[0]]
+    for part in parts[1:]:
+        number, _, rest = part.partition('\\u0000"')
+        out.append(format_vector(vectors[int(number)], digits))
+        out.append(rest)
+    return "".join(out).encode()
+
+
+def _orjson_default(value: Any) -> Any:
+    if isinstance(value, array):
+        return to_vector(value)
+    if isinstance(value, np.ndarray):
+        # orjson only writes contiguous arrays of its supported types itself
+        return np.ascontiguousarray(value, dtype=VECTOR_DTYPE)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
@@ -0,0 +1,342 @@
+"""
+In this module, we will be running the scripts of the project from one command line.
+
+Every subcommand imports what it needs when it runs, so `python cli.py --help`
+or a search query never pays for langchain, langgraph or the Azure SDKs used by
+other subcommands. Settings come from config.get_settings().
+
+    python cli.py create-index
+    python cli.py ingest --suffix .txt
+    python cli.py ingest --workers 4
+    python cli.py ingest --shard-index 0 --shard-count 8 --stats-dir stats && python cli.py ingest-stats stats
+    python cli.py dead-letters
+    python cli.py retry --max-attempts 3
+    python cli.py provision --index financial-index --datasource financial-datasource --container namstorage \\
+        --function-endpoint https://document-chunking-az-func.azurewebsites.net
+    python cli.py search "revenue growth" --mode hybrid --top 5
+    python cli.py ask "What was the revenue growth last year?"
+    python cli.py chat --model deepseek "What are 3 things to visit in Seattle?"
+    python cli.py convert page.html other.html --output-dir pdfs
+    python cli.py startup
+    python cli.py benchmark --scenarios ingest_blob --latency 0.02 --compare
+"""
+
+import argparse
+import logging
+import sys
+from typing import Optional, Sequence
+
+CHAT_MODELS = ("o1", "r1", "deepseek", "github", "langgraph")
+
+
+########################################################
+# Subcommands
+########################################################
+
+
+def create_index(args):
+    from CreateAISearchIndex import create_index
+
+    create_index()
+
+
+def ingest(args):
+    if args.shard_index is not None or args.shard_count is not None:
+        # one shard of a sharded ingestion, the other shards run on other machines
+        from ShardedIngestion import Shard, ingest_shard, write_stats
+        from config import get_settings
+
+        if args.shard_index is None or args.shard_count is None:
+            sys.exit("--shard-index and --shard-count go together")
+        shard = Shard(args.shard_index, args.shard_count, args.shard_by or get_settings().ingestion.shard_by)
+        summary = ingest_shard(args.suffix, shard, state_path=args.state, restart=args.restart)
+        if args.stats_dir:
+            print(f"Stats of shard {shard.label} written to {write_stats(args.stats_dir, shard, summary)}")
+        return 1 if summary["failed"] else 0
+
+    from config import get_settings
+
+    workers = args.workers or get_settings().ingestion.workers
+    if workers > 1:
+        from ShardedIngestion import ingest_sharded
+
+        summary = ingest_sharded(args.suffix, workers, args.shard_by, state_path=args.state, restart=args.restart)
+        _print_stats(summary)
+        return 1 if summary["failed"] else 0
+
+    from AddData2AISearch import ingest_container
+
+    summary = ingest_container(args.suffix, state_path=args.state, restart=args.restart)
+    return 1 if summary["failed"] else 0
+
+
+def _print_stats(summary):
+    print(f"{'shard':<16}{'done':>8}{'failed':>8}{'documents':>11}{'seconds':>10}")
+    for stats in summary.get("per_shard", []):
+        print(f"{stats['shard']:<16}{stats['done']:>8}{stats['failed']:>8}{stats['documents']:>11}{stats['seconds']:>10}")
+    print(f"{'total':<16}{summary['done']:>8}{summary['failed']:>8}{summary['documents']:>11}{summary['seconds']:>10}"
+          f"  ({summary['blobs_per_second']} blobs/s)")
+    if summary.get("missing_shards"):
+        print(f"No stats for shard(s) {', '.join(map(str, summary['missing_shards']))}")
+
+
+def ingest_stats(args):
+    from ShardedIngestion import load_stats, merge_stats
+
+    stats = load_stats(args.directory)
+    if not stats:
+        sys.exit(f"No shard stats in {args.directory}")
+    summary = {**merge_stats(stats), "per_shard": stats}
+    _print_stats(summary)
+    return 1 if summary["failed"] or summary.get("missing_shards") else 0
+
+
+def dead_letters(args):
+    import json
+    from datetime import datetime
+
+    from IngestionState import IngestionState
+    from config import get_settings
+
+    with IngestionState(args.state) as state:
+        letters = state.dead_letters(None if args.all_containers else get_settings().storage.container_name,
+                                     include_resolved=args.resolved)
+    if args.json:
+        print(json.dumps([letter.__dict__ for letter in letters], indent=2))
+        return
+    for letter in letters:
+        failed_at = datetime.fromtimestamp(letter.failed_at).strftime("%Y-%m-%d %H:%M:%S")
+        status = "resolved" if letter.resolved_at else f"{letter.attempts} attempt(s)"
+        print(f"{failed_at}  {letter.container}/{letter.blob}  [{letter.stage}, {status}]  {letter.error_type}: {letter.error}")
+    print(f"{len(letters)} dead letter(s)")
+
+
+def retry(args):
+    from AddData2AISearch import retry_failed
+
+    summary = retry_failed(state_path=args.state, max_attempts=args.max_attempts)
+    return 1 if summary["failed"] else 0
+
+
+def provision(args):
+    from AI_Search.Provisioner import provision_search_environment
+
+    report = provision_search_environment(
+        search_index_name=args.index,
+        datasource_name=args.datasource,
+        container_name=args.container,
+        function_endpoint=args.function_endpoint,
+        subfolder=args.subfolder,
+        skill_batch_size=args.batch_size,
+        skill_degree_of_parallelism=args.degree_of_parallelism,
+        skill_timeout_seconds=args.timeout,
+        refresh_secrets=args.refresh_secrets,
+    )
+    return 0 if report.succeeded else 1
+
+
+def search(args):
+    from AI_Search.Retrieval import Retriever
+    from AI_Search.RestClient import get_client
+    from config import get_settings
+
+    retriever = Retriever(get_client(), args.index or get_settings().search.index_name)
+    for result in retriever.search(args.query, mode=args.mode, top=args.top, filter=args.filter):
+        score = result.reranker_score if result.reranker_score is not None else result.score
+        print(f"{round(score, 3):>8}  {result.fields.get('url') or result.id}  {result.content[:80]!r}")
+
+
+def ask(args):
+    from AI_Search.Retrieval import Retriever
+    from AI_Search.RestClient import get_client
+    from AzureOpenAI import LLMManager
+    from RAGPipeline import RAGPipeline, RAGTrace
+    from config import get_settings
+
+    settings = get_settings()
+    embeddings = LLMManager(deployment_name=settings.openai.embedding_model)
+    retriever = Retriever(get_client(), args.index or settings.search.index_name, embed=embeddings.get_embedding)
+    with RAGPipeline(retriever, LLMManager(deployment_name=args.deployment), top=args.top) as pipeline:
+        trace = RAGTrace()
+        for token in pipeline.stream(args.question, filter=args.filter, trace=trace):
+            print(token, end="", flush=True)
+        print()
+        for i, source in enumerate(trace.sources, start=1):
+            print(f"[{i}] {source.fields.get('url') or source.id}")
+
+
+def chat(args):
+    if args.model == "o1":
+        from Keyless_Auth import ask_o1
+
+        print(ask_o1(args.question))
+    elif args.model == "r1":
+        from Keyless_Auth import ask_r1
+
+        print(ask_r1(args.question))
+    elif args.model == "deepseek":
+        from RunDeepSeekR1 import stream_deepseek
+
+        print(stream_deepseek(args.question).report())
+    elif args.model == "github":
+        from github_model_inference import ask_github_model
+
+        print(ask_github_model(args.question))
+    else:
+        from github_model_inference import stream_langgraph
+
+        print(stream_langgraph(args.question).report())
+
+
+def convert(args):
+    import os
+
+    from FunctionClient import FunctionClient
+    from config import get_settings
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    documents = []
+    for path in args.files:
+        with open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+        name = os.path.splitext(os.path.basename(path))[0]
+        documents.append((html, os.path.join(args.output_dir, f"{name}.pdf")))
+
+    client = FunctionClient(
+        args.function_url or get_settings().functions.html_to_pdf_url,
+        key_secret_name=args.key_secret_name,
+        max_concurrency=args.max_concurrency,
+    )
+    with client:
+        report = client.convert_many(documents)
+    print(report.summary())
+    return 1 if report.failed else 0
+
+
+def startup(args):
+    from StartupBenchmark import main
+
+    main(["--repeat", str(args.repeat), *args.modules])
+
+
+def benchmark(args):
+    from Benchmark import main
+
+    return main(args.options)
+
+
+########################################################
+# Parser
+########################################################
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Azure AI Search, ingestion and model scripts")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log at DEBUG level")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("create-index", help="create or update the chunk index (CreateAISearchIndex.py)")
+    command.set_defaults(run=create_index)
+
+    command = commands.add_parser("ingest", help="chunk the blobs of the container and upload them (AddData2AISearch.py)")
+    command.add_argument("--suffix", default=".txt", help="only blobs ending with this suffix")
+    command.add_argument("--state", help="checkpoint file, the configured INGESTION_STATE_PATH by default")
+    command.add_argument("--restart", action="store_true", help="start a new run instead of resuming the unfinished one")
+    command.add_argument("--workers", type=int, help="processes, one shard each, the configured INGESTION_WORKERS by default")
+    command.add_argument("--shard-by", choices=("hash", "prefix"), help="assign blobs to shards by name or by first folder")
+    command.add_argument("--shard-index", type=int, help="ingest only this shard (0 based), e.g. the shard of this machine")
+    command.add_argument("--shard-count", type=int, help="number of shards, with --shard-index")
+    command.add_argument("--stats-dir", help="with --shard-index, write the stats of the shard here for ingest-stats")
+    command.set_defaults(run=ingest)
+
+    command = commands.add_parser("ingest-stats", help="merge the stats written by the shards of an ingestion")
+    command.add_argument("directory", help="the --stats-dir of the shards")
+    command.set_defaults(run=ingest_stats)
+
+    command = commands.add_parser("dead-letters", help="list the blobs that failed to ingest (IngestionState.py)")
+    command.add_argument("--state", help="checkpoint file, the configured INGESTION_STATE_PATH by default")
+    command.add_argument("--resolved", action="store_true", help="include the dead letters fixed by a retry")
+    command.add_argument("--all-containers", action="store_true")
+    command.add_argument("--json", action="store_true")
+    command.set_defaults(run=dead_letters)
+
+    command = commands.add_parser("retry", help="ingest the dead-lettered blobs again")
+    command.add_argument("--state", help="checkpoint file, the configured INGESTION_STATE_PATH by default")
+    command.add_argument("--max-attempts", type=int, help="leave blobs that already failed this many times")
+    command.set_defaults(run=retry)
+
+    command = commands.add_parser("provision", help="provision index, datasource, skillset and indexer")
+    command.add_argument("--index", required=True)
+    command.add_argument("--datasource", required=True)
+    command.add_argument("--container", required=True)
+    command.add_argument("--function-endpoint", required=True, help="document chunking function")
+    command.add_argument("--subfolder")
+    command.add_argument("--batch-size", type=int, default=1, help="documents per call to the chunking function")
+    command.add_argument("--degree-of-parallelism", type=int,
+                         help="concurrent calls to the chunking function, the service default (5) when left out")
+    command.add_argument("--timeout", type=int, default=230, help="seconds per call to the chunking function, at most 230")
+    command.add_argument("--refresh-secrets", action="store_true",
+                         help="push keys and connection strings even when nothing else changed, e.g. after rotating them")
+    command.set_defaults(run=provision)
+
+    command = commands.add_parser("search", help="query the index")
+    command.add_argument("query")
+    command.add_argument("--mode", choices=("keyword", "vector", "hybrid"), default="hybrid")
+    command.add_argument("--top", type=int, default=5)
+    command.add_argument("--filter", help="OData filter")
+    command.add_argument("--index", help="index name, the configured one by default")
+    command.set_defaults(run=search)
+
+    command = commands.add_parser("ask", help="answer a question over the index (RAGPipeline.py)")
+    command.add_argument("question")
+    command.add_argument("--deployment", default="Agent", help="chat deployment")
+    command.add_argument("--top", type=int, default=5, help="sources in the context")
+    command.add_argument("--filter", help="OData filter")
+    command.add_argument("--index", help="index name, the configured one by default")
+    command.set_defaults(run=ask)
+
+    command = commands.add_parser("chat", help="ask a chat model (Keyless_Auth.py, RunDeepSeekR1.py, github_model_inference.py)")
+    command.add_argument("question")
+    command.add_argument("--model", choices=CHAT_MODELS, default="deepseek")
+    command.set_defaults(run=chat)
+
+    command = commands.add_parser("convert", help="convert HTML files to PDF with the conversion function")
+    command.add_argument("files", nargs="+")
+    command.add_argument("--output-dir", default=".")
+    command.add_argument("--function-url", help="the configured AZURE_FUNCTION_URL by default")
+    command.add_argument("--key-secret-name", default="AZURE-FUNCTION-HTML-TO-PDF")
+    command.add_argument("--max-concurrency", type=int, default=8)
+    command.set_defaults(run=convert)
+
+    command = commands.add_parser("startup", help="measure the import time of the modules (StartupBenchmark.py)")
+    command.add_argument("modules", nargs="*", help="modules to import, the scripts and the CLI by default")
+    command.add_argument("--repeat", type=int, default=3)
+    command.set_defaults(run=startup)
+
+    command = commands.add_parser(
+        "benchmark",
+        help="benchmark ingestion and inference against local fakes (Benchmark.py)",
+        add_help=False,
+    )
+    # every other option is passed on to Benchmark.py, see `python cli.py benchmark --help`
+    command.set_defaults(run=benchmark, pass_through=True)
+
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = build_parser()
+    args, options = parser.parse_known_args(argv)
+    if options and not getattr(args, "pass_through", False):
+        parser.error(f"unrecognized arguments: {' '.join(options)}")
+    args.options = options
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    return args.run(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
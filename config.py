@@ -1 +1,303 @@
+"""
+In this module, we will be loading the configuration of the project once, from
+every source, into typed and immutable settings.
+
+Sources, from lowest to highest precedence:
+    1. defaults declared below
+    2. config.json (or the file named by CONFIG_PATH)
+    3. .env and the process environment (the environment wins over .env)
+    4. Key Vault, for secrets still missing after 2 and 3, when AZURE_VAULT_URL is set
+
+Nothing is read at import. get_settings() parses everything on first use and
+returns the same frozen Settings afterwards. The process environment is never
+modified (.env is read with dotenv_values, not load_dotenv).
+
+    from config import get_settings
+
+    search = get_settings().search
+    client = get_client(search.service_name, search.admin_key, search.api_version)
+"""
+
+import functools
+import json
+import logging
+import os
+import typing
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
 CONTAINER_NAME = "namstorage"
+
+
+def _setting(env: str = None, json_key: str = None, default: Any = None, secret: bool = False):
+    """
+    Declare a setting read from the env variable env and the config.json key json_key.
+    Secrets can also be resolved from Key Vault, under the env name with dashes.
+    """
+    return field(default=default, metadata={"env": env, "json": json_key, "secret": secret})
+
+
+########################################################
+# Settings
+########################################################
+
+
+@dataclass(frozen=True)
+class SearchSettings:
+    service_name: Optional[str] = _setting("AZURE_SEARCH_SERVICE_NAME", "search_service_name")
+    admin_key: Optional[str] = _setting("AZURE_SEARCH_ADMIN_KEY", "search_admin_key", secret=True)
+    api_version: str = _setting("AZURE_SEARCH_API_VERSION", "search_api_version", "2024-11-01-preview")
+    service_url: Optional[str] = _setting("AZURE_SEARCH_SERVICE_URL", "search_service_url")
+    index_name: str = _setting("AZURE_SEARCH_INDEX_NAME", "search_index_name", "financial-index")
+    vector_profile: str = _setting("AZURE_SEARCH_VECTOR_PROFILE", "search_vector_profile", "default")
+    # connection string the search datasources read blobs with
+    storage_connection_string: Optional[str] = _setting("STORAGE_CONNECTION_STRING", "storage_connection_string", secret=True)
+    cognitive_services_key: Optional[str] = _setting("COGNITIVE_SERVICES_KEY", "cognitive_services_key", secret=True)
+
+    @property
+    def endpoint(self) -> Optional[str]:
+        if self.service_url:
+            return self.service_url
+        return f"https://{self.service_name}.search.windows.net" if self.service_name else None
+
+
+@dataclass(frozen=True)
+class OpenAISettings:
+    api_base: Optional[str] = _setting("AZURE_OPENAI_API_BASE", "openai_api_base")
+    api_version: Optional[str] = _setting("AZURE_OPENAI_API_VERSION", "openai_api_version")
+    api_key: Optional[str] = _setting("AZURE_OPENAI_API_KEY", "openai_api_key", secret=True)
+    gpt_model: Optional[str] = _setting("AZURE_OPENAI_GPT_MODEL", "openai_gpt_model")
+    embedding_model: str = _setting("AZURE_OPENAI_EMBEDDING_MODEL", "openai_embedding_model", "text-embedding-3-small")
+    embedding_api_base: Optional[str] = _setting("AZURE_OPENAI_EMBEDDING_API_BASE", "openai_embedding_api_base")
+    embedding_api_key: Optional[str] = _setting("AZURE_OPENAI_EMBEDDING_API_KEY", "openai_embedding_api_key", secret=True)
+    embedding_api_version: Optional[str] = _setting("AZURE_OPENAI_EMBEDDING_API_VERSION", "openai_embedding_api_version")
+    embedding_dimensions: Optional[int] = _setting("AZURE_OPENAI_EMBEDDING_DIMENSIONS", "openai_embedding_dimensions")
+
+
+@dataclass(frozen=True)
+class StorageSettings:
+    container_name: str = _setting("AZURE_STORAGE_CONTAINER", "storage_container_name", CONTAINER_NAME)
+    account_name: Optional[str] = _setting("AZURE_STORAGE_ACCOUNT_NAME", "storage_account_name")
+    url: Optional[str] = _setting("AZURE_STORAGE_URL", "storage_url")
+    connection_string: Optional[str] = _setting("AZURE_CONNECTION_STRING", "blob_connection_string", secret=True)
+    sas_token: Optional[str] = _setting("AZURE_SAS_TOKEN", "storage_sas_token", secret=True)
+    account_key: Optional[str] = _setting("BLOB_ACCOUNT_KEY", "storage_account_key", secret=True)
+
+
+@dataclass(frozen=True)
+class IdentitySettings:
+    client_id: Optional[str] = _setting("AZURE_CLIENT_ID", "client_id")
+    client_secret: Optional[str] = _setting("AZURE_CLIENT_SECRET", "client_secret", secret=True)
+    tenant_id: Optional[str] = _setting("AZURE_TENANT_ID", "tenant_id")
+
+
+@dataclass(frozen=True)
+class FunctionSettings:
+    ingestion_function_url: Optional[str] = _setting("INGESTION_FUNCTION_URL", "ingestion_function_url")
+    chunking_function_key: Optional[str] = _setting("DOCUMENT_CHUNKING_FUNCTION_KEY", "document_chunking_function_key", secret=True)
+    html_to_pdf_url: Optional[str] = _setting("AZURE_FUNCTION_URL", "html_to_pdf_function_url")
+
+
+@dataclass(frozen=True)
+class InferenceSettings:
+    # chat endpoints of the scripts (Keyless_Auth.py, RunDeepSeekR1.py, github_model_inference.py)
+    o1_endpoint: str = _setting("ENDPOINT_URL", "o1_endpoint", "https://o1-deployment.openai.azure.com/")
+    deployment_name: Optional[str] = _setting("DEPLOYMENT_NAME", "deployment_name")
+    endpoint: Optional[str] = _setting("AZURE_INFERENCE_SDK_ENDPOINT", "inference_endpoint")
+    api_key: Optional[str] = _setting("AZURE_INFERENCE_SDK_KEY", "inference_api_key", secret=True)
+    deepseek_api_key: Optional[str] = _setting("AZURE_DEEPSEEK_API_KEY", "deepseek_api_key", secret=True)
+    github_token: Optional[str] = _setting("GITHUB_TOKEN", "github_token", secret=True)
+
+
+@dataclass(frozen=True)
+class IngestionSettings:
+    # checkpoints and dead letters of AddData2AISearch.ingest_container (IngestionState.py)
+    state_path: str = _setting("INGESTION_STATE_PATH", "ingestion_state_path", "ingestion_state.sqlite")
+    # documents per upload to the index; the service accepts at most 1000 per call
+    upload_batch_size: int = _setting("INGESTION_UPLOAD_BATCH_SIZE", "ingestion_upload_batch_size", 1000)
+    # seconds to wait for the chunking function's response to one blob (230 is the limit of its HTTP trigger)
+    chunking_timeout: float = _setting("INGESTION_CHUNKING_TIMEOUT", "ingestion_chunking_timeout", 230.0)
+    # worker processes of `cli.py ingest`, each ingesting one shard of the container (ShardedIngestion.py)
+    workers: int = _setting("INGESTION_WORKERS", "ingestion_workers", 1)
+    # how blobs are assigned to shards: "hash" of the blob name, or "prefix" (first folder of the name)
+    shard_by: str = _setting("INGESTION_SHARD_BY", "ingestion_shard_by", "hash")
+
+
+@dataclass(frozen=True)
+class LoggingSettings:
+    # structured, sampled logging of the ingestion path (StructuredLog.py)
+    level: str = _setting("INGESTION_LOG_LEVEL", "ingestion_log_level", "INFO")
+    sample_rate: float = _setting("INGESTION_LOG_SAMPLE_RATE", "ingestion_log_sample_rate", 0.01)
+    json_lines: bool = _setting("INGESTION_LOG_JSON", "ingestion_log_json", False)
+    azure_level: str = _setting("AZURE_LOG_LEVEL", "azure_log_level", "WARNING")
+
+
+@dataclass(frozen=True)
+class KeyVaultSettings:
+    vault_url: Optional[str] = _setting("AZURE_VAULT_URL", "key_vault_url")
+
+
+@dataclass(frozen=True)
+class Settings:
+    search: SearchSettings = field(default_factory=SearchSettings)
+    openai: OpenAISettings = field(default_factory=OpenAISettings)
+    storage: StorageSettings = field(default_factory=StorageSettings)
+    identity: IdentitySettings = field(default_factory=IdentitySettings)
+    functions: FunctionSettings = field(default_factory=FunctionSettings)
+    inference: InferenceSettings = field(default_factory=InferenceSettings)
+    ingestion: IngestionSettings = field(default_factory=IngestionSettings)
+    logging: LoggingSettings = field(default_factory=LoggingSettings)
+    key_vault: KeyVaultSettings = field(default_factory=KeyVaultSettings)
+
+
+########################################################
+# Loading
+########################################################
+
+
+def _coerce(value: Any, annotation) -> Any:
+    """Convert env strings to the declared type (Optional[int] -> int)"""
+    target = next((t for t in typing.get_args(annotation) if t is not type(None)), annotation)
+    if target is int and not isinstance(value, int):
+        return int(value)
+    if target is float and not isinstance(value, float):
+        return float(value)
+    if target is bool and isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return value
+
+
+def _read_json(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _read_environment(env_file: Optional[str]) -> Dict[str, str]:
+    values: Dict[str, str] = {}
+    if env_file and os.path.exists(env_file):
+        from dotenv import dotenv_values
+
+        values.update({k: v for k, v in dotenv_values(env_file).items() if v is not None})
+    values.update(os.environ)
+    return values
+
+
+def _vault_name(env: str) -> str:
+    # Key Vault secret names only allow letters, digits and dashes
+    return env.replace("_", "-")
+
+
+def _resolve_secrets(vault_url: str, names: List[str], identity: IdentitySettings) -> Dict[str, str]:
+    from KeyVault import get_provider
+
+    try:
+        # the settings are not built yet, so the provider gets the identity read so far
+        values = get_provider(vault_url, identity).get_many(names, ignore_missing=True)
+    except Exception as e:
+        logger.warning(f"Could not resolve secrets from Key Vault: {e}")
+        return {}
+    return {name: value for name, value in values.items() if value is not None}
+
+
+def load_settings(
+    config_path: Optional[str] = None,
+    env_file: Optional[str] = ".env",
+    environ: Optional[Dict[str, str]] = None,
+    use_key_vault: Optional[bool] = None,
+) -> Settings:
+    """
+    Parse every source into a new Settings. Most callers want get_settings().
+
+    Args:
+        config_path: JSON file, CONFIG_PATH or config.json by default
+        env_file: dotenv file, None to skip it
+        environ: environment to read instead of .env and os.environ
+        use_key_vault: resolve missing secrets from Key Vault; by default only when a vault URL is configured
+    """
+    environment = environ if environ is not None else _read_environment(env_file)
+    file_values = _read_json(config_path or environment.get("CONFIG_PATH") or "config.json")
+
+    sections: Dict[str, Dict[str, Any]] = {}
+    missing_secrets: List[Tuple[str, str, str]] = []
+    for section in fields(Settings):
+        values: Dict[str, Any] = {}
+        for setting in fields(section.default_factory):
+            env, json_key = setting.metadata["env"], setting.metadata["json"]
+            value = environment.get(env) if env else None
+            if value in (None, "") and json_key:
+                value = file_values.get(json_key)
+            if value not in (None, ""):
+                values[setting.name] = _coerce(value, setting.type)
+            elif setting.metadata["secret"] and env:
+                missing_secrets.append((section.name, setting.name, _vault_name(env)))
+        sections[section.name] = values
+
+    vault_url = sections["key_vault"].get("vault_url")
+    if use_key_vault is None:
+        use_key_vault = bool(vault_url)
+    if use_key_vault and vault_url and missing_secrets:
+        identity = IdentitySettings(**sections["identity"])
+        resolved = _resolve_secrets(vault_url, [name for _, _, name in missing_secrets], identity)
+        for section_name, setting_name, vault_name in missing_secrets:
+            if vault_name in resolved:
+                sections[section_name][setting_name] = resolved[vault_name]
+
+    return Settings(**{section.name: section.default_factory(**sections[section.name]) for section in fields(Settings)})
+
+
+@functools.lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """The settings of the process, parsed on first use and shared afterwards"""
+    settings = load_settings()
+    logger.debug("Configuration loaded")
+    return settings
+
+
+def reload_settings() -> Settings:
+    """Drop the cached settings, e.g. after rotating a secret, and parse again"""
+    get_settings.cache_clear()
+    return get_settings()
+
+
+def get_credential(identity: Optional[IdentitySettings] = None, asynchronous: bool = False):
+    """
+    The Azure credential of the process: a ClientSecretCredential for the service
+    principal of the identity settings (AZURE_CLIENT_ID, AZURE_CLIENT_SECRET and
+    AZURE_TENANT_ID, from the environment, .env or config.json) when it is complete,
+    DefaultAzureCredential otherwise. .env is not loaded into os.environ, so the
+    EnvironmentCredential of DefaultAzureCredential alone would not see it.
+
+    Args:
+        identity: the identity settings, get_settings().identity by default (Key Vault
+            lookups made while the settings load pass theirs)
+        asynchronous: an azure.identity.aio credential, for async clients
+    """
+    identity = identity or get_settings().identity
+    if asynchronous:
+        # async credentials hold a session of the event loop, so they are not shared
+        return _credential(identity, asynchronous=True)
+    return _shared_credential(identity)
+
+
+def _credential(identity: IdentitySettings, asynchronous: bool = False):
+    if asynchronous:
+        from azure.identity.aio import ClientSecretCredential, DefaultAzureCredential
+    else:
+        from azure.identity import ClientSecretCredential, DefaultAzureCredential
+
+    if identity.client_id and identity.client_secret and identity.tenant_id:
+        return ClientSecretCredential(
+            tenant_id=identity.tenant_id, client_id=identity.client_id, client_secret=identity.client_secret
+        )
+    return DefaultAzureCredential()
+
+
+@functools.lru_cache(maxsize=None)
+def _shared_credential(identity: IdentitySettings):
+    # one credential (and token cache) per identity, instead of one per client
+    return _credential(identity)
+
@@ -1,61 +1,65 @@
 import os
-from openai import OpenAI
+from InferenceClient import InferenceClient, OPENAI
+from config import get_settings
 
-# OpenAI SDK
-token = os.environ["GITHUB_TOKEN"]
-endpoint = "https://models.github.ai/inference"
-model = "openai/gpt-4.1"
-
-client = OpenAI(
-    base_url=endpoint,
-    api_key=token,
-)
-
-response = client.chat.completions.create(
-    messages=[
-        {
-            "role": "system",
-            "content": "You are a helpful assistant.",
-        },
-        {
-            "role": "user",
-            "content": "What is the capital of France?",
-        }
-    ],
-    temperature=1.0,
-    model=model
-)
+# langchain and langgraph are only imported by stream_langgraph, so importing this
+# module (or running ask_github_model) doesn't pay for them
 
-print(response.choices[0].message.content)
 
+# OpenAI SDK
+def ask_github_model(question: str, model: str = "openai/gpt-4.1", token: str = None) -> str:
+    client = InferenceClient(
+        OPENAI,
+        endpoint="https://models.github.ai/inference",
+        model=model,
+        api_key=token or get_settings().inference.github_token,
+    )
 
-# Lang Graph 
-import langchain_openai
-import langgraph.graph
-from langgraph.graph import MessagesState
-from langgraph.graph import START, END
-
-model = langchain_openai.ChatOpenAI(
-  model="gpt-4o",
-  api_key=os.environ["GITHUB_TOKEN"],
-  base_url="https://models.inference.ai.azure.com", 
-)
+    response = client.complete(
+        messages=[
+            {
+                "role": "system",
+                "content": "You are a helpful assistant.",
+            },
+            {
+                "role": "user",
+                "content": question,
+            }
+        ],
+        temperature=1.0,
+    )
+    return response.content
 
-def call_model(state):
-    messages = state["messages"]
-    response = model.invoke(messages)
-    return {"messages": response}
 
-workflow = langgraph.graph.StateGraph(MessagesState)
-workflow.add_node("agent", call_model)
+# Lang Graph
+def stream_langgraph(message: str, token: str = None, checkpoint_path: str = None, thread_id: str = None):
+    import langchain_openai
+    from langgraph.graph import MessagesState
+    from GraphRunner import GraphRunner
 
-workflow.add_edge(START, "agent")
-workflow.add_edge("agent", END)
+    model = langchain_openai.ChatOpenAI(
+      model="gpt-4o",
+      api_key=token or get_settings().inference.github_token,
+      base_url="https://models.inference.ai.azure.com",
+      streaming=True,
+    )
 
-graph = workflow.compile()
+    def call_model(state):
+        messages = state["messages"]
+        response = model.invoke(messages)
+        return {"messages": response}
 
-answer = graph.invoke({"messages": "Hello, how are you?"})
+    # Checkpoints let an interrupted run resume with the same thread id
+    with GraphRunner(MessagesState, checkpoint_path=checkpoint_path or os.getenv("GRAPH_CHECKPOINT_PATH")) as runner:
+        runner.add_sequence({"agent": call_model})
 
-print(answer["messages"][-1].content)
+        # Stream the answer token by token instead of waiting for the whole response
+        for token in runner.stream_tokens({"messages": message}, thread_id=thread_id or os.getenv("GRAPH_THREAD_ID")):
+            print(token, end="", flush=True)
+        print()
+    return runner.timings
 
 
+if __name__ == "__main__":
+    print(ask_github_model("What is the capital of France?"))
+    print(stream_langgraph("Hello, how are you?").report())